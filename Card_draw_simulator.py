@@ -1,11 +1,354 @@
+import sys
+import time
+
+# 进程开始导入主程序的时间（启动耗时统计从这里算起）
+STARTED_AT = time.perf_counter()
+
+# 带子命令（draw、deal）运行时进入命令行模式，不导入 tkinter 和界面用到的模块
+if __name__ == "__main__" and len(sys.argv) > 1:
+    import card_cli
+    if sys.argv[1] in card_cli.COMMANDS:
+        sys.exit(card_cli.main(sys.argv[1:]))
+
 import tkinter as tk
-import random
+import argparse
+import json
+import multiprocessing
 import os
+import re
+import sqlite3
+from collections import OrderedDict
 from tkinter import simpledialog, messagebox, filedialog
 
+from card_composition import GROUPINGS, RemainingComposition
+from card_edit import EditHistory
+from card_engine import (CountedDeckEngine, DeckEngine, RNG_BACKENDS,
+                         available_rng_backends, make_rng, standard_deck,
+                         transfer_draw_state)
+from card_journal import SessionJournal, deck_fingerprint
+from card_loader import DeckFileLoader
+from card_perf import HandlerProfiler, StallWatchdog, StartupProfile, instrumented
+from card_simulation import ParallelSimulationRunner, encode_ranks
+from card_store import DeckStore
+from card_style import StyleTable, load_style_rules
+
+class VirtualCardGrid:
+    """直接绘制在 Canvas 上的虚拟化卡牌网格
+    
+    只为可见的行创建矩形和文字，滚动时回收复用这些图元；
+    点击位置通过坐标换算成卡牌索引，因此卡组大小不影响构建和滚动开销。
+    """
+    
+    # 每个格子的尺寸（与 calculate_cards_per_row 中按钮宽度 80 像素保持一致）
+    cell_width = 72
+    cell_height = 48
+    gap_x = 8
+    gap_y = 10
+    padding = 10
+    
+    def __init__(self, canvas, style_fn, on_click=None, on_right_click=None, label_fn=None):
+        self.canvas = canvas
+        self.style_fn = style_fn  # 索引 -> (背景色, 文字颜色, 边框颜色)
+        self.label_fn = label_fn  # 索引 -> 显示的文字；为 None 时直接显示卡牌名称
+        self.on_click = on_click
+        self.on_right_click = on_right_click
+        self.active = False
+        self.cards = []
+        self.columns = 1
+        self.extra_cells = 0  # 末尾附加的格子（编辑模式下的"+"按钮）
+        self.font = ("Microsoft YaHei", 12, "bold")
+        self._cells = {}  # 卡牌索引 -> (矩形id, 文字id)
+        self._free = []   # 可复用的图元
+        
+        self.canvas.bind("<Button-1>", self._on_button_1, add="+")
+        self.canvas.bind("<Button-3>", self._on_button_3, add="+")
+    
+    @property
+    def pitch_x(self):
+        return self.cell_width + self.gap_x
+    
+    @property
+    def pitch_y(self):
+        return self.cell_height + self.gap_y
+    
+    @property
+    def total_cells(self):
+        return len(self.cards) + self.extra_cells
+    
+    def show(self, cards, columns, font=None, extra_cells=0, label_fn=None, top=0.0):
+        """显示一组卡牌（只绘制可见部分），滚动到 top（0 到 1 之间的比例）"""
+        self.release_all()
+        self.active = True
+        self.cards = cards
+        self.label_fn = label_fn
+        self.columns = max(1, columns)
+        self.extra_cells = extra_cells
+        if font is not None:
+            self.font = font
+        self.update_scrollregion()
+        self.canvas.yview_moveto(top)
+        self.refresh()
+    
+    def reload(self, cards):
+        """卡组内容改变后原地更新（保持滚动位置）：调整滚动区域，只重绘可见的格子"""
+        if not self.active:
+            return
+        self.cards = cards
+        self.update_scrollregion()
+        self.refresh()
+        self.repaint_all()
+    
+    def hide(self):
+        """停用虚拟网格并删除所有图元"""
+        if not self.active and not self._free:
+            return
+        self.release_all()
+        for rect, text in self._free:
+            self.canvas.delete(rect, text)
+        self._free = []
+        self.active = False
+    
+    def set_columns(self, columns):
+        """修改每行列数并重新排布可见格子"""
+        columns = max(1, columns)
+        if not self.active or columns == self.columns:
+            return
+        self.columns = columns
+        self.release_all()
+        self.update_scrollregion()
+        self.refresh()
+    
+    def update_scrollregion(self):
+        """根据总行数设置画布的滚动区域"""
+        rows = (self.total_cells + self.columns - 1) // self.columns
+        width = max(self.canvas.winfo_width(),
+                    self.padding * 2 + self.columns * self.pitch_x)
+        height = self.padding * 2 + rows * self.pitch_y
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+    
+    def cell_origin(self, index):
+        """返回格子左上角在画布上的坐标"""
+        row, col = divmod(index, self.columns)
+        return (self.padding + col * self.pitch_x,
+                self.padding + row * self.pitch_y)
+    
+    def visible_range(self):
+        """当前可见格子的索引范围 [start, stop)"""
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), self.pitch_y)
+        first_row = max(0, int((top - self.padding) // self.pitch_y))
+        last_row = int((top + height - self.padding) // self.pitch_y)
+        start = first_row * self.columns
+        stop = min(self.total_cells, (last_row + 1) * self.columns)
+        return start, stop
+    
+    def refresh(self):
+        """滚动或尺寸变化后，回收离开视野的格子并绘制新进入的格子"""
+        if not self.active:
+            return
+        start, stop = self.visible_range()
+        for index in [i for i in self._cells if not start <= i < stop]:
+            self._release(index)
+        for index in range(start, stop):
+            if index not in self._cells:
+                cell = self._acquire()
+                self._cells[index] = cell
+                self._place(index, cell)
+                self._paint(index, cell)
+    
+    def repaint(self, indices):
+        """只重绘指定索引中当前可见的格子"""
+        if not self.active:
+            return
+        for index in indices:
+            cell = self._cells.get(index)
+            if cell is not None:
+                self._paint(index, cell)
+    
+    def repaint_all(self):
+        """重绘所有可见格子"""
+        self.repaint(list(self._cells))
+    
+    def release_all(self):
+        """回收所有可见格子"""
+        for index in list(self._cells):
+            self._release(index)
+    
+    def index_at(self, x, y):
+        """把画布窗口坐标换算成格子索引；不在任何格子上时返回 None"""
+        if not self.active:
+            return None
+        cx = self.canvas.canvasx(x) - self.padding
+        cy = self.canvas.canvasy(y) - self.padding
+        if cx < 0 or cy < 0:
+            return None
+        col, dx = divmod(int(cx), self.pitch_x)
+        row, dy = divmod(int(cy), self.pitch_y)
+        if col >= self.columns or dx >= self.cell_width or dy >= self.cell_height:
+            return None
+        index = row * self.columns + col
+        if index >= self.total_cells:
+            return None
+        return index
+    
+    def _acquire(self):
+        """取出一个可复用的格子，没有时新建"""
+        if self._free:
+            rect, text = self._free.pop()
+            self.canvas.itemconfigure(rect, state="normal")
+            self.canvas.itemconfigure(text, state="normal")
+            return rect, text
+        rect = self.canvas.create_rectangle(0, 0, 0, 0, width=2, tags=("virtual_card",))
+        text = self.canvas.create_text(0, 0, tags=("virtual_card",))
+        return rect, text
+    
+    def _release(self, index):
+        """把格子隐藏并放回复用池"""
+        rect, text = self._cells.pop(index)
+        self.canvas.itemconfigure(rect, state="hidden")
+        self.canvas.itemconfigure(text, state="hidden")
+        self._free.append((rect, text))
+    
+    def _place(self, index, cell):
+        """把格子移动到索引对应的位置"""
+        rect, text = cell
+        x, y = self.cell_origin(index)
+        self.canvas.coords(rect, x, y, x + self.cell_width, y + self.cell_height)
+        self.canvas.coords(text, x + self.cell_width / 2, y + self.cell_height / 2)
+    
+    def _paint(self, index, cell):
+        """按卡牌状态设置格子的颜色和文字"""
+        rect, text = cell
+        if index >= len(self.cards):
+            # 附加格子：编辑模式下的"+"按钮
+            self.canvas.itemconfigure(rect, fill="#4CAF50", outline="#388E3C")
+            self.canvas.itemconfigure(text, text="+", fill="white",
+                                      font=("Noto Sans", 14, "bold"))
+            return
+        bg, fg, outline = self.style_fn(index)
+        self.canvas.itemconfigure(rect, fill=bg, outline=outline)
+        label = self.label_fn(index) if self.label_fn else self.cards[index]
+        self.canvas.itemconfigure(text, text=label, fill=fg, font=self.font)
+    
+    def _on_button_1(self, event):
+        index = self.index_at(event.x, event.y)
+        if index is not None and self.on_click:
+            self.on_click(index, event)
+    
+    def _on_button_3(self, event):
+        index = self.index_at(event.x, event.y)
+        if index is not None and self.on_right_click:
+            self.on_right_click(index, event)
+
+class GroupGridCache:
+    """最近使用卡组的网格缓存（LRU）
+    
+    每项保存一个卡组已经建好的卡牌框架（隐藏但不销毁）、它的抽取引擎和离开时的滚动位置。
+    超过卡组数量上限或控件总数上限时，淘汰最久未使用的一项。
+    """
+    
+    def __init__(self, max_groups=3, max_widgets=3000, on_evict=None):
+        self.max_groups = max_groups
+        self.max_widgets = max_widgets
+        self.on_evict = on_evict
+        self.widget_count = 0
+        self._entries = OrderedDict()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def __contains__(self, key):
+        return key in self._entries
+    
+    def get(self, key):
+        """取出缓存项并标记为最近使用；不存在时返回 None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+    
+    def put(self, key, entry):
+        """加入缓存项，必要时淘汰最久未使用的项（不会淘汰刚加入的项）"""
+        self.pop(key)
+        self._entries[key] = entry
+        self.widget_count += entry["widgets"]
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_groups
+                or self.widget_count > self.max_widgets):
+            oldest = next(iter(self._entries))
+            if oldest == key:
+                break
+            self.pop(oldest)
+    
+    def pop(self, key):
+        """移除缓存项并交给 on_evict 回收"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.widget_count -= entry["widgets"]
+            if self.on_evict:
+                self.on_evict(entry)
+        return entry
+    
+    @staticmethod
+    def save_view(entry, top):
+        """记录离开该卡组网格时的滚动位置，换回时恢复"""
+        entry["yview"] = top
+    
+    def holds_frame(self, frame):
+        """判断某个卡牌框架是否仍被缓存"""
+        return any(entry["frame"] is frame for entry in self._entries.values())
+    
+    def entries(self):
+        """所有缓存项（从最久未使用到最近使用）"""
+        return list(self._entries.values())
+
 class CardDrawer:
-    def __init__(self):
+    # 卡牌数量达到该值时改用虚拟化网格绘制（不再为每张牌创建按钮）
+    VIRTUAL_GRID_THRESHOLD = 200
+    
+    # 网格缓存：最多保留的卡组数量，以及所有缓存网格的控件总数上限
+    GRID_CACHE_SIZE = 3
+    GRID_CACHE_MAX_WIDGETS = 3000
+    
+    # 会话日志写入磁盘（并 fsync）的间隔（毫秒）
+    JOURNAL_FLUSH_MS = 1000
+    
+    # 默认卡组：名称 -> 扑克牌副数
+    DEFAULT_GROUPS = {"完整扑克牌组": 1, "两副扑克牌组": 2}
+    
+    # 窗口第一次显示后，再等这么久（毫秒）才建卡牌网格，让窗口先画完
+    FIRST_GRID_DELAY_MS = 10
+    
+    # 性能统计面板的刷新间隔（毫秒）
+    PERF_OVERLAY_REFRESH_MS = 500
+    
+    # 事件循环心跳间隔和卡顿阈值（毫秒）
+    WATCHDOG_INTERVAL_MS = 100
+    WATCHDOG_STALL_MS = 250
+    
+    # 常见的发牌方式：牌数 -> (玩家数, 每人张数, 底牌数)
+    DEAL_PRESETS = {
+        54: (3, 17, 3),    # 斗地主
+        108: (4, 25, 8),   # 升级（两副牌）
+        136: (4, 13, 0),   # 麻将
+        144: (4, 13, 0),   # 麻将（带 8 张花牌）
+        168: (4, 13, 0),   # 麻将（随附的 麻将.txt，每种花牌 4 张）
+    }
+    
+    def __init__(self, profile=None, exit_after_startup=False, run_mainloop=True, instrument=False):
+        # 启动耗时统计（--profile-startup 时才有），以及统计完成后是否直接退出（供基准测试使用）
+        # run_mainloop=False 时只建好窗口，不进入事件循环（基准测试自己驱动界面）
+        self.profile = profile
+        self.exit_after_startup = exit_after_startup
+        self.mark_startup("import")
+        
+        # 事件处理耗时统计（默认关闭，F12 打开并显示统计面板）
+        self.handler_profiler = HandlerProfiler(tk.BaseWidget)
+        self.perf_overlay = None
+        self.perf_overlay_job = None
+        
         self.root = tk.Tk()
+        self.mark_startup("tk.Tk()")
         self.root.title("抽牌程序 - 卡组管理器")
         self.root.geometry("1200x700")  # 增加宽度以适应左右布局
         
@@ -14,20 +357,63 @@ class CardDrawer:
         self.current_group_index = 0
         self.edit_mode = False
         
-        # 编辑模式下选中的卡牌索引
-        self.selected_card_indices = []
+        # 编辑模式下选中的卡牌索引（集合），以及 Shift 范围选择的起点
+        self.selected_card_indices = set()
+        self.selection_anchor = None
+        
+        # 编辑模式下卡牌按钮当前显示的名称（用于编辑后只更新变化的按钮）
+        self.editable_labels = []
+        self.editable_group = None
+        
+        # 每个卡组的编辑历史（撤销/重做），键为卡组对象的 id
+        self.edit_histories = {}
         
         # 记录每行的卡牌数量（用于自适应布局）
         self.cards_per_row = 13
+        self._reflow_pending = None  # 尚未执行的重新排布任务
+        
+        # 统一的渲染调度：登记需要刷新的部分，每轮事件循环只刷新一次
+        self._render_dirty = set()
+        self._render_pending = None
+        self._updating_group_var = False  # 程序设置下拉菜单值时忽略 trace 回调
+        self.render_counts = {"flush": 0, "dropdown": 0, "grid": 0, "status": 0, "buttons": 0,
+                              "odds": 0}
+        
+        # 快速启动：窗口第一次画出之后才建卡牌网格，在此之前登记的网格刷新先挂起
+        self._first_frame_pending = True
+        
+        # 抽牌引擎：记录每张牌的抽取状态（使用索引而不是卡牌名称）
+        # 每个卡组各有一个引擎，随网格一起缓存，切换回来时抽取状态不丢失
+        self.engine = DeckEngine()
+        self.grid_cache = GroupGridCache(
+            self.GRID_CACHE_SIZE,
+            self.GRID_CACHE_MAX_WIDGETS,
+            on_evict=self._destroy_cached_grid
+        )
+        self.grid_entry = None  # 当前显示卡组的缓存项
+        self._carry_from = None  # 切换合并显示前的 (卡组, 引擎)，抽取状态要带到新的显示
+        
+        # 随机源设置（新建的引擎都使用它；设置种子后每局抽牌可复现）
+        self.rng_backend = "mt"
+        self.rng_seed = None
+        
+        # 本地卡组库：所有卡组及其修改在重启后保留
+        self.store = self.open_deck_store()
+        # 卡顿检测：窗口显示后开始，卡顿记录写到卡组库目录下的 stalls.log
+        self.watchdog = StallWatchdog(
+            self.WATCHDOG_INTERVAL_MS, self.WATCHDOG_STALL_MS,
+            log_path=os.path.join(os.path.dirname(self.store.path), "stalls.log"),
+            callback_class=tk.CallWrapper
+        )
         
-        # 记录每张牌的抽取状态（使用索引而不是卡牌名称）
-        self.drawn_indices = []
-        self.current_card_index = None
-        self.current_card_index = None
+        # 抽牌会话日志目录（卡组库只在内存中时不记录）
+        if self.store.path == ":memory:":
+            self.journal_dir = None
+        else:
+            self.journal_dir = os.path.join(os.path.dirname(self.store.path), "journal")
         
-        # 默认卡组的原始卡牌（用于恢复功能）
-        self.default_54_cards = None
-        self.default_108_cards = None
+        # 卡牌样式表（每种牌的颜色只计算一次，重绘时查表）
+        self.styles = self.load_style_table()
         
         # 创建主框架
         main_frame = tk.Frame(self.root, padx=20, pady=20)
@@ -35,6 +421,7 @@ class CardDrawer:
         
         # 顶部：卡组管理工具栏
         self.create_group_toolbar(main_frame)
+        self.mark_startup("toolbar")
         
         # 创建左右分区的容器
         content_frame = tk.Frame(main_frame)
@@ -53,14 +440,25 @@ class CardDrawer:
         
         # 创建抽牌区域（在右侧）
         self.create_draw_area(right_frame)
+        self.mark_startup("widgets")
         
         # 初始化默认卡组
         self.initialize_default_groups()
+        self.mark_startup("default groups")
         
-        # 绑定窗口大小变化事件
+        # 绑定窗口大小变化事件；窗口第一次显示后再建卡牌网格
         self.root.bind("<Configure>", self.on_window_resize)
+        self.root.bind("<Map>", self.on_first_map, add="+")
+        self.root.bind("<F12>", self.toggle_perf_overlay)
+        if instrument:
+            self.toggle_perf_overlay()
+        
+        # 定时把会话日志写入磁盘；关闭窗口前写入剩余的操作
+        self.root.after(self.JOURNAL_FLUSH_MS, self.flush_journals)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
-        self.root.mainloop()
+        if run_mainloop:
+            self.root.mainloop()
     
     def create_group_toolbar(self, parent):
         """创建卡组管理工具栏"""
@@ -177,65 +575,204 @@ class CardDrawer:
     
     def initialize_default_groups(self):
         """初始化默认卡组"""
-        # 定义花色顺序：方块>梅花>红心>黑桃
-        suits = ['♦', '♣', '♥', '♠']  # 按照要求的顺序
-        
-        # 定义点数顺序：K>Q>J>10>9>8>7>6>5>4>3>2>A
-        ranks = ['K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2', 'A']
-        
-        # 1. 创建一副完整扑克牌组（54张）按指定顺序
-        cards_54 = []
-        for suit in suits:
-            for rank in ranks:
-                cards_54.append(f"{rank}{suit}")
-        
-        # 添加大小王（先小王后大王）
-        cards_54.append("小王")
-        cards_54.append("大王")
-        
-        # 保存默认卡组的原始状态（用于恢复）
-        self.default_54_cards = cards_54.copy()
-        
-        # 创建第一副默认卡组
-        default_group_54 = {
-            "name": "完整扑克牌组",
-            "cards": cards_54,
-            "is_default": True,
-            "is_editable": True  # 现在默认卡组也可以修改
-        }
-        
-        # 2. 创建两副完整扑克牌组（108张）按指定顺序
-        cards_108 = []
-        for suit in suits:  # 创建两副牌
-            for _ in range(2):
-                for rank in ranks:
-                    cards_108.append(f"{rank}{suit}")
-        for _ in range(2):
-            cards_108.append("小王")
-        for _ in range(2):
-            cards_108.append("大王")
-        
-        # 保存默认卡组的原始状态（用于恢复）
-        self.default_108_cards = cards_108.copy()
-        
-        # 创建第二副默认卡组
-        default_group_108 = {
-            "name": "两副扑克牌组",
-            "cards": cards_108,
+        # 卡组库中已有卡组时只读取索引（卡牌在第一次选中时读取），
+        # 第一次运行时才创建并写入两副默认卡组
+        self.card_groups = self.store.list_groups()
+        if not self.card_groups:
+            self.card_groups = [self.create_default_group(name) for name in self.DEFAULT_GROUPS]
+            with self.store.transaction():
+                for group in self.card_groups:
+                    self.store.save_group(group)
+        
+        # 选中第一个卡组（下拉菜单和卡牌显示在空闲时统一刷新）
+        self.select_group_by_index(0)
+    
+    def create_default_group(self, name):
+        """创建默认卡组：完整扑克牌组（54张）或两副扑克牌组（108张）
+        
+        花色方块>梅花>红心>黑桃，点数K>Q>...>A，最后小王、大王；
+        卡组以驻留表中的整数编号存储（CardDeck），用法与名称列表相同。
+        """
+        return {
+            "name": name,
+            "cards": standard_deck(self.DEFAULT_GROUPS[name]),
             "is_default": True,
             "is_editable": True  # 现在默认卡组也可以修改
         }
+    
+    def open_deck_store(self):
+        """打开本地卡组库；无法打开时退回到仅在内存中保存"""
+        try:
+            return DeckStore()
+        except (OSError, sqlite3.Error) as e:
+            print(f"无法打开卡组库，本次修改不会保存: {e}")
+            return DeckStore(":memory:")
+    
+    def load_style_table(self):
+        """创建卡牌样式表；卡组库目录下有 styles.json 时使用其中的规则"""
+        rules = None
+        if self.store.path != ":memory:":
+            path = os.path.join(os.path.dirname(self.store.path), "styles.json")
+            if os.path.exists(path):
+                try:
+                    rules = load_style_rules(path)
+                except (OSError, ValueError) as e:
+                    print(f"无法读取样式规则，使用默认样式: {e}")
+        return StyleTable(rules)
+    
+    def ensure_group_cards(self, group):
+        """卡组的卡牌尚未从卡组库读取时读取"""
+        if group["cards"] is None:
+            group["cards"] = self.store.load_cards(group["store_id"])
+        return group["cards"]
+    
+    def invalidate(self, *parts):
+        """登记需要刷新的界面部分（dropdown/grid/status/buttons/odds），在空闲时统一刷新一次"""
+        self._render_dirty.update(parts)
+        if self._render_pending is None:
+            self._render_pending = self.root.after_idle(self.flush_render)
+    
+    @instrumented
+    def flush_render(self):
+        """刷新所有已登记的界面部分，每部分最多刷新一次"""
+        self._render_pending = None
+        dirty = self._render_dirty
+        self._render_dirty = set()
+        if self._first_frame_pending and "grid" in dirty:
+            # 窗口还没画出来：网格留到 on_first_map 之后再建
+            dirty.discard("grid")
+            self._render_dirty.add("grid")
+        if not dirty:
+            return
+        self.render_counts["flush"] += 1
         
-        # 添加默认卡组
-        self.card_groups.append(default_group_54)
-        self.card_groups.append(default_group_108)
-        self.current_group_index = 0
-        
-        # 更新下拉菜单
-        self.update_group_dropdown()
-        
-        # 更新卡牌显示
-        self.update_card_display_from_group()
+        if "dropdown" in dirty:
+            self.render_counts["dropdown"] += 1
+            self.update_group_dropdown()
+        if "grid" in dirty:
+            self.render_counts["grid"] += 1
+            if self.edit_mode:
+                self.refresh_editable_card_display()
+            else:
+                # 换入或重建卡牌显示，再按该卡组的抽取状态更新当前牌和按钮
+                self.update_card_display_from_group()
+                self.carry_draw_state()
+                self.update_current_card_display()
+                self.update_draw_buttons_state()
+            self.update_hands_display()
+            dirty.add("odds")
+        if "odds" in dirty:
+            self.render_counts["odds"] += 1
+            self.update_odds_display()
+        if "status" in dirty:
+            self.render_counts["status"] += 1
+            self.update_status_label()
+        if "buttons" in dirty:
+            self.render_counts["buttons"] += 1
+            self.update_group_buttons_state()
+        if "grid" in dirty and self.profile is not None and not self.profile.finished:
+            self.mark_startup("first grid")
+            self.profile.finish()
+            if self.exit_after_startup:
+                self.root.after_idle(self.on_close)
+    
+    def on_first_map(self, event=None):
+        """窗口第一次显示：稍后建卡牌网格（挂起的网格刷新在此时放行）"""
+        if not self._first_frame_pending:
+            return
+        self._first_frame_pending = False
+        self.mark_startup("first frame")
+        self.root.after(self.FIRST_GRID_DELAY_MS, self.invalidate, "grid")
+        self.watchdog.start()
+        self.root.after(self.WATCHDOG_INTERVAL_MS, self.watchdog_tick)
+    
+    def watchdog_tick(self):
+        """事件循环心跳：记录延迟后预约下一次"""
+        if self.watchdog.active:
+            self.watchdog.beat()
+            self.root.after(self.WATCHDOG_INTERVAL_MS, self.watchdog_tick)
+    
+    def toggle_perf_overlay(self, event=None):
+        """显示或隐藏性能统计面板；面板显示时才统计事件处理耗时"""
+        if self.handler_profiler.enabled:
+            self.handler_profiler.disable()
+            if self.perf_overlay_job is not None:
+                self.root.after_cancel(self.perf_overlay_job)
+                self.perf_overlay_job = None
+            self.perf_overlay.place_forget()
+            return
+        if self.perf_overlay is None:
+            self.create_perf_overlay()
+        self.handler_profiler.enable()
+        self.perf_overlay.place(relx=1.0, rely=0.0, x=-10, y=10, anchor="ne")
+        self.perf_overlay.lift()
+        self.refresh_perf_overlay()
+    
+    def create_perf_overlay(self):
+        """创建浮在窗口右上角的性能统计面板"""
+        overlay = tk.Frame(self.root, bg="#FFFDE7", bd=1, relief=tk.SOLID, padx=6, pady=4)
+        tk.Label(overlay, text="性能统计（F12 关闭，单位 ms）", font=("Noto Sans", 9, "bold"),
+                 bg="#FFFDE7").pack(anchor="w")
+        self.perf_overlay_label = tk.Label(overlay, text="", font=("Consolas", 9), bg="#FFFDE7",
+                                           justify=tk.LEFT, anchor="w")
+        self.perf_overlay_label.pack(anchor="w")
+        buttons = tk.Frame(overlay, bg="#FFFDE7")
+        buttons.pack(anchor="e", pady=(4, 0))
+        tk.Button(buttons, text="清零", command=self.reset_perf_stats,
+                  font=("Noto Sans", 8)).pack(side=tk.LEFT, padx=2)
+        tk.Button(buttons, text="导出JSON", command=self.export_perf_stats,
+                  font=("Noto Sans", 8)).pack(side=tk.LEFT, padx=2)
+        self.perf_overlay = overlay
+    
+    def refresh_perf_overlay(self):
+        """刷新统计面板的内容（面板显示期间定时调用）"""
+        self.perf_overlay_job = None
+        self.perf_overlay_label.config(text=self.perf_report())
+        self.perf_overlay_job = self.root.after(self.PERF_OVERLAY_REFRESH_MS, self.refresh_perf_overlay)
+    
+    def perf_report(self):
+        """统计面板的内容：事件循环延迟和各处理函数的耗时"""
+        return self.watchdog.report() + "\n\n" + self.handler_profiler.report()
+    
+    def reset_perf_stats(self):
+        """清空事件处理耗时和事件循环延迟统计"""
+        self.handler_profiler.reset()
+        self.watchdog.reset()
+        self.perf_overlay_label.config(text=self.perf_report())
+    
+    def export_perf_stats(self):
+        """把事件处理耗时统计导出为 JSON 文件"""
+        file_path = filedialog.asksaveasfilename(
+            title="导出性能统计",
+            defaultextension=".json",
+            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")],
+            initialfile="handler_stats.json"
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, 'w', encoding='utf-8') as file:
+                stats = self.handler_profiler.to_dict()
+                stats["event_loop"] = self.watchdog.to_dict()
+                json.dump(stats, file, ensure_ascii=False, indent=2)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出性能统计时出错: {str(e)}")
+    
+    def mark_startup(self, phase):
+        """启动耗时统计：记录一个阶段结束（未打开统计时什么也不做）"""
+        if self.profile is not None:
+            self.profile.mark(phase)
+    
+    def update_status_label(self):
+        """更新状态标签"""
+        current_group = self.card_groups[self.current_group_index]
+        if self.edit_mode:
+            text = f"编辑模式: {current_group['name']} - 左键多选，右键菜单"
+        else:
+            text = f"当前: {current_group['name']} ({len(current_group['cards'])}张)"
+            if self.counted_view.get():
+                text = f"当前: {current_group['name']} ({len(current_group['cards'])}张, {len(self.engine)}种)"
+        self.status_label.config(text=text)
     
     def update_group_dropdown(self):
         """更新卡组下拉菜单"""
@@ -254,44 +791,38 @@ class CardDrawer:
                 command=lambda idx=i: self.select_group_by_index(idx)
             )
         
-        # 设置当前选中的卡组
-        self.select_group_by_index(self.current_group_index)
+        # 设置下拉菜单显示值（不触发 on_group_selected）
+        current_group = self.card_groups[self.current_group_index]
+        name = current_group["name"]
+        if current_group.get("is_default", False):
+            name = f"{name} (默认)"
+        self._updating_group_var = True
+        try:
+            self.group_var.set(name)
+        finally:
+            self._updating_group_var = False
     
     def select_group_by_index(self, index):
         """根据索引选择卡组"""
         if 0 <= index < len(self.card_groups):
-            # 设置下拉菜单显示值
-            current_group = self.card_groups[index]
-            name = current_group["name"]
-            if current_group.get("is_default", False):
-                name = f"{name} (默认)"
-            self.group_var.set(name)
-            
-            # 更新当前组索引
+            self.remember_grid_view()
+            # 更新当前组索引，并在第一次选中时读取卡牌
             self.current_group_index = index
+            self.ensure_group_cards(self.card_groups[index])
+            self.update_deal_defaults()
             
-            # 清空抽取状态（因为切换卡组）
-            self.drawn_indices = []  # 修改
-            self.current_card = None
-            self.current_card_index = None  # 新增
-            
-            # 更新卡牌显示
-            self.update_card_display_from_group()
-            
-            # 重置当前状态
-            self.reset()
-            
-            # 更新按钮状态
-            self.update_group_buttons_state()
-            
-            # 更新状态标签
-            card_count = len(current_group["cards"])
-            self.status_label.config(
-                text=f"当前: {current_group['name']} ({card_count}张)"
-            )
+            # 登记刷新：下拉菜单、卡牌显示（最近使用的卡组保留抽取状态）、状态标签、按钮状态
+            self.invalidate("dropdown", "grid", "status", "buttons")
+    
+    def remember_grid_view(self):
+        """离开当前卡组网格前记录它的滚动位置（编辑模式下显示的不是该网格，不记录）"""
+        if self.grid_entry is not None and not self.edit_mode:
+            self.grid_cache.save_view(self.grid_entry, self.canvas.yview()[0])
     
     def on_group_selected(self, *args):
         """当卡组被选中时的处理函数"""
+        if self._updating_group_var:
+            return
         try:
             # 获取当前下拉菜单显示的值
             selected_value = self.group_var.get()
@@ -305,7 +836,8 @@ class CardDrawer:
                         name = f"{name} (默认)"
                     
                     if selected_value == name:
-                        self.select_group_by_index(i)
+                        if i != self.current_group_index:
+                            self.select_group_by_index(i)
                         break
         except Exception as e:
             print(f"切换卡组时出错: {e}")
@@ -337,31 +869,22 @@ class CardDrawer:
         new_index = len(custom_groups) + 1
         
         # 创建与默认卡组相同的卡牌，按指定顺序
-        suits = ['♦', '♣', '♥', '♠']  # 按照要求的顺序
-        ranks = ['K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2', 'A']  # 按照要求的顺序
-        
-        cards = []
-        for suit in suits:
-            for rank in ranks:
-                cards.append(f"{rank}{suit}")
-        cards.append("小王")
-        cards.append("大王")
+        cards = standard_deck(1)
         
         # 创建新卡组
         new_group = {
             "name": f"自定义卡组 {new_index}",
-            "cards": cards.copy(),
+            "cards": cards,
             "is_default": False,
             "is_editable": True
         }
         
         self.card_groups.append(new_group)
-        self.current_group_index = len(self.card_groups) - 1
+        with self.store.transaction():
+            self.store.save_group(new_group)
         
         # 更新界面
-        self.update_group_dropdown()
-        self.update_card_display_from_group()
-        self.update_group_buttons_state()
+        self.select_group_by_index(len(self.card_groups) - 1)
         
         messagebox.showinfo("成功", f"已添加新卡组: {new_group['name']}")
     
@@ -381,7 +904,12 @@ class CardDrawer:
         )
         
         if confirm:
-            # 删除当前卡组
+            # 删除当前卡组（连同缓存的网格）
+            self.discard_group_grids(current_group)
+            self.discard_group_journals(current_group)
+            self.edit_histories.pop(id(current_group), None)
+            with self.store.transaction():
+                self.store.delete_group(current_group)
             del self.card_groups[self.current_group_index]
             
             # 如果删除了当前卡组，切换到第一个卡组
@@ -389,9 +917,7 @@ class CardDrawer:
                 self.current_group_index = 0
             
             # 更新界面
-            self.update_group_dropdown()
-            self.update_card_display_from_group()
-            self.update_group_buttons_state()
+            self.select_group_by_index(self.current_group_index)
             
             messagebox.showinfo("成功", "卡组已删除")
     
@@ -410,52 +936,101 @@ class CardDrawer:
         if not file_path:
             return  # 用户取消了选择
         
+        # 后台线程流式解析文件，主窗口定时合并已解析的块并显示进度
         try:
-            # 读取文件内容
-            cards = []
-            with open(file_path, 'r', encoding='utf-8') as file:
-                for line in file:
-                    card = line.strip()
-                    if card:  # 跳过空行
-                        cards.append(card)
-            
-            if not cards:
-                messagebox.showwarning("警告", "文件为空或没有有效的卡牌数据！")
-                return
-            
-            # 询问卡组名称
-            file_name = os.path.basename(file_path)
-            default_name = os.path.splitext(file_name)[0]
-            
-            group_name = simpledialog.askstring(
-                "卡组名称",
-                f"请输入新卡组的名称:",
-                initialvalue=default_name
-            )
-            
-            if not group_name or not group_name.strip():
-                group_name = default_name
-            
-            # 创建新卡组
-            new_group = {
-                "name": group_name.strip(),
-                "cards": cards,
-                "is_default": False,
-                "is_editable": True
-            }
-            
-            self.card_groups.append(new_group)
-            self.current_group_index = len(self.card_groups) - 1
-            
-            # 更新界面
-            self.update_group_dropdown()
-            self.update_card_display_from_group()
-            self.update_group_buttons_state()
-            
-            messagebox.showinfo("成功", f"已从文件载入卡组: {new_group['name']} ({len(cards)}张牌)")
-            
-        except Exception as e:
+            self.deck_loader = DeckFileLoader(file_path).start()
+        except OSError as e:
             messagebox.showerror("错误", f"载入文件时出错: {str(e)}")
+            return
+        self.load_group_btn.config(state="disabled")
+        
+        # 进度窗口（可取消）
+        window = tk.Toplevel(self.root)
+        window.title("载入卡组")
+        window.protocol("WM_DELETE_WINDOW", self.cancel_loading_card_group)
+        self.load_progress_window = window
+        self.load_progress_label = tk.Label(window, text="正在读取...",
+                                            font=("Noto Sans", 10), padx=20, pady=10)
+        self.load_progress_label.pack()
+        tk.Button(window, text="取消", command=self.cancel_loading_card_group,
+                  font=("Noto Sans", 10), padx=10).pack(pady=(0, 10))
+        
+        self.load_job = self.root.after(50, self._poll_loading_card_group)
+    
+    def _poll_loading_card_group(self):
+        """合并后台线程已解析的块并刷新进度；完成后创建卡组"""
+        self.load_job = None
+        loader = self.deck_loader
+        loader.poll()
+        self.load_progress_label.config(
+            text=f"已读取 {loader.progress:.0%}（{len(loader.cards)} 张）"
+        )
+        if loader.done:
+            self.finish_loading_card_group()
+        else:
+            self.load_job = self.root.after(50, self._poll_loading_card_group)
+    
+    def cancel_loading_card_group(self):
+        """取消正在进行的载入"""
+        self.deck_loader.cancel()
+        if self.load_job is not None:
+            self.root.after_cancel(self.load_job)
+            self.load_job = None
+        self.finish_loading_card_group()
+    
+    def finish_loading_card_group(self):
+        """载入结束：关闭进度窗口，成功时询问名称并添加新卡组"""
+        loader = self.deck_loader
+        self.deck_loader = None
+        self.load_progress_window.destroy()
+        self.load_progress_window = None
+        if not self.edit_mode:
+            self.load_group_btn.config(state="normal")
+        
+        if loader.cancelled:
+            return
+        if loader.error is not None:
+            messagebox.showerror("错误", f"载入文件时出错: {str(loader.error)}")
+            return
+        
+        cards = loader.cards  # 每行名称直接驻留为编号，重复的牌不再各存一份字符串
+        if not cards:
+            messagebox.showwarning("警告", "文件为空或没有有效的卡牌数据！")
+            return
+        
+        # 询问卡组名称
+        file_name = os.path.basename(loader.path)
+        default_name = os.path.splitext(file_name)[0]
+        
+        group_name = simpledialog.askstring(
+            "卡组名称",
+            f"请输入新卡组的名称:",
+            initialvalue=default_name
+        )
+        
+        if not group_name or not group_name.strip():
+            group_name = default_name
+        
+        new_group = self.add_loaded_group(group_name.strip(), cards)
+        
+        messagebox.showinfo("成功", f"已从文件载入卡组: {new_group['name']} ({len(cards)}张牌)")
+    
+    def add_loaded_group(self, name, cards):
+        """把载入的卡牌添加为新卡组，保存到卡组库并选中它"""
+        new_group = {
+            "name": name,
+            "cards": cards,
+            "is_default": False,
+            "is_editable": True
+        }
+        
+        self.card_groups.append(new_group)
+        with self.store.transaction():
+            self.store.save_group(new_group)
+        
+        # 更新界面
+        self.select_group_by_index(len(self.card_groups) - 1)
+        return new_group
     
     def export_card_group(self):
         """导出当前卡组到文件"""
@@ -494,11 +1069,12 @@ class CardDrawer:
     
     def enable_edit_mode(self):
         """进入编辑卡组模式"""
+        self.remember_grid_view()
         self.edit_mode = True
-        current_group = self.card_groups[self.current_group_index]
         
         # 清空选中的卡牌
-        self.selected_card_indices = []
+        self.selected_card_indices = set()
+        self.selection_anchor = None
         
         # 更新按钮状态
         self.edit_group_btn.config(state="disabled")
@@ -510,16 +1086,15 @@ class CardDrawer:
         self.draw_button.config(state="disabled")
         self.reset_button.config(state="disabled")
         
-        # 更新状态标签
-        self.status_label.config(
-            text=f"编辑模式: {current_group['name']} - 左键多选，右键菜单"
-        )
-        
-        # 重新创建可编辑的卡牌显示
-        self.create_editable_card_display()
+        # 登记刷新：状态标签和可编辑的卡牌显示
+        self.invalidate("grid", "status")
         
         # 添加编辑工具栏（包含删除选中按钮）
         self.create_edit_toolbar()
+        
+        # 撤销/重做快捷键
+        self.root.bind("<Control-z>", self.undo_edit)
+        self.root.bind("<Control-y>", self.redo_edit)
     
     def create_edit_toolbar(self):
         """创建编辑模式下的工具栏"""
@@ -535,7 +1110,7 @@ class CardDrawer:
                 font=("Noto Sans", 10, "bold"), bg="#e0e0e0").pack(side=tk.LEFT, padx=(10, 5))
         
         # 提示标签
-        tk.Label(self.edit_toolbar_frame, text="左键多选卡牌，右键打开菜单", 
+        tk.Label(self.edit_toolbar_frame, text="左键多选卡牌，Shift+左键连选，右键打开菜单", 
                 font=("Noto Sans", 9), bg="#e0e0e0", fg="#666666").pack(side=tk.LEFT, padx=5)
         
         # 删除选中按钮
@@ -553,6 +1128,50 @@ class CardDrawer:
         )
         self.delete_selected_btn.pack(side=tk.LEFT, padx=5)
         
+        # 撤销/重做按钮（Ctrl+Z / Ctrl+Y）
+        self.undo_btn = tk.Button(
+            self.edit_toolbar_frame,
+            text="撤销",
+            command=self.undo_edit,
+            font=("Noto Sans", 10),
+            padx=10,
+            pady=5,
+            cursor="hand2"
+        )
+        self.undo_btn.pack(side=tk.LEFT, padx=5)
+        self.redo_btn = tk.Button(
+            self.edit_toolbar_frame,
+            text="重做",
+            command=self.redo_edit,
+            font=("Noto Sans", 10),
+            padx=10,
+            pady=5,
+            cursor="hand2"
+        )
+        self.redo_btn.pack(side=tk.LEFT, padx=5)
+        self.update_undo_buttons()
+        
+        # 批量操作菜单（每个操作一次完成，可整体撤销）
+        batch_btn = tk.Menubutton(
+            self.edit_toolbar_frame,
+            text="批量操作",
+            font=("Noto Sans", 10),
+            relief=tk.RAISED,
+            padx=10,
+            pady=5,
+            cursor="hand2"
+        )
+        batch_menu = tk.Menu(batch_btn, tearoff=0)
+        batch_menu.add_command(label="全选", command=self.select_all_cards)
+        batch_menu.add_command(label="取消选择", command=self.clear_card_selection)
+        batch_menu.add_separator()
+        batch_menu.add_command(label="按规则重命名...", command=self.rename_cards_by_pattern)
+        batch_menu.add_command(label="全部替换...", command=self.replace_all_cards)
+        batch_menu.add_command(label="批量添加...", command=self.insert_many_cards)
+        batch_menu.add_command(label="去除重复", command=self.dedupe_cards)
+        batch_btn.config(menu=batch_menu)
+        batch_btn.pack(side=tk.LEFT, padx=5)
+        
         # 恢复默认按钮（仅当当前卡组是默认卡组时显示）
         current_group = self.card_groups[self.current_group_index]
         if current_group.get("is_default", False):
@@ -590,28 +1209,19 @@ class CardDrawer:
         )
         
         if confirm:
-            # 根据卡组名称恢复相应的默认卡组
-            if current_group["name"] == "完整扑克牌组":
-                current_group["cards"] = self.default_54_cards.copy()
-            elif current_group["name"] == "两副扑克牌组":
-                current_group["cards"] = self.default_108_cards.copy()
+            # 根据卡组名称恢复相应的默认卡组（可撤销）
+            if current_group["name"] in self.DEFAULT_GROUPS:
+                copies = self.DEFAULT_GROUPS[current_group["name"]]
+                self.edit_history().replace(standard_deck(copies), "恢复默认")
             
-            # 刷新显示
-            self.create_editable_card_display()
-            
-            # 清空选中状态
-            self.selected_card_indices = []
-            self.update_selection_count()
-            self.delete_selected_btn.config(state="disabled")
+            # 刷新显示并清空选中状态
+            self.after_edit()
             
             messagebox.showinfo("成功", "默认卡组已恢复")
     
+    @instrumented
     def create_editable_card_display(self):
         """创建可编辑的卡牌显示"""
-        # 清空现有的卡牌显示
-        for widget in self.card_frame.winfo_children():
-            widget.destroy()
-        
         # 获取当前卡组的卡牌
         current_group = self.card_groups[self.current_group_index]
         cards = current_group["cards"]
@@ -621,43 +1231,32 @@ class CardDrawer:
         
         # 创建卡牌显示
         self.editable_card_buttons = []
+        self.editable_labels = []
+        self.editable_group = current_group
+        self.add_card_button = None
+        
+        # 大卡组：在画布上虚拟化绘制，末尾附加"+"格子
+        if self.use_virtual_grid(cards):
+            self.virtual_grid.show(cards, self.cards_per_row,
+                                   font=self.styles.font("edit"),
+                                   extra_cells=1, top=self.canvas.yview()[0])
+            self.discard_group_grids(current_group)
+            return
+        
+        # 换上新的卡牌框架；编辑会改变卡牌，当前卡组缓存的网格随之作废
+        self.replace_card_frame()
+        self.discard_group_grids(current_group)
         
-        row_frame = None
         for i, card in enumerate(cards):
-            row = i // self.cards_per_row
-            col = i % self.cards_per_row
-            
-            # 每行创建一个框架
-            if col == 0:
-                row_frame = tk.Frame(self.card_frame, bg="#f0f0f0")
-                row_frame.pack(expand=True, fill=tk.X, padx=10, pady=5)
-            
-            # 创建卡牌编辑按钮
-            btn = self.create_editable_card_button(row_frame, card, i)
-            btn.pack(side=tk.LEFT, padx=2, pady=2)
+            # 创建卡牌编辑按钮，按索引放入网格
+            btn = self.create_editable_card_button(self.card_frame, card, i)
+            self.place_card_widget(btn, i)
             self.editable_card_buttons.append(btn)
+            self.editable_labels.append(card)
         
-        # 添加"添加新卡牌"按钮
-        if cards:
-            # 计算最后一行剩余的空白位置
-            remaining_cards = len(cards) % self.cards_per_row
-            if remaining_cards == 0:
-                remaining_cards = self.cards_per_row
-            empty_slots = self.cards_per_row - remaining_cards
-        else:
-            empty_slots = self.cards_per_row
-        
-        add_card_frame = tk.Frame(self.card_frame, bg="#f0f0f0")
-        add_card_frame.pack(expand=True, fill=tk.X, padx=10, pady=5)
-        
-        # 添加空白占位使添加按钮居中
-        for _ in range(empty_slots):
-            empty_label = tk.Label(add_card_frame, text="", width=6)
-            empty_label.pack(side=tk.LEFT, padx=2, pady=2)
-        
-        # 添加"+"按钮
+        # 添加"+"按钮（紧跟在最后一张卡牌之后）
         add_btn = tk.Button(
-            add_card_frame,
+            self.card_frame,
             text="+",
             command=self.add_new_card,
             font=("Noto Sans", 14, "bold"),
@@ -669,22 +1268,15 @@ class CardDrawer:
             bd=2,
             cursor="hand2"
         )
-        add_btn.pack(side=tk.LEFT, padx=2, pady=2)
+        self.place_card_widget(add_btn, len(cards))
+        self.add_card_button = add_btn
         
         # 更新滚动区域
         self.update_canvas_scrollregion()
     
     def create_editable_card_button(self, parent, card, index):
         """创建可编辑的卡牌按钮"""
-        # 确定颜色
-        if card == "大王":
-            color = "red"
-        elif card == "小王":
-            color = "black"
-        elif card.endswith('♥') or card.endswith('♦'):
-            color = "red"
-        else:
-            color = "black"
+        color = self.styles.color(card)
         
         # 创建按钮框架
         frame = tk.Frame(parent, bg="#f0f0f0")
@@ -693,19 +1285,18 @@ class CardDrawer:
         card_btn = tk.Button(
             frame,
             text=card,
-            font=("Microsoft YaHei", 10, "bold"),
+            font=self.styles.font("edit"),
             width=6,
             height=2,
-            bg="white",
-            fg=color,
-            relief=tk.RAISED,
             bd=1,
+            **self.styles.button_style(color),
             cursor="hand2"
         )
         card_btn.pack()
         
         # 绑定左键点击事件（多选/取消多选）
         card_btn.bind("<Button-1>", lambda e, idx=index: self.select_card_for_editing(idx))
+        card_btn.bind("<Shift-Button-1>", lambda e, idx=index: self.select_card_range(idx))
         
         # 绑定右键点击事件（弹出菜单）
         card_btn.bind("<Button-3>", lambda e, idx=index: self.show_card_context_menu(e, idx))
@@ -719,15 +1310,53 @@ class CardDrawer:
         
         if card_index in self.selected_card_indices:
             # 如果已选中，则取消选择
-            self.selected_card_indices.remove(card_index)
+            self.selected_card_indices.discard(card_index)
             # 更新按钮颜色
             self.update_card_button_selection(card_index, False)
         else:
             # 如果未选中，则选中
-            self.selected_card_indices.append(card_index)
+            self.selected_card_indices.add(card_index)
             # 更新按钮颜色
             self.update_card_button_selection(card_index, True)
+        self.selection_anchor = card_index
         
+        self.update_selection_state()
+    
+    def select_card_range(self, card_index):
+        """Shift+左键：选中从上次点击的卡牌到这张卡牌之间的所有卡牌"""
+        if not self.edit_mode:
+            return
+        if self.selection_anchor is None:
+            self.select_card_for_editing(card_index)
+            return
+        
+        low, high = sorted((self.selection_anchor, card_index))
+        added = set(range(low, high + 1)) - self.selected_card_indices
+        self.selected_card_indices |= added
+        for index in added:
+            self.update_card_button_selection(index, True)
+        self.update_selection_state()
+    
+    def select_all_cards(self):
+        """选中当前卡组的所有卡牌"""
+        cards = self.card_groups[self.current_group_index]["cards"]
+        added = set(range(len(cards))) - self.selected_card_indices
+        self.selected_card_indices |= added
+        for index in added:
+            self.update_card_button_selection(index, True)
+        self.update_selection_state()
+    
+    def clear_card_selection(self):
+        """取消所有选中（只重绘之前选中的卡牌）"""
+        previous = self.selected_card_indices
+        self.selected_card_indices = set()
+        self.selection_anchor = None
+        for index in previous:
+            self.update_card_button_selection(index, False)
+        self.update_selection_state()
+    
+    def update_selection_state(self):
+        """更新选中计数和删除选中按钮状态"""
         # 更新选中计数显示
         self.update_selection_count()
         
@@ -739,32 +1368,22 @@ class CardDrawer:
     
     def update_card_button_selection(self, card_index, selected):
         """更新卡牌按钮的选中状态显示"""
+        if self.virtual_grid.active:
+            self.virtual_grid.repaint([card_index])
+            return
+        
         if not hasattr(self, 'editable_card_buttons'):
             return
         
-        if 0 <= card_index < len(self.editable_card_buttons):
+        # 编辑后卡组可能已经变短而按钮尚未刷新：多出的按钮留给 refresh_editable_card_display 处理
+        current_group = self.card_groups[self.current_group_index]
+        if 0 <= card_index < min(len(self.editable_card_buttons), len(current_group["cards"])):
             card_frame = self.editable_card_buttons[card_index]
             card_btn = card_frame.winfo_children()[0]  # 获取按钮
             
-            # 获取卡牌文本以确定颜色
-            current_group = self.card_groups[self.current_group_index]
-            card = current_group["cards"][card_index]
-            
-            if card == "大王":
-                color = "red"
-            elif card == "小王":
-                color = "black"
-            elif card.endswith('♥') or card.endswith('♦'):
-                color = "red"
-            else:
-                color = "black"
-            
-            if selected:
-                # 选中状态：背景色为黄色，字体颜色不变
-                card_btn.config(bg="#FFD700", fg=color)
-            else:
-                # 未选中状态：恢复正常颜色
-                card_btn.config(bg="white", fg=color)
+            # 选中状态背景为黄色，文字颜色不变
+            color = self.styles.color_at(current_group["cards"], card_index)
+            card_btn.config(**self.styles.button_style(color, "selected" if selected else "normal"))
     
     def update_selection_count(self):
         """更新选中卡牌数量显示"""
@@ -812,16 +1431,11 @@ class CardDrawer:
         )
         
         if new_name and new_name.strip():
-            # 更新卡牌名称
-            current_group["cards"][card_index] = new_name.strip()
-            
-            # 刷新显示
-            self.create_editable_card_display()
+            # 更新卡牌名称（可撤销）
+            self.edit_history().rename(card_index, new_name.strip())
             
-            # 清空选中状态
-            self.selected_card_indices = []
-            self.update_selection_count()
-            self.delete_selected_btn.config(state="disabled")
+            # 刷新显示并清空选中状态
+            self.after_edit()
             
             messagebox.showinfo("成功", "卡牌已重命名")
     
@@ -834,18 +1448,11 @@ class CardDrawer:
         )
         
         if confirm:
-            current_group = self.card_groups[self.current_group_index]
-            
-            # 删除卡牌
-            del current_group["cards"][card_index]
-            
-            # 刷新显示
-            self.create_editable_card_display()
+            # 删除卡牌（可撤销）
+            self.edit_history().delete([card_index])
             
-            # 清空选中状态
-            self.selected_card_indices = []
-            self.update_selection_count()
-            self.delete_selected_btn.config(state="disabled")
+            # 刷新显示并清空选中状态
+            self.after_edit()
             
             messagebox.showinfo("成功", "卡牌已删除")
     
@@ -863,20 +1470,15 @@ class CardDrawer:
         if confirm:
             current_group = self.card_groups[self.current_group_index]
             
-            # 按从大到小的顺序删除，避免索引变化
-            for index in sorted(self.selected_card_indices, reverse=True):
-                if 0 <= index < len(current_group["cards"]):
-                    del current_group["cards"][index]
-            
-            # 刷新显示
-            self.create_editable_card_display()
+            # 一次遍历删除所有选中的卡牌（可整体撤销）
+            indices = [index for index in self.selected_card_indices
+                       if 0 <= index < len(current_group["cards"])]
+            self.edit_history().delete(indices)
             
-            # 清空选中状态
-            self.selected_card_indices = []
-            self.update_selection_count()
-            self.delete_selected_btn.config(state="disabled")
+            # 刷新显示并清空选中状态
+            self.after_edit()
             
-            messagebox.showinfo("成功", f"已删除 {len(self.selected_card_indices)} 张卡牌")
+            messagebox.showinfo("成功", f"已删除 {len(indices)} 张卡牌")
     
     def add_new_card(self):
         """添加新卡牌"""
@@ -888,27 +1490,156 @@ class CardDrawer:
         )
         
         if new_card and new_card.strip():
-            current_group = self.card_groups[self.current_group_index]
-            
-            # 添加新卡牌
-            current_group["cards"].append(new_card.strip())
+            # 添加新卡牌（可撤销）
+            self.edit_history().append(new_card.strip())
             
             # 刷新显示
-            self.create_editable_card_display()
+            self.after_edit(clear_selection=False)
             
             messagebox.showinfo("成功", "新卡牌已添加")
     
+    def edit_history(self):
+        """当前卡组的编辑历史"""
+        current_group = self.card_groups[self.current_group_index]
+        history = self.edit_histories.get(id(current_group))
+        if history is None:
+            history = self.edit_histories[id(current_group)] = EditHistory(current_group)
+        return history
+    
+    def after_edit(self, clear_selection=True):
+        """编辑操作之后：登记一次卡牌显示刷新（只更新变化的按钮），并（默认）清空选中状态"""
+        self.invalidate("grid")
+        self.update_undo_buttons()
+        if clear_selection:
+            self.clear_card_selection()
+    
+    def refresh_editable_card_display(self):
+        """增量刷新可编辑的卡牌显示
+        
+        同一卡组再次刷新时复用已有按钮：名称变化的按钮只改文字和颜色，
+        卡牌变多时在末尾新建按钮，变少时销毁多余的按钮，再把"+"按钮移到末尾。
+        大卡组的虚拟网格原地更新，保持滚动位置；其他情况（换了卡组、在按钮和虚拟网格之间切换）完整重建。
+        """
+        current_group = self.card_groups[self.current_group_index]
+        cards = current_group["cards"]
+        if (self.editable_group is current_group and self.virtual_grid.active
+                and len(cards) >= self.VIRTUAL_GRID_THRESHOLD):
+            self.virtual_grid.reload(cards)
+            return
+        if (self.editable_group is not current_group or self.virtual_grid.active
+                or self.add_card_button is None
+                or len(cards) >= self.VIRTUAL_GRID_THRESHOLD):
+            self.create_editable_card_display()
+            return
+        
+        names = list(cards)
+        labels = self.editable_labels
+        buttons = self.editable_card_buttons
+        for i in range(min(len(labels), len(names))):
+            if labels[i] != names[i]:
+                labels[i] = names[i]
+                card_btn = buttons[i].winfo_children()[0]
+                card_btn.config(text=names[i])
+                self.update_card_button_selection(i, i in self.selected_card_indices)
+        for i in range(len(labels), len(names)):
+            btn = self.create_editable_card_button(self.card_frame, names[i], i)
+            self.place_card_widget(btn, i)
+            buttons.append(btn)
+            labels.append(names[i])
+        for btn in buttons[len(names):]:
+            btn.destroy()
+        del buttons[len(names):]
+        del labels[len(names):]
+        self.place_card_widget(self.add_card_button, len(names))
+        
+        self.update_canvas_scrollregion()
+    
+    def rename_cards_by_pattern(self):
+        """按正则表达式重命名所有匹配的卡牌"""
+        pattern = simpledialog.askstring("按规则重命名", "匹配规则（正则表达式）:", parent=self.root)
+        if not pattern:
+            return
+        replacement = simpledialog.askstring("按规则重命名", "替换为（可用 \\1 引用分组）:",
+                                             parent=self.root)
+        if replacement is None:
+            return
+        try:
+            edit = self.edit_history().rename_matching(pattern, replacement)
+        except re.error as e:
+            messagebox.showerror("错误", f"匹配规则无效: {str(e)}")
+            return
+        self.report_batch_edit(edit, "没有匹配的卡牌")
+    
+    def replace_all_cards(self):
+        """把某种牌全部替换为另一种牌"""
+        old_name = simpledialog.askstring("全部替换", "要替换的卡牌名称:", parent=self.root)
+        if not old_name or not old_name.strip():
+            return
+        new_name = simpledialog.askstring("全部替换", "替换为:", parent=self.root)
+        if not new_name or not new_name.strip():
+            return
+        edit = self.edit_history().replace_all(old_name.strip(), new_name.strip())
+        self.report_batch_edit(edit, f"卡组中没有 {old_name.strip()}")
+    
+    def insert_many_cards(self):
+        """一次添加多张卡牌（插入到第一张选中的卡牌之前，没有选中时添加到末尾）"""
+        text = simpledialog.askstring("批量添加", "新卡牌名称（用空格或逗号分隔）:", parent=self.root)
+        if not text:
+            return
+        names = [name for name in re.split(r"[\s,，]+", text) if name]
+        if not names:
+            return
+        cards = self.card_groups[self.current_group_index]["cards"]
+        index = min(self.selected_card_indices) if self.selected_card_indices else len(cards)
+        self.report_batch_edit(self.edit_history().insert(index, names, "批量添加"), "")
+    
+    def dedupe_cards(self):
+        """去除重复的卡牌（每种牌保留第一张）"""
+        self.report_batch_edit(self.edit_history().dedupe(), "卡组中没有重复的卡牌")
+    
+    def report_batch_edit(self, edit, empty_message):
+        """批量操作之后刷新显示并提示结果"""
+        if edit is None:
+            messagebox.showinfo("提示", empty_message)
+            return
+        self.after_edit()
+        messagebox.showinfo("成功", f"{edit.label}: 共 {len(edit.positions)} 张卡牌")
+    
+    def update_undo_buttons(self):
+        """根据编辑历史启用或禁用撤销/重做按钮"""
+        history = self.edit_history()
+        self.undo_btn.config(state="normal" if history.can_undo else "disabled")
+        self.redo_btn.config(state="normal" if history.can_redo else "disabled")
+    
+    def undo_edit(self, event=None):
+        """撤销上一次编辑"""
+        if self.edit_mode and self.edit_history().undo() is not None:
+            self.after_edit()
+    
+    def redo_edit(self, event=None):
+        """重做上一次撤销的编辑"""
+        if self.edit_mode and self.edit_history().redo() is not None:
+            self.after_edit()
+    
     def save_and_exit_edit_mode(self):
         """保存并退出编辑模式"""
         self.edit_mode = False
+        self.root.unbind("<Control-z>")
+        self.root.unbind("<Control-y>")
         
         # 清空选中状态
-        self.selected_card_indices = []
+        self.selected_card_indices = set()
+        self.selection_anchor = None
+        self.editable_group = None
         
         # 清空抽取状态（因为卡牌可能被修改）
-        self.drawn_indices = []  # 新增
-        self.current_card = None
-        self.current_card_index = None  # 新增
+        self.engine.reset()
+        
+        # 把修改后的卡组写入卡组库（一个事务），旧的抽牌日志随之作废
+        current_group = self.card_groups[self.current_group_index]
+        with self.store.transaction():
+            self.store.save_group(current_group)
+        self.discard_group_journals(current_group)
         
         # 移除编辑工具栏
         if hasattr(self, 'edit_toolbar_frame'):
@@ -924,18 +1655,8 @@ class CardDrawer:
         self.draw_button.config(state="normal")
         self.reset_button.config(state="disabled")  # 重置按钮在未抽取牌时禁用
         
-        # 更新组按钮状态
-        self.update_group_buttons_state()
-        
-        # 重新创建正常的卡牌显示
-        self.update_card_display_from_group()
-        
-        # 更新状态标签
-        current_group = self.card_groups[self.current_group_index]
-        card_count = len(current_group["cards"])
-        self.status_label.config(
-            text=f"当前: {current_group['name']} ({card_count}张)"
-        )
+        # 登记刷新：组按钮状态、正常的卡牌显示、状态标签
+        self.invalidate("grid", "status", "buttons")
         
         messagebox.showinfo("成功", "卡组修改已保存")
     
@@ -953,6 +1674,14 @@ class CardDrawer:
                             font=("Noto Sans", 14), pady=10)
         title_label.pack()
         
+        # 合并显示：重复的牌只显示一格并标出剩余张数（适合麻将等每种牌有多张的卡组）
+        self.counted_view = tk.BooleanVar(value=False)
+        tk.Checkbutton(container,
+                       text="合并相同卡牌（显示剩余张数，右键放回一张）",
+                       variable=self.counted_view,
+                       command=self.on_counted_view_toggled,
+                       font=("Noto Sans", 10)).pack(pady=(0, 5))
+        
         # 2. 创建滚动容器框架
         scroll_container = tk.Frame(container)
         scroll_container.pack(expand=True, fill=tk.BOTH)
@@ -966,7 +1695,7 @@ class CardDrawer:
                             bg="#f0f0f0", 
                             relief=tk.RIDGE, 
                             bd=2,
-                            yscrollcommand=self.v_scrollbar.set,
+                            yscrollcommand=self._on_canvas_yscroll,
                             xscrollcommand=self.h_scrollbar.set)
         
         # 5. 配置滚动条
@@ -982,14 +1711,21 @@ class CardDrawer:
         scroll_container.grid_rowconfigure(0, weight=1)
         scroll_container.grid_columnconfigure(0, weight=1)
         
-        # 8. 创建卡牌框架（放在画布中）
-        self.card_frame = tk.Frame(self.canvas, bg="#f0f0f0")
+        # 8. 创建卡牌框架（放在画布中，卡牌按钮用grid排布，便于原地重新排布）
+        #    每个卡组有自己的框架，切换卡组时只替换画布窗口中显示的框架
+        self.card_frame = self.create_card_frame()
         self.canvas_frame_id = self.canvas.create_window((0, 0), 
                                                         window=self.card_frame, 
                                                         anchor="nw")
         
-        # 9. 绑定配置事件，更新滚动区域
-        self.card_frame.bind("<Configure>", self._configure_frame)
+        # 9. 虚拟化网格（大卡组时直接在画布上绘制）
+        self.virtual_grid = VirtualCardGrid(
+            self.canvas,
+            self.card_cell_style,
+            on_click=self.on_virtual_card_click,
+            on_right_click=self.on_virtual_card_right_click,
+            label_fn=self.card_label
+        )
         
         # 10. 绑定画布大小变化事件
         self.canvas.bind("<Configure>", self._configure_canvas)
@@ -1001,8 +1737,16 @@ class CardDrawer:
         # 绑定滚轮事件到画布
         self.canvas.bind_all("<MouseWheel>", _on_mousewheel)  # Windows
     
+    def _on_canvas_yscroll(self, first, last):
+        """画布垂直滚动时同步滚动条，并让虚拟网格补绘新露出的行"""
+        self.v_scrollbar.set(first, last)
+        self.virtual_grid.refresh()
+    
     def _configure_frame(self, event):
         """更新画布的滚动区域"""
+        if self.virtual_grid.active:
+            return
+        
         # 更新画布的滚动区域
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
         
@@ -1011,18 +1755,20 @@ class CardDrawer:
         if canvas_width > 0:
             self.canvas.itemconfig(self.canvas_frame_id, width=canvas_width)
     
+    @instrumented
     def _configure_canvas(self, event):
         """当画布大小变化时，调整卡牌框架宽度"""
         self.canvas.itemconfig(self.canvas_frame_id, width=event.width)
         
-        # 窗口大小变化时重新计算卡牌布局
-        if self.edit_mode:
-            self.create_editable_card_display()
-        else:
-            self.update_card_display_from_group()
+        # 窗口大小变化时重新计算卡牌布局（合并到空闲时执行一次）
+        self.schedule_reflow()
     
     def calculate_cards_per_row(self):
         """计算每行可以显示的卡牌数量"""
+        self.cards_per_row = self.compute_cards_per_row()
+    
+    def compute_cards_per_row(self):
+        """根据画布宽度计算每行可以容纳的卡牌数量（不修改当前布局）"""
         # 计算每行可以显示的卡牌数量（基于窗口宽度）
         # 每个卡牌按钮的宽度大约为80像素，加上内边距
         button_width = 80
@@ -1033,167 +1779,427 @@ class CardDrawer:
             canvas_width = self.canvas.winfo_width()
             if canvas_width > 0:
                 # 计算可以容纳的卡牌数量（至少1张）
-                self.cards_per_row = max(1, (canvas_width - padding) // button_width)
+                return max(1, (canvas_width - padding) // button_width)
+        return 13  # 默认值
+    
+    def place_card_widget(self, widget, index):
+        """按索引把卡牌控件放到网格中的对应位置"""
+        row, col = divmod(index, self.cards_per_row)
+        widget.grid(row=row, column=col, padx=2, pady=6)
+    
+    def schedule_reflow(self):
+        """合并连续的尺寸变化事件，在事件循环空闲时只重新排布一次"""
+        if self._reflow_pending is None:
+            self._reflow_pending = self.root.after_idle(self.reflow_card_grid)
+    
+    def reflow_card_grid(self):
+        """每行卡牌数量变化时原地重新排布现有控件（不重建控件，保留抽取状态）"""
+        self._reflow_pending = None
+        columns = self.compute_cards_per_row()
+        
+        if self.virtual_grid.active:
+            # 虚拟网格：列数不变时只需补绘高度变化后露出的行
+            if columns == self.cards_per_row:
+                self.virtual_grid.update_scrollregion()
+                self.virtual_grid.refresh()
             else:
-                self.cards_per_row = 13  # 默认值
+                self.cards_per_row = columns
+                self.virtual_grid.set_columns(columns)
+            return
+        
+        if columns == self.cards_per_row:
+            return
+        self.cards_per_row = columns
+        if self.grid_entry is not None:
+            self.grid_entry["columns"] = columns
+        
+        if self.edit_mode:
+            widgets = self.editable_card_buttons
         else:
-            self.cards_per_row = 13  # 默认值
+            widgets = [card_info["button"] for card_info in self.card_buttons]
+        for i, widget in enumerate(widgets):
+            self.place_card_widget(widget, i)
+        if self.edit_mode and self.add_card_button is not None:
+            self.place_card_widget(self.add_card_button, len(widgets))
+        
+        self.update_canvas_scrollregion()
     
     def update_canvas_scrollregion(self):
         """手动更新画布的滚动区域"""
+        if self.virtual_grid.active:
+            self.virtual_grid.update_scrollregion()
+            return
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
     
-    def update_card_display_from_group(self):
-        """从当前卡组更新卡牌显示"""
-        # 清空现有的卡牌显示
-        for widget in self.card_frame.winfo_children():
-            widget.destroy()
+    def use_virtual_grid(self, cards):
+        """判断是否用虚拟化网格显示卡牌；是则隐藏卡牌框架"""
+        if len(cards) < self.VIRTUAL_GRID_THRESHOLD:
+            return False
+        self.canvas.itemconfigure(self.canvas_frame_id, state="hidden")
+        return True
+    
+    def show_card_frame(self):
+        """停用虚拟化网格，在画布中显示当前的卡牌框架"""
+        self.virtual_grid.hide()
+        self.canvas.itemconfigure(self.canvas_frame_id, window=self.card_frame,
+                                  state="normal")
+    
+    def create_card_frame(self):
+        """创建一个放在画布中的卡牌框架（尚未显示）"""
+        frame = tk.Frame(self.canvas, bg="#f0f0f0", padx=8, pady=3)
         
+        # 绑定配置事件，更新滚动区域
+        frame.bind("<Configure>", self._configure_frame)
+        return frame
+    
+    def replace_card_frame(self):
+        """换上一个新的空卡牌框架；旧框架不在缓存中时销毁"""
+        old_frame = self.card_frame
+        self.card_frame = self.create_card_frame()
+        self.show_card_frame()
+        if not self.grid_cache.holds_frame(old_frame):
+            old_frame.destroy()
+    
+    def _destroy_cached_grid(self, entry):
+        """网格缓存淘汰回调：销毁不再显示的卡牌框架，写入并关闭会话日志"""
+        if entry["journal"] is not None:
+            entry["journal"].close()
+        frame = entry["frame"]
+        if frame is not None and frame is not self.card_frame:
+            frame.destroy()
+        if entry is self.grid_entry:
+            self.grid_entry = None
+    
+    def card_cell_style(self, index):
+        """虚拟网格中格子的样式：(背景色, 文字颜色, 边框颜色)"""
+        styles = self.styles
+        if self.edit_mode:
+            color = styles.color_at(self.card_groups[self.current_group_index]["cards"], index)
+            return styles.cell_style(color, "selected" if index in self.selected_card_indices else "normal")
+        color = styles.color_at(self.engine.cards, index)
+        return styles.cell_style(color, "drawn" if self.engine.is_drawn(index) else "normal")
+    
+    def on_virtual_card_click(self, index, event):
+        """虚拟网格左键：普通模式切换状态，编辑模式多选或添加新卡牌"""
+        if self.edit_mode:
+            if index >= len(self.virtual_grid.cards):
+                self.add_new_card()
+            elif event.state & 0x0001:  # 按住 Shift：范围选择
+                self.select_card_range(index)
+            else:
+                self.select_card_for_editing(index)
+        else:
+            self.toggle_card(index)
+    
+    def on_virtual_card_right_click(self, index, event):
+        """虚拟网格右键：编辑模式下弹出卡牌菜单，合并显示时放回一张"""
+        if self.edit_mode:
+            if index < len(self.virtual_grid.cards):
+                self.show_card_context_menu(event, index)
+        elif self.is_counted_view():
+            self.put_back_card(index)
+    
+    def is_counted_view(self):
+        """当前是否以合并相同卡牌的方式显示"""
+        return not self.edit_mode and isinstance(self.engine, CountedDeckEngine)
+    
+    def card_label(self, index):
+        """卡牌格子上显示的文字：合并显示时附带剩余张数"""
+        card = self.engine.cards[index]
+        if self.is_counted_view():
+            return f"{card}\n×{self.engine.remaining_of(index)}"
+        return card
+    
+    def on_counted_view_toggled(self):
+        """切换是否合并显示相同卡牌"""
+        if not self.edit_mode:
+            self.remember_grid_view()
+            # 两种显示方式各有一个引擎：切换后把抽取状态带到另一种显示
+            if self.grid_entry is not None:
+                self._carry_from = (self.card_groups[self.current_group_index], self.engine)
+            self.invalidate("grid", "status")
+    
+    def carry_draw_state(self):
+        """切换合并显示后，把原显示方式的抽取状态换算到当前引擎"""
+        carry, self._carry_from = self._carry_from, None
+        if carry is None:
+            return
+        group, source = carry
+        if group is not self.card_groups[self.current_group_index] or source is self.engine:
+            return
+        transfer_draw_state(source, self.engine)
+        self.record_journal()
+        entry = self.grid_entry
+        entry["deal"] = None
+        entry["composition"] = RemainingComposition(self.engine)
+        self.update_card_buttons()
+    
+    def discard_group_grids(self, group):
+        """丢弃某个卡组缓存的所有网格（逐张显示和合并显示）"""
+        for counted in (False, True):
+            self.grid_cache.pop((id(group), counted))
+    
+    def journal_path(self, group, counted):
+        """卡组会话日志的文件路径；不记录日志时返回 None"""
+        if self.journal_dir is None or group.get("store_id") is None:
+            return None
+        suffix = "-counted" if counted else ""
+        return os.path.join(self.journal_dir, f"{group['store_id']}{suffix}.journal")
+    
+    def open_journal(self, group, counted):
+        """为刚创建的引擎打开会话日志，并恢复上次意外退出前的状态
+        
+        返回 (日志, 是否恢复了状态)；无法写日志时日志为 None。
+        """
+        path = self.journal_path(group, counted)
+        if path is None:
+            return None, False
+        journal = SessionJournal(path, deck_fingerprint(group["cards"]))
+        recovered = journal.recover(self.engine)
+        try:
+            journal.attach(self.engine)
+        except OSError as e:
+            print(f"无法写入抽牌日志: {e}")
+            return None, recovered
+        return journal, recovered
+    
+    def record_journal(self):
+        """把当前引擎的新操作追加到会话日志的缓冲区（不等待磁盘）"""
+        entry = self.grid_entry
+        if entry is not None and entry["journal"] is not None:
+            entry["journal"].sync()
+    
+    def flush_journals(self):
+        """定时任务：把所有缓存卡组的会话日志写入磁盘"""
+        for entry in self.grid_cache.entries():
+            if entry["journal"] is not None:
+                try:
+                    entry["journal"].flush()
+                except OSError as e:
+                    print(f"写入抽牌日志时出错: {e}")
+        self.root.after(self.JOURNAL_FLUSH_MS, self.flush_journals)
+    
+    def discard_group_journals(self, group):
+        """删除卡组的会话日志文件（卡组被修改或删除时调用；删除失败只提示，不中断保存）"""
+        for counted in (False, True):
+            path = self.journal_path(group, counted)
+            if path is None:
+                continue
+            try:
+                SessionJournal(path, deck_fingerprint(group["cards"])).discard()
+            except OSError as e:
+                print(f"无法删除抽牌日志: {e}")
+    
+    def on_close(self):
+        """关闭窗口：停止模拟、写入并关闭所有会话日志后退出"""
+        self.watchdog.stop()
+        # 正在模拟时取消剩余分片并等工作进程退出，不留下进程和定时查询
+        runner = getattr(self, 'simulation_runner', None)
+        if runner is not None:
+            runner.cancel(wait=True)
+        if getattr(self, 'simulation_window', None) is not None:
+            self.close_simulation_window()
+        for entry in self.grid_cache.entries():
+            if entry["journal"] is not None:
+                entry["journal"].close()
+        self.store.close()
+        self.root.destroy()
+    
+    @instrumented
+    def update_card_display_from_group(self):
+        """从当前卡组更新卡牌显示（最近使用过的卡组直接从缓存换入）"""
         # 获取当前卡组的卡牌
         current_group = self.card_groups[self.current_group_index]
         cards = current_group["cards"]
-        
-        # 重置抽取状态
-        self.drawn_indices = []  # 修改：使用索引列表
-        self.current_card = None
-        self.current_card_index = None  # 新增
+        counted = self.counted_view.get()
+        key = (id(current_group), counted)
         
         # 计算每行显示的卡牌数量
         self.calculate_cards_per_row()
         
+        # 缓存命中：换入已建好的网格和该卡组的抽取引擎
+        entry = self.grid_cache.get(key)
+        if entry is not None and entry["cards"] is cards and entry["deck_len"] == len(cards):
+            self.show_cached_grid(entry)
+            return
+        
+        # 重置抽取状态（为当前卡组创建新的引擎）
+        # 合并显示时引擎按每种牌的剩余张数抽取，格子数只与牌的种数有关
+        engine_class = CountedDeckEngine if counted else DeckEngine
+        self.engine = engine_class(cards, rng=make_rng(self.rng_backend, self.rng_seed))
+        shown = self.engine.cards
+        # 为本卡组的每种牌预先算好颜色，之后的重绘都只查表
+        self.styles.prepare(shown)
+        
+        # 会话日志：恢复上次意外退出前的抽取状态，之后的操作都追加到日志
+        journal, recovered = self.open_journal(current_group, counted)
+        
         # 创建卡牌按钮
         self.card_buttons = []
-        row_frame = None
+        entry = {
+            "frame": None,
+            "card_buttons": self.card_buttons,
+            "engine": self.engine,
+            "cards": cards,
+            "deck_len": len(cards),
+            "columns": self.cards_per_row,
+            "widgets": 0,
+            "journal": journal,
+            "deal": None,  # 最近一次发牌的 (各玩家手牌, 底牌)
+            "composition": RemainingComposition(self.engine),  # 牌堆剩余构成（含恢复的状态）
+            "yview": 0.0  # 离开该网格时的滚动位置
+        }
         
-        for i, card in enumerate(cards):  # 注意：这里使用了enumerate获取索引
-            row = i // self.cards_per_row
-            col = i % self.cards_per_row
-            
-            # 每行创建一个框架
-            if col == 0:
-                row_frame = tk.Frame(self.card_frame, bg="#f0f0f0")
-                row_frame.pack(expand=True, fill=tk.X, padx=10, pady=5)
-            
-            # 创建卡牌按钮，传递索引i
-            btn = self.create_normal_card_button(row_frame, card, i)  # 传递索引i
-            btn.pack(side=tk.LEFT, padx=2, pady=2)
-            self.card_buttons.append({"card": card, "button": btn})
+        # 大卡组：在画布上虚拟化绘制，不创建按钮
+        if self.use_virtual_grid(shown):
+            self.virtual_grid.show(shown, self.cards_per_row,
+                                   font=self.styles.font("normal"),
+                                   label_fn=self.card_label)
+        else:
+            self.replace_card_frame()
+            for i, card in enumerate(shown):  # 注意：这里使用了enumerate获取索引
+                # 创建卡牌按钮，传递索引i，并按索引放入网格
+                btn = self.create_normal_card_button(self.card_frame, card, i)  # 传递索引i
+                if counted:
+                    btn.config(text=self.card_label(i))
+                    btn.bind("<Button-3>", lambda e, idx=i: self.put_back_card(idx))
+                self.place_card_widget(btn, i)
+                self.card_buttons.append({"card": card, "button": btn})
+            entry["frame"] = self.card_frame
+            entry["widgets"] = len(shown) + 1
+        
+        self.grid_entry = entry
+        self.grid_cache.put(key, entry)
+        
+        # 从日志恢复了抽取状态时按恢复后的状态重绘
+        if recovered:
+            self.update_card_buttons()
         
         # 更新滚动区域
         self.update_canvas_scrollregion()
     
+    def show_cached_grid(self, entry):
+        """换入缓存的网格；列数变化时原地重新排布"""
+        self.grid_entry = entry
+        self.engine = entry["engine"]
+        self.card_buttons = entry["card_buttons"]
+        self.engine.pop_dirty()
+        
+        if entry["frame"] is None:
+            self.use_virtual_grid(self.engine.cards)
+            self.virtual_grid.show(self.engine.cards, self.cards_per_row,
+                                   font=self.styles.font("normal"),
+                                   label_fn=self.card_label, top=entry["yview"])
+        else:
+            self.card_frame = entry["frame"]
+            self.show_card_frame()
+            if entry["columns"] != self.cards_per_row:
+                for i, card_info in enumerate(self.card_buttons):
+                    self.place_card_widget(card_info["button"], i)
+        entry["columns"] = self.cards_per_row
+        
+        self.update_canvas_scrollregion()
+        if entry["frame"] is not None:
+            self.canvas.yview_moveto(entry["yview"])
+    
     def create_normal_card_button(self, parent, card, card_index):
         """创建普通模式下的卡牌按钮"""
-        # 确定颜色
-        if card == "大王":
-            color = "red"
-        elif card == "小王":
-            color = "black"
-        elif card.endswith('♥') or card.endswith('♦'):
-            color = "red"
-        else:
-            color = "black"
+        color = self.styles.color(card)
         
         # 创建按钮
         btn = tk.Button(
             parent,
             text=card,
             command=lambda idx=card_index: self.toggle_card(idx),  # 使用索引
-            font=("Microsoft YaHei", 12, "bold"),
+            font=self.styles.font("normal"),
             width=6,
             height=2,
-            relief=tk.RAISED,
             bd=2,
-            bg="white",
-            fg=color,
+            **self.styles.button_style(color),
             activebackground="#e0e0e0",
             cursor="hand2"
         )
         
         return btn
     
+    @instrumented
     def on_window_resize(self, event):
         """窗口大小变化时的处理函数"""
-        # 仅在宽度变化时重新布局（避免频繁重绘）
-        if hasattr(self, 'last_width'):
-            if abs(self.last_width - self.root.winfo_width()) > 50:  # 宽度变化超过50像素才重新布局
-                if self.edit_mode:
-                    self.create_editable_card_display()
-                else:
-                    self.update_card_display_from_group()
-                self.last_width = self.root.winfo_width()
-        else:
-            self.last_width = self.root.winfo_width()
+        # 只登记一次重新排布，真正的排布在空闲时进行且仅在列数变化时移动控件
+        if event.widget is self.root:
+            self.schedule_reflow()
     
+    @instrumented
     def toggle_card(self, card_index):
         """切换卡牌状态（点击事件）"""
         if self.edit_mode:
             return  # 编辑模式下禁用切换功能
         
-        # 获取当前卡组的所有卡牌
-        current_group = self.card_groups[self.current_group_index]
-        
-        # 确保索引在有效范围内
-        if 0 <= card_index < len(current_group["cards"]):
-            card = current_group["cards"][card_index]
-            
-            if card_index in self.drawn_indices:
-                # 如果已抽取，则放回
-                self.drawn_indices.remove(card_index)
-            else:
-                # 如果未抽取，则抽取
-                self.drawn_indices.append(card_index)
-            
-            # 设置当前牌为点击的牌
-            self.current_card = card
-            self.current_card_index = card_index  # 保存当前牌的索引
+        # 确保索引在有效范围内（合并显示时索引指第几种牌）
+        if 0 <= card_index < len(self.engine.cards):
+            # 已抽取则放回，未抽取则抽取，并设置当前牌为点击的牌
+            # 合并显示时：还有剩余则取出一张，已取完则全部放回
+            self.engine.toggle(card_index)
+            self.record_journal()
             
             # 更新当前牌显示
             self.update_current_card_display()
             
-            # 更新卡牌按钮显示
-            self.update_card_buttons()
+            # 只重绘状态变化的卡牌按钮
+            self.repaint_dirty_cards()
             
-            # 启用重置按钮（如果有牌被抽取）
-            if self.drawn_indices:
-                self.reset_button.config(state="normal")
-            else:
-                self.reset_button.config(state="disabled")
+            # 更新抽牌和重置按钮（如果有牌被抽取则启用重置，牌抽完则禁用抽牌）
+            self.update_draw_buttons_state()
+    
+    def put_back_card(self, card_index):
+        """合并显示时放回某种牌的一张（右键）"""
+        if not self.is_counted_view() or not 0 <= card_index < len(self.engine.cards):
+            return
+        if self.engine.put_back(card_index):
+            self.record_journal()
+            self.repaint_dirty_cards()
+            self.update_draw_buttons_state()
     
     def update_card_buttons(self):
         """更新所有卡牌按钮的显示状态"""
-        current_group = self.card_groups[self.current_group_index]
-        all_cards = current_group["cards"]
+        self.engine.pop_dirty()
+        if self.virtual_grid.active:
+            self.virtual_grid.repaint_all()
+            return
+        self.repaint_cards(range(len(self.card_buttons)))
+    
+    def repaint_dirty_cards(self):
+        """只重绘引擎报告状态发生变化的卡牌按钮，并按这些牌更新剩余构成"""
+        dirty = self.engine.pop_dirty()
+        if self.grid_entry is not None:
+            self.grid_entry["composition"].sync(dirty)
+            self.invalidate("odds")
+        self.repaint_cards(dirty)
+    
+    def repaint_cards(self, indices):
+        """更新指定索引的卡牌按钮显示状态"""
+        if self.virtual_grid.active:
+            self.virtual_grid.repaint(indices)
+            return
         
-        for i, card_info in enumerate(self.card_buttons):
-            # 获取卡牌和按钮
-            card = all_cards[i] if i < len(all_cards) else ""
-            btn = card_info["button"]
+        if not hasattr(self, 'card_buttons'):
+            return
+        
+        all_cards = self.engine.cards
+        counted = self.is_counted_view()
+        styles = self.styles
+        
+        for i in indices:
+            if not 0 <= i < len(self.card_buttons):
+                continue
             
-            # 使用索引判断是否被抽取
-            if i in self.drawn_indices:
-                # 已抽取的牌：浅灰色
-                btn.config(
-                    bg="#E0E0E0",
-                    fg="#A0A0A0",
-                    relief=tk.SUNKEN
-                )
-            else:
-                # 未抽取的牌：恢复正常颜色
-                if card == "大王":
-                    color = "red"
-                elif card == "小王":
-                    color = "black"
-                elif card.endswith('♥') or card.endswith('♦'):
-                    color = "red"
-                else:
-                    color = "black"
-                
-                btn.config(
-                    bg="white",
-                    fg=color,
-                    relief=tk.RAISED
-                )
+            btn = self.card_buttons[i]["button"]
+            if counted:
+                btn.config(text=self.card_label(i))
+            
+            # 已抽取的牌显示为浅灰色，其余恢复该牌自己的颜色（都只是查表）
+            color = styles.color_at(all_cards, i)
+            btn.config(**styles.button_style(color, "drawn" if self.engine.is_drawn(i) else "normal"))
     
     def create_draw_area(self, parent):
         """创建抽牌区域（在右侧）"""
@@ -1227,10 +2233,75 @@ class CardDrawer:
         )
         self.current_card_display.pack(padx=10, pady=10, expand=True, fill=tk.BOTH)
         
+        # 发牌结果：每位玩家的手牌和底牌（发牌后显示）
+        self.hands_frame = tk.Frame(top_frame)
+        self.hands_frame.pack(fill=tk.X, padx=10)
+        
+        # 牌堆剩余构成：按名称、点数或花色列出剩余张数和下一张抽到的概率
+        odds_frame = tk.LabelFrame(top_frame, text="剩余牌 / 下一张的概率", font=("Noto Sans", 9))
+        odds_frame.pack(fill=tk.BOTH, padx=10, pady=(5, 0))
+        
+        odds_header = tk.Frame(odds_frame)
+        odds_header.pack(fill=tk.X)
+        self.odds_grouping_var = tk.StringVar(value="rank")
+        for grouping, label in GROUPINGS.items():
+            tk.Radiobutton(odds_header, text=label, value=grouping,
+                           variable=self.odds_grouping_var,
+                           command=lambda: self.invalidate("odds"),
+                           font=("Noto Sans", 9)).pack(side=tk.LEFT)
+        self.odds_summary_label = tk.Label(odds_header, text="", font=("Noto Sans", 9))
+        self.odds_summary_label.pack(side=tk.RIGHT)
+        
+        odds_list_frame = tk.Frame(odds_frame)
+        odds_list_frame.pack(fill=tk.BOTH, expand=True)
+        odds_scrollbar = tk.Scrollbar(odds_list_frame, orient=tk.VERTICAL)
+        self.odds_listbox = tk.Listbox(
+            odds_list_frame,
+            height=8,
+            font=("Consolas", 10),
+            activestyle="none",
+            exportselection=False,
+            yscrollcommand=lambda first, last: self.on_odds_scroll(odds_scrollbar, first, last)
+        )
+        odds_scrollbar.config(command=self.odds_listbox.yview)
+        odds_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.odds_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # 列表中显示的是哪个统计、哪种统计方式，以及各行当前的文字
+        self._odds_source = None
+        self._odds_texts = []
+        self._odds_colors = []  # 各行的文字颜色（行名不一定是牌名，不放进驻留表）
+        self._odds_first = None
+        
         # 下部分：按钮区域
         bottom_frame = tk.Frame(container)
         bottom_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=10)
         
+        # 随机源设置：随机源类型和种子（留空表示不设种子）
+        rng_frame = tk.Frame(bottom_frame)
+        rng_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        tk.Label(rng_frame, text="随机源:", font=("Noto Sans", 10)).pack(side=tk.LEFT)
+        self.rng_backend_var = tk.StringVar(value=RNG_BACKENDS[self.rng_backend][1])
+        rng_menu = tk.OptionMenu(
+            rng_frame,
+            self.rng_backend_var,
+            *[RNG_BACKENDS[name][1] for name in available_rng_backends()]
+        )
+        rng_menu.config(font=("Noto Sans", 9))
+        rng_menu.pack(side=tk.LEFT, padx=(2, 5))
+        
+        tk.Label(rng_frame, text="种子:", font=("Noto Sans", 10)).pack(side=tk.LEFT)
+        self.rng_seed_var = tk.StringVar(value="")
+        tk.Entry(rng_frame, textvariable=self.rng_seed_var, width=8).pack(side=tk.LEFT, padx=2)
+        
+        tk.Button(
+            rng_frame,
+            text="应用",
+            command=self.apply_rng_settings,
+            font=("Noto Sans", 9),
+            cursor="hand2"
+        ).pack(side=tk.LEFT, padx=(5, 0))
+        
         # 抽牌按钮
         self.draw_button = tk.Button(
             bottom_frame,
@@ -1247,6 +2318,41 @@ class CardDrawer:
         )
         self.draw_button.pack(fill=tk.X, pady=(0, 10))
         
+        # 一次抽多张、一次发完整桌牌（只重绘一次）
+        multi_frame = tk.Frame(bottom_frame)
+        multi_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(multi_frame, text="抽", font=("Noto Sans", 10)).pack(side=tk.LEFT)
+        self.draw_many_var = tk.StringVar(value="5")
+        tk.Entry(multi_frame, textvariable=self.draw_many_var, width=4).pack(side=tk.LEFT, padx=2)
+        tk.Label(multi_frame, text="张", font=("Noto Sans", 10)).pack(side=tk.LEFT)
+        self.draw_many_button = tk.Button(
+            multi_frame,
+            text="抽取",
+            command=self.draw_many_cards,
+            font=("Noto Sans", 9),
+            cursor="hand2"
+        )
+        self.draw_many_button.pack(side=tk.LEFT, padx=(5, 0))
+        
+        deal_frame = tk.Frame(bottom_frame)
+        deal_frame.pack(fill=tk.X, pady=(0, 10))
+        players, hand_size, kitty = self.DEAL_PRESETS[54]
+        self.deal_players_var = tk.StringVar(value=str(players))
+        self.deal_hand_var = tk.StringVar(value=str(hand_size))
+        self.deal_kitty_var = tk.StringVar(value=str(kitty))
+        for text, var in (("玩家", self.deal_players_var), ("每人", self.deal_hand_var),
+                          ("底牌", self.deal_kitty_var)):
+            tk.Label(deal_frame, text=text, font=("Noto Sans", 10)).pack(side=tk.LEFT)
+            tk.Entry(deal_frame, textvariable=var, width=3).pack(side=tk.LEFT, padx=(2, 4))
+        self.deal_button = tk.Button(
+            deal_frame,
+            text="发牌",
+            command=self.deal_cards,
+            font=("Noto Sans", 9),
+            cursor="hand2"
+        )
+        self.deal_button.pack(side=tk.LEFT, padx=(1, 0))
+        
         # 重置按钮（初始禁用）
         self.reset_button = tk.Button(
             bottom_frame,
@@ -1263,95 +2369,392 @@ class CardDrawer:
             bd=2
         )
         self.reset_button.pack(fill=tk.X)
+        
+        # 模拟统计按钮（打开蒙特卡洛模拟窗口）
+        self.simulate_button = tk.Button(
+            bottom_frame,
+            text="模拟统计",
+            command=self.open_simulation_window,
+            font=("Noto Sans", 12),
+            bg="#3F51B5",
+            fg="white",
+            padx=20,
+            pady=8,
+            cursor="hand2",
+            relief="raised",
+            bd=2
+        )
+        self.simulate_button.pack(fill=tk.X, pady=(10, 0))
+        
+        # 导出抽牌记录按钮（记录可在脚本中脱离界面重放）
+        self.export_log_button = tk.Button(
+            bottom_frame,
+            text="导出抽牌记录",
+            command=self.export_draw_log,
+            font=("Noto Sans", 10),
+            bg="#607D8B",
+            fg="white",
+            cursor="hand2",
+            relief="raised",
+            bd=2
+        )
+        self.export_log_button.pack(fill=tk.X, pady=(10, 0))
     
+    @instrumented
     def draw_random_card(self):
         """随机抽取一张牌"""
         if self.edit_mode:
             return  # 编辑模式下禁用随机抽牌
         
-        # 获取当前卡组的卡牌
-        current_group = self.card_groups[self.current_group_index]
-        all_cards = current_group["cards"]
-        
-        # 获取所有未抽取的牌的索引
-        available_indices = [i for i in range(len(all_cards)) if i not in self.drawn_indices]
-        
-        if not available_indices:
+        # 从剩余牌中随机抽取一张（引擎内部为 O(1) 操作）
+        if self.engine.draw() is None:
             messagebox.showinfo("提示", "所有牌都已被抽取！")
             return  # 如果牌堆为空，直接返回
+        self.record_journal()
         
-        # 从剩余牌中随机抽取一张
-        self.current_card_index = random.choice(available_indices)
-        self.current_card = all_cards[self.current_card_index]
-        self.drawn_indices.append(self.current_card_index)
-        
-        # 更新显示
+        # 更新显示（只重绘刚抽到的牌）
         self.update_current_card_display()
-        self.update_card_buttons()
+        self.repaint_dirty_cards()
         
         # 启用重置按钮
         self.reset_button.config(state="normal")
         
         # 如果所有牌都被抽取，禁用抽牌按钮
-        if len(self.drawn_indices) == len(all_cards):
+        if self.engine.remaining_count == 0:
             self.draw_button.config(state="disabled", bg="#CCCCCC")
             messagebox.showinfo("提示", "所有牌都已被抽取！")
     
+    def draw_many_cards(self):
+        """一次随机抽取多张牌，抽完后只重绘一次"""
+        if self.edit_mode:
+            return
+        try:
+            k = int(self.draw_many_var.get())
+            if k < 1:
+                raise ValueError
+        except ValueError:
+            messagebox.showwarning("警告", "抽牌张数必须是正整数")
+            return
+        if not self.engine.draw_many(k):
+            messagebox.showinfo("提示", "所有牌都已被抽取！")
+            return
+        self.after_multi_draw()
+        if self.engine.remaining_count == 0:
+            messagebox.showinfo("提示", "所有牌都已被抽取！")
+    
+    def deal_cards(self):
+        """按玩家数、每人张数和底牌数一次发完，在右侧显示各玩家的手牌"""
+        if self.edit_mode or self.grid_entry is None:
+            return
+        try:
+            players = int(self.deal_players_var.get())
+            hand_size = int(self.deal_hand_var.get())
+            kitty = int(self.deal_kitty_var.get() or 0)
+            hands, kitty_cards = self.engine.deal(players, hand_size, kitty)
+        except ValueError as e:
+            messagebox.showwarning("警告", f"无法发牌: {e}")
+            return
+        self.grid_entry["deal"] = (hands, kitty_cards)
+        self.after_multi_draw()
+    
+    def after_multi_draw(self):
+        """一次抽出多张牌之后：记录日志并统一刷新一次"""
+        self.record_journal()
+        self.update_current_card_display()
+        self.repaint_dirty_cards()
+        self.update_draw_buttons_state()
+        self.update_hands_display()
+    
+    def update_deal_defaults(self):
+        """按当前卡组的牌数填入常见的发牌方式（斗地主、升级等）"""
+        size = len(self.card_groups[self.current_group_index]["cards"])
+        players, hand_size, kitty = self.DEAL_PRESETS.get(size, (4, min(13, size // 4), 0))
+        self.deal_players_var.set(str(players))
+        self.deal_hand_var.set(str(hand_size))
+        self.deal_kitty_var.set(str(kitty))
+    
+    def update_hands_display(self):
+        """显示当前卡组最近一次发牌的各玩家手牌（手牌按卡组中的顺序排列）"""
+        for widget in self.hands_frame.winfo_children():
+            widget.destroy()
+        entry = self.grid_entry
+        deal = entry.get("deal") if entry is not None and not self.edit_mode else None
+        if deal is None:
+            return
+        hands, kitty_cards = deal
+        cards = self.engine.cards
+        rows = [(f"玩家{i + 1}", hand) for i, hand in enumerate(hands)]
+        if kitty_cards:
+            rows.append(("底牌", kitty_cards))
+        for row, (title, indices) in enumerate(rows):
+            tk.Label(self.hands_frame, text=f"{title}:", font=("Noto Sans", 9, "bold"),
+                     anchor="nw").grid(row=row, column=0, sticky="nw")
+            tk.Label(self.hands_frame, text=" ".join(cards[i] for i in sorted(indices)),
+                     font=("Microsoft YaHei", 9), anchor="w", justify=tk.LEFT,
+                     wraplength=260).grid(row=row, column=1, sticky="w")
+    
+    def on_odds_scroll(self, scrollbar, first, last):
+        """剩余构成列表滚动：同步滚动条，滚到新位置时刷新可见的行"""
+        scrollbar.set(first, last)
+        if first != self._odds_first:
+            self._odds_first = first
+            self.invalidate("odds")
+    
+    def update_odds_display(self):
+        """刷新剩余构成列表
+        
+        换了卡组或统计方式时重建所有行；否则只重写可见且文字有变化的行，
+        因此每次抽牌的刷新量与列表的可见行数有关，与卡组大小无关。
+        """
+        listbox = self.odds_listbox
+        entry = self.grid_entry
+        composition = entry["composition"] if entry is not None and not self.edit_mode else None
+        grouping = self.odds_grouping_var.get()
+        source = (composition, grouping) if composition is not None else None
+        if source != self._odds_source:
+            self._odds_source = source
+            listbox.delete(0, tk.END)
+            self._odds_texts = []
+            self._odds_colors = []
+            if composition is None:
+                self.odds_summary_label.config(text="")
+                return
+            self._odds_texts = [composition.row_text(grouping, row)
+                                for row in range(len(composition.rows[grouping]))]
+            listbox.insert(tk.END, *self._odds_texts)
+            # 点数、花色等行名只按规则匹配颜色，不驻留为牌名
+            self._odds_colors = [self.styles.classify(key) for key in composition.rows[grouping]]
+            for row, color in enumerate(self._odds_colors):
+                listbox.itemconfig(row, fg=color)
+        if composition is None:
+            return
+        
+        self.odds_summary_label.config(text=f"剩余 {composition.remaining}/{composition.total} 张")
+        texts = self._odds_texts
+        if not texts:
+            return
+        top = listbox.nearest(0)
+        bottom = listbox.nearest(listbox.winfo_height())
+        for row in range(top, min(bottom, len(texts) - 1) + 1):
+            text = composition.row_text(grouping, row)
+            if text != texts[row]:
+                texts[row] = text
+                listbox.delete(row)
+                listbox.insert(row, text)
+                listbox.itemconfig(row, fg=self._odds_colors[row])
+    
+    def apply_rng_settings(self):
+        """应用随机源设置：当前卡组以新的随机源重新开始，之后新建的卡组也使用它"""
+        backend = next(name for name, (_, label) in RNG_BACKENDS.items()
+                       if label == self.rng_backend_var.get())
+        seed_text = self.rng_seed_var.get().strip()
+        try:
+            seed = int(seed_text) if seed_text else None
+            rng = make_rng(backend, seed)
+        except (ValueError, RuntimeError) as e:
+            messagebox.showerror("错误", f"随机源设置无效: {str(e)}")
+            return
+        
+        self.rng_backend = backend
+        self.rng_seed = seed
+        
+        # 当前卡组重新载入（置换复位），保证相同种子得到相同的抽牌顺序
+        previous = self.engine.drawn_indices
+        self.engine.rng = rng
+        self.engine.restart()
+        self.record_journal()
+        if self.grid_entry is not None:
+            self.grid_entry["composition"].reset()
+            self.invalidate("odds")
+        self.repaint_cards(previous)
+        self.update_current_card_display()
+        self.update_draw_buttons_state()
+        if self.grid_entry is not None:
+            self.grid_entry["deal"] = None
+        self.update_hands_display()
+    
+    def export_draw_log(self):
+        """把当前卡组本局的抽牌记录导出为二进制文件"""
+        current_group = self.card_groups[self.current_group_index]
+        file_path = filedialog.asksaveasfilename(
+            title="导出抽牌记录",
+            defaultextension=".drawlog",
+            filetypes=[
+                ("抽牌记录", "*.drawlog"),
+                ("所有文件", "*.*")
+            ],
+            initialfile=f"{current_group['name']}.drawlog"
+        )
+        
+        if not file_path:
+            return  # 用户取消了保存
+        
+        try:
+            with open(file_path, 'wb') as file:
+                file.write(self.engine.log.to_bytes())
+            messagebox.showinfo("成功", f"已导出 {len(self.engine.log)} 条抽牌记录")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出抽牌记录时出错: {str(e)}")
+    
+    def open_simulation_window(self):
+        """打开蒙特卡洛模拟窗口（基于当前卡组）"""
+        if getattr(self, 'simulation_window', None) is not None and self.simulation_window.winfo_exists():
+            self.simulation_window.lift()
+            return
+        
+        current_group = self.card_groups[self.current_group_index]
+        ranks, _ = encode_ranks(current_group["cards"])
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"模拟统计 - {current_group['name']}")
+        window.protocol("WM_DELETE_WINDOW", self.close_simulation_window)
+        self.simulation_window = window
+        self.simulation_cards = current_group["cards"].copy()
+        self.simulation_job = None
+        
+        form = tk.Frame(window, padx=15, pady=10)
+        form.pack(fill=tk.X)
+        
+        # 每手牌数（斗地主17张，升级25张，麻将13张）
+        tk.Label(form, text="每手牌数:", font=("Noto Sans", 10)).grid(row=0, column=0, sticky="w")
+        self.sim_hand_var = tk.StringVar(value=str(min(17, len(self.simulation_cards))))
+        tk.Entry(form, textvariable=self.sim_hand_var, width=10).grid(row=0, column=1, sticky="w", padx=5)
+        
+        # 模拟手数
+        tk.Label(form, text="模拟手数:", font=("Noto Sans", 10)).grid(row=1, column=0, sticky="w")
+        self.sim_deals_var = tk.StringVar(value="1000000")
+        tk.Entry(form, textvariable=self.sim_deals_var, width=10).grid(row=1, column=1, sticky="w", padx=5)
+        
+        # 关注的牌（统计它在一手牌中出现的张数）
+        tk.Label(form, text="关注的牌:", font=("Noto Sans", 10)).grid(row=2, column=0, sticky="w")
+        self.sim_target_var = tk.StringVar(value=ranks[0] if ranks else "")
+        target_menu = tk.OptionMenu(form, self.sim_target_var, *(ranks or [""]))
+        target_menu.grid(row=2, column=1, sticky="w", padx=5)
+        
+        # 并行进程数（默认使用全部CPU核心）
+        tk.Label(form, text="并行进程:", font=("Noto Sans", 10)).grid(row=3, column=0, sticky="w")
+        self.sim_workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        tk.Entry(form, textvariable=self.sim_workers_var, width=10).grid(row=3, column=1, sticky="w", padx=5)
+        
+        # 随机种子（留空则随机生成；相同种子的结果可复现，且与进程数无关）
+        tk.Label(form, text="随机种子:", font=("Noto Sans", 10)).grid(row=4, column=0, sticky="w")
+        self.sim_seed_var = tk.StringVar(value="")
+        tk.Entry(form, textvariable=self.sim_seed_var, width=10).grid(row=4, column=1, sticky="w", padx=5)
+        
+        buttons = tk.Frame(window, padx=15)
+        buttons.pack(fill=tk.X)
+        self.sim_start_btn = tk.Button(buttons, text="开始", command=self.start_simulation,
+                                       font=("Noto Sans", 10), bg="#4CAF50", fg="white", padx=10)
+        self.sim_start_btn.pack(side=tk.LEFT, padx=(0, 5))
+        self.sim_stop_btn = tk.Button(buttons, text="停止", command=self.stop_simulation,
+                                      font=("Noto Sans", 10), bg="#f44336", fg="white", padx=10,
+                                      state="disabled")
+        self.sim_stop_btn.pack(side=tk.LEFT)
+        
+        # 进度显示
+        self.sim_progress_label = tk.Label(window, text="", font=("Noto Sans", 10),
+                                           anchor="w", padx=15)
+        self.sim_progress_label.pack(fill=tk.X, pady=(10, 0))
+        
+        # 结果显示
+        self.sim_result_label = tk.Label(window, text="", font=("Consolas", 10),
+                                         justify=tk.LEFT, anchor="nw", padx=15, pady=10)
+        self.sim_result_label.pack(expand=True, fill=tk.BOTH)
+    
+    def start_simulation(self):
+        """开始模拟：分片交给进程池并行运行，主窗口定时查询进度，不阻塞事件循环"""
+        try:
+            hand_size = int(self.sim_hand_var.get())
+            deals = int(self.sim_deals_var.get())
+            workers = int(self.sim_workers_var.get())
+            seed_text = self.sim_seed_var.get().strip()
+            seed = int(seed_text) if seed_text else None
+            runner = ParallelSimulationRunner(self.simulation_cards, hand_size,
+                                              target=self.sim_target_var.get(),
+                                              seed=seed, workers=workers)
+        except ValueError as e:
+            messagebox.showerror("错误", f"模拟参数无效: {str(e)}", parent=self.simulation_window)
+            return
+        
+        # 显示实际使用的种子，便于复现
+        self.sim_seed_var.set(str(runner.seed))
+        self.simulation_runner = runner.start(deals)
+        self.sim_start_btn.config(state="disabled")
+        self.sim_stop_btn.config(state="normal")
+        self.simulation_job = self.root.after(100, self._poll_simulation)
+    
+    def _poll_simulation(self):
+        """合并已完成的分片并刷新进度和结果"""
+        self.simulation_job = None
+        runner = self.simulation_runner
+        if runner.poll():
+            self.sim_result_label.config(text=runner.result.format())
+        self.sim_progress_label.config(
+            text=f"进度: {runner.result.deals}/{runner.total_deals} 手 ({runner.progress:.0%})"
+        )
+        if runner.done:
+            self.stop_simulation()
+        else:
+            self.simulation_job = self.root.after(100, self._poll_simulation)
+    
+    def stop_simulation(self):
+        """停止正在进行的模拟（未开始的分片被取消，已完成的结果保留）"""
+        if self.simulation_job is not None:
+            self.root.after_cancel(self.simulation_job)
+            self.simulation_job = None
+        runner = getattr(self, 'simulation_runner', None)
+        if runner is not None and not runner.done:
+            runner.cancel()
+        if self.simulation_window.winfo_exists():
+            self.sim_start_btn.config(state="normal")
+            self.sim_stop_btn.config(state="disabled")
+    
+    def close_simulation_window(self):
+        """关闭模拟窗口"""
+        self.stop_simulation()
+        self.simulation_window.destroy()
+        self.simulation_window = None
+    
+    def update_draw_buttons_state(self):
+        """根据当前卡组的抽取状态更新抽牌和重置按钮"""
+        if self.edit_mode:
+            return
+        if len(self.engine) and self.engine.remaining_count == 0:
+            self.draw_button.config(state="disabled", bg="#CCCCCC")
+        else:
+            self.draw_button.config(state="normal", bg="#4CAF50")
+        if self.engine.drawn_count:
+            self.reset_button.config(state="normal")
+        else:
+            self.reset_button.config(state="disabled")
+    
     def update_current_card_display(self):
         """更新当前牌显示"""
-        if self.current_card:
-            # 确定颜色
-            if self.current_card == "大王":
-                color = "red"
-            elif self.current_card == "小王":
-                color = "black"
-            elif self.current_card.endswith('♥') or self.current_card.endswith('♦'):
-                color = "red"
-            else:
-                color = "black"
-            
+        current_card = self.engine.current_card
+        if current_card:
             self.current_card_display.config(
-                text=self.current_card,
-                fg=color
+                text=current_card,
+                fg=self.styles.color(current_card)
             )
         else:
             self.current_card_display.config(text="等待抽牌...", fg="black")
     
     def reset(self):
         """重置所有状态"""
-        # 清空已抽取的牌索引
-        self.drawn_indices = []
-        self.current_card = None
-        self.current_card_index = None
+        # 清空已抽取的牌索引（剩余构成直接恢复初始计数）
+        self.engine.reset()
+        self.record_journal()
+        if self.grid_entry is not None:
+            self.grid_entry["composition"].reset()
         
-        # 重置显示
+        # 重置显示（连同发牌结果）
         self.current_card_display.config(text="等待抽牌...", fg="black")
+        if self.grid_entry is not None:
+            self.grid_entry["deal"] = None
+        self.update_hands_display()
         
-        # 重置所有卡牌按钮
-        if hasattr(self, 'card_buttons'):
-            current_group = self.card_groups[self.current_group_index]
-            all_cards = current_group["cards"]
-            
-            for i, card_info in enumerate(self.card_buttons):
-                if i < len(all_cards):
-                    card = all_cards[i]
-                    btn = card_info["button"]
-                    
-                    # 恢复正常颜色
-                    if card == "大王":
-                        color = "red"
-                    elif card == "小王":
-                        color = "black"
-                    elif card.endswith('♥') or card.endswith('♦'):
-                        color = "red"
-                    else:
-                        color = "black"
-                    
-                    btn.config(
-                        bg="white",
-                        fg=color,
-                        relief=tk.RAISED
-                    )
+        # 只恢复之前已抽取的卡牌按钮
+        self.repaint_dirty_cards()
         
         # 重置按钮状态
         if not self.edit_mode:
@@ -1360,4 +2763,17 @@ class CardDrawer:
 
 # 运行程序
 if __name__ == "__main__":
-    app = CardDrawer()
+    # 打包为可执行文件后，模拟统计的工作进程需要它才能正常启动
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="抽牌程序（带 draw/deal 子命令时为命令行模式）")
+    parser.add_argument("--profile-startup", nargs="?", const="", metavar="JSON",
+                        help="统计启动各阶段耗时，输出到标准错误或写入 JSON 文件")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="第一次画出卡牌网格后直接退出（用于测量启动时间）")
+    parser.add_argument("--instrument", action="store_true",
+                        help="启动时打开事件处理耗时统计和统计面板（也可按 F12 切换）")
+    args, _ = parser.parse_known_args()
+    profile = None
+    if args.profile_startup is not None:
+        profile = StartupProfile(STARTED_AT, args.profile_startup or None)
+    app = CardDrawer(profile, args.exit_after_startup, instrument=args.instrument)
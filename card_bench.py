@@ -0,0 +1,541 @@
+"""性能基准测试（引擎部分不依赖 tkinter；suite 的界面部分需要图形显示或 Xvfb）
+
+用法:
+    python card_bench.py rng [--draws N] [--deck-size N] [--json]
+    python card_bench.py load [--lines N] [--json]
+    python card_bench.py journal [--clicks N] [--deck-size N] [--json]
+    python card_bench.py startup [--runs N] [--exe PATH] [--json]
+    python card_bench.py suite [--decks 54,108,136,10k,100k] [--no-gui] [--json]
+                               [--output FILE] [--baseline FILE] [--tolerance 0.25]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from card_engine import (MAHJONG_FLOWERS, CardDeck, DeckEngine, RNG_BACKENDS,
+                         available_rng_backends, make_rng, standard_deck)
+from card_journal import SessionJournal, deck_fingerprint
+from card_loader import DeckFileLoader, read_deck_file
+from card_perf import STARTUP_BUDGET_MS
+
+# 载入测试使用的牌名（麻将牌，名称长度与实际卡组文件相近）
+SAMPLE_NAMES = [f"{n}{kind}" for kind in "万条筒" for n in "一二三四五六七八九"] + \
+    ["东风", "南风", "西风", "北风", "红中", "发财", "白板"]
+
+
+def bench_rng_backends(draws=200000, deck_size=108):
+    """测量各随机源在引擎上的抽牌速度（抽完一副就重置，共抽 draws 张）"""
+    results = []
+    for backend in available_rng_backends():
+        seed = None if backend == "secrets" else 1
+        engine = DeckEngine(list(range(deck_size)), rng=make_rng(backend, seed))
+        done = 0
+        start = time.perf_counter()
+        while done < draws:
+            if engine.draw() is None:
+                engine.reset()
+                continue
+            done += 1
+        elapsed = time.perf_counter() - start
+        results.append({
+            "name": f"draw[{backend}]",
+            "backend": backend,
+            "label": RNG_BACKENDS[backend][1],
+            "deck_size": deck_size,
+            "ops": draws,
+            "seconds": elapsed,
+            "ops_per_second": draws / elapsed if elapsed else 0.0,
+        })
+    return results
+
+
+def write_sample_deck_file(path, lines):
+    """生成一个 lines 行的卡组文件"""
+    names = SAMPLE_NAMES
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(0, lines, len(names)):
+            file.write("\n".join(names[:lines - i]) + "\n")
+
+
+def bench_deck_loading(lines=1000000):
+    """测量载入 lines 行卡组文件的速度：逐行读取、分块读取、后台线程读取"""
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        write_sample_deck_file(path, lines)
+
+        def line_by_line():
+            cards = CardDeck()
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    card = line.strip()
+                    if card:
+                        cards.append(card)
+            return cards
+
+        cases = [
+            ("load[line-by-line]", line_by_line),
+            ("load[chunked]", lambda: read_deck_file(path)),
+            ("load[background]", lambda: DeckFileLoader(path).start().wait()),
+        ]
+        results = []
+        for name, load in cases:
+            start = time.perf_counter()
+            cards = load()
+            elapsed = time.perf_counter() - start
+            assert len(cards) == lines
+            results.append({
+                "name": name,
+                "bytes": os.path.getsize(path),
+                "ops": lines,
+                "seconds": elapsed,
+                "ops_per_second": lines / elapsed if elapsed else 0.0,
+            })
+        return results
+    finally:
+        os.remove(path)
+
+
+def bench_journal(clicks=200000, deck_size=108, flush_every=1000):
+    """测量会话日志给每次点击增加的开销（微秒），以及定时写入磁盘的耗时
+
+    点击按抽牌/点击切换交替进行；每 flush_every 次点击写入并 fsync 一次，
+    相当于界面每秒一次的定时写入。
+    """
+    cards = CardDeck(f"c{i}" for i in range(deck_size))
+    home = tempfile.mkdtemp()
+    path = os.path.join(home, "bench.journal")
+
+    def clicks_loop(engine, journal=None):
+        flush_time = 0.0
+        start = time.perf_counter()
+        for i in range(clicks):
+            if i & 1:
+                engine.toggle(i % deck_size)
+            elif engine.draw() is None:
+                engine.reset()
+            if journal is not None:
+                journal.sync()
+                if i % flush_every == flush_every - 1:
+                    flush_start = time.perf_counter()
+                    journal.flush()
+                    flush_time += time.perf_counter() - flush_start
+        return time.perf_counter() - start - flush_time, flush_time
+
+    try:
+        baseline, _ = clicks_loop(DeckEngine(cards, rng=make_rng("mt", 1)))
+        engine = DeckEngine(cards, rng=make_rng("mt", 1))
+        journal = SessionJournal(path, deck_fingerprint(cards))
+        journal.attach(engine)
+        journaled, flush_time = clicks_loop(engine, journal)
+        journal.close()
+    finally:
+        for name in os.listdir(home):
+            os.remove(os.path.join(home, name))
+        os.rmdir(home)
+
+    flushes = max(1, clicks // flush_every)
+    results = []
+    for name, elapsed in (("click[no-journal]", baseline), ("click[journal]", journaled)):
+        results.append({
+            "name": name,
+            "deck_size": deck_size,
+            "ops": clicks,
+            "seconds": elapsed,
+            "ops_per_second": clicks / elapsed if elapsed else 0.0,
+            "us_per_op": elapsed / clicks * 1e6,
+        })
+    results[1]["overhead_us_per_op"] = (journaled - baseline) / clicks * 1e6
+    results.append({
+        "name": "journal[flush+fsync]",
+        "deck_size": deck_size,
+        "ops": flushes,
+        "seconds": flush_time,
+        "ops_per_second": flushes / flush_time if flush_time else 0.0,
+        "us_per_op": flush_time / flushes * 1e6,
+    })
+    return results
+
+
+def bench_startup(runs=5, exe=None, budget_ms=None):
+    """测量主程序从启动到第一次画出卡牌网格的时间，并与启动预算比较
+
+    每次启动一个新进程（--profile-startup --exit-after-startup），读取它写出的
+    各阶段耗时；wall 为包括解释器启动（打包版还包括解压）在内的总时间。
+    第一次运行在空的卡组库上（首次运行路径），之后的运行读取已有的卡组库。
+    exe 为打包好的可执行文件路径，默认运行当前目录下的 Card_draw_simulator.py。
+    """
+    budget_ms = dict(STARTUP_BUDGET_MS if budget_ms is None else budget_ms)
+    if exe is None:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Card_draw_simulator.py")
+        command = [sys.executable, script]
+    else:
+        command = [exe]
+    home = tempfile.mkdtemp()
+    profile_path = os.path.join(home, "startup.json")
+    env = dict(os.environ, CARD_DRAW_HOME=home)
+    samples = {}
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            process = subprocess.run(
+                command + [f"--profile-startup={profile_path}", "--exit-after-startup"],
+                env=env, timeout=60, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            wall = (time.perf_counter() - start) * 1000
+            if process.returncode != 0 or not os.path.exists(profile_path):
+                message = process.stderr.decode("utf-8", "replace").strip().splitlines()
+                raise RuntimeError(f"主程序启动失败: {message[-1] if message else process.returncode}")
+            with open(profile_path, 'r', encoding='utf-8') as file:
+                profile = json.load(file)
+            os.remove(profile_path)
+            for phase in profile["phases"]:
+                samples.setdefault(phase["name"], []).append((phase["ms"], phase["elapsed_ms"]))
+            samples.setdefault("wall", []).append((wall, wall))
+    finally:
+        for root, dirs, files in os.walk(home, topdown=False):
+            for name in files:
+                os.remove(os.path.join(root, name))
+            for name in dirs:
+                os.rmdir(os.path.join(root, name))
+        os.rmdir(home)
+
+    results = []
+    for name, values in samples.items():
+        ms = statistics.median(value for value, _ in values)
+        elapsed = statistics.median(total for _, total in values)
+        result = {
+            "name": f"startup[{name}]",
+            "ops": len(values),
+            "seconds": ms / 1000,
+            "ops_per_second": 1000 / ms if ms else 0.0,
+            "ms": ms,
+            "elapsed_ms": elapsed,
+        }
+        budget = budget_ms.get(name.replace(" ", "_"))
+        if budget is not None:
+            result["budget_ms"] = budget
+            result["within_budget"] = elapsed <= budget
+        results.append(result)
+    return results
+
+
+# suite 默认测试的卡组：一副扑克、两副扑克、麻将（不含花牌）、一万张、十万张
+SUITE_DECKS = ("54", "108", "136", "10k", "100k")
+
+# 与基线相比每次操作的耗时增加超过该比例时视为性能退化
+REGRESSION_TOLERANCE = 0.25
+
+
+def suite_deck(label):
+    """按标签取得 suite 使用的卡组：54、108 为默认扑克牌组，136 为麻将.txt 去掉花牌，
+    其他数字（可带 k 后缀）为用 SAMPLE_NAMES 循环生成的大卡组"""
+    if label == "54":
+        return standard_deck(1)
+    if label == "108":
+        return standard_deck(2)
+    if label == "136":
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "麻将.txt")
+        return CardDeck(card for card in read_deck_file(path) if card not in MAHJONG_FLOWERS)
+    size = int(label[:-1]) * 1000 if label.endswith("k") else int(label)
+    return CardDeck(SAMPLE_NAMES[i % len(SAMPLE_NAMES)] for i in range(size))
+
+
+def _result(name, deck_size, ops, elapsed):
+    return {
+        "name": name,
+        "deck_size": deck_size,
+        "ops": ops,
+        "seconds": elapsed,
+        "ops_per_second": ops / elapsed if elapsed else 0.0,
+        "us_per_op": elapsed / ops * 1e6 if ops else 0.0,
+    }
+
+
+def bench_engine_paths(label, cards, path, ops=20000):
+    """引擎层：抽牌、点击切换、载入卡组文件（无界面）"""
+    n = len(cards)
+    results = []
+
+    engine = DeckEngine(cards, rng=make_rng("mt", 1))
+    start = time.perf_counter()
+    for _ in range(ops):
+        if engine.draw() is None:
+            engine.reset()
+            engine.draw()
+    results.append(_result(f"engine.draw[{label}]", n, ops, time.perf_counter() - start))
+
+    engine = DeckEngine(cards, rng=make_rng("mt", 1))
+    indices = [random.Random(1).randrange(n) for _ in range(ops)]
+    start = time.perf_counter()
+    for index in indices:
+        engine.toggle(index)
+    results.append(_result(f"engine.toggle[{label}]", n, ops, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    loaded = DeckFileLoader(path).start().wait()
+    results.append(_result(f"engine.load[{label}]", n, len(loaded), time.perf_counter() - start))
+    return results
+
+
+@contextlib.contextmanager
+def virtual_display():
+    """没有图形显示时启动 Xvfb 虚拟显示；产生可用的 DISPLAY，无法提供时产生 None"""
+    if sys.platform in ("win32", "darwin") or os.environ.get("DISPLAY"):
+        yield os.environ.get("DISPLAY", sys.platform)
+        return
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        yield None
+        return
+    # -displayfd：Xvfb 自己选一个空闲的显示号，就绪后写到管道里
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1280x800x24",
+                                "-nolisten", "tcp"], pass_fds=(write_fd,),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    try:
+        with os.fdopen(read_fd) as pipe:
+            number = pipe.readline().strip()
+        if not number:
+            yield None
+            return
+        os.environ["DISPLAY"] = f":{number}"
+        try:
+            yield os.environ["DISPLAY"]
+        finally:
+            del os.environ["DISPLAY"]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def bench_gui_paths(decks, ops=200):
+    """界面层：在真实窗口上测量抽牌、点击、整体重绘、切换卡组和载入卡组
+
+    decks 为 [(标签, 卡组, 卡组文件路径)]。每次操作后处理空闲任务，
+    因此耗时包括登记的界面刷新。卡组库放在临时目录中，不影响本机的卡组库。
+    """
+    import Card_draw_simulator as gui  # 只有界面部分需要 tkinter
+
+    home = tempfile.mkdtemp()
+    previous_home = os.environ.get("CARD_DRAW_HOME")
+    os.environ["CARD_DRAW_HOME"] = home
+    results = []
+    try:
+        app = gui.CardDrawer(run_mainloop=False)
+        app.on_first_map()  # 不等窗口画出，直接允许建网格
+        pump = app.root.update_idletasks
+        pump()
+        home_index = 0
+
+        def timed(name, n, count, action):
+            start = time.perf_counter()
+            for i in range(count):
+                action(i)
+                pump()
+            results.append(_result(f"{name}[{label}]", n, count, time.perf_counter() - start))
+
+        for label, cards, path in decks:
+            n = len(cards)
+
+            # 载入卡组文件：后台解析，完成后添加并显示新卡组（不含文件选择和命名对话框）
+            start = time.perf_counter()
+            app.add_loaded_group(f"bench {label}", DeckFileLoader(path).start().wait())
+            pump()
+            results.append(_result(f"gui.load_card_group[{label}]", n, n,
+                                   time.perf_counter() - start))
+            index = app.current_group_index
+
+            # 第一次切换到该卡组（建网格），以及在两个已缓存的卡组之间来回切换
+            app.select_group_by_index(home_index)
+            pump()
+            app.discard_group_grids(app.card_groups[index])
+            timed("gui.switch_cold", n, 1, lambda i: app.select_group_by_index(index))
+            timed("gui.switch_cached", n, 20,
+                  lambda i: app.select_group_by_index(home_index if i % 2 == 0 else index))
+
+            # 抽牌（不抽完，避免弹出提示框）、点击切换、整体重绘
+            rng = random.Random(1)
+            timed("gui.draw_random_card", n, min(ops, n - 1), lambda i: app.draw_random_card())
+            app.reset()
+            timed("gui.toggle_card", n, ops, lambda i: app.toggle_card(rng.randrange(n)))
+            app.reset()
+            timed("gui.update_card_buttons", n, 20, lambda i: app.update_card_buttons())
+        app.on_close()
+    finally:
+        if previous_home is None:
+            os.environ.pop("CARD_DRAW_HOME", None)
+        else:
+            os.environ["CARD_DRAW_HOME"] = previous_home
+        shutil.rmtree(home, ignore_errors=True)
+    return results
+
+
+def run_suite(labels=SUITE_DECKS, gui=True):
+    """运行完整基准测试套件，返回 (结果列表, 是否测量了界面部分)"""
+    work = tempfile.mkdtemp()
+    try:
+        decks = []
+        for label in labels:
+            cards = suite_deck(label)
+            path = os.path.join(work, f"{label}.txt")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write("\n".join(cards) + "\n")
+            decks.append((label, cards, path))
+
+        results = []
+        for label, cards, path in decks:
+            results.extend(bench_engine_paths(label, cards, path))
+        measured_gui = False
+        if gui:
+            with virtual_display() as display:
+                if display is not None:
+                    results.extend(bench_gui_paths(decks))
+                    measured_gui = True
+        return results, measured_gui
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def suite_report(results):
+    """suite 的机器可读结果（也是基线文件的格式）"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare_with_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """按名称与基线比较每次操作的耗时，返回 [(名称, 基线微秒, 当前微秒, 比值)]，
+    只包含两边都有的项；比值大于 1 + tolerance 的项为退化"""
+    if isinstance(baseline, dict):
+        baseline = baseline["results"]
+    previous = {result["name"]: result for result in baseline}
+    rows = []
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None or not old["us_per_op"]:
+            continue
+        rows.append((result["name"], old["us_per_op"], result["us_per_op"],
+                     result["us_per_op"] / old["us_per_op"]))
+    return rows
+
+
+def print_comparison(rows, tolerance=REGRESSION_TOLERANCE):
+    for name, old, new, ratio in rows:
+        flag = "  退化" if ratio > 1 + tolerance else ""
+        print(f"{name:<32}{old:>12.2f} us -> {new:>10.2f} us  {ratio:>6.2f}x{flag}")
+
+
+def print_results(results):
+    """以表格形式输出结果"""
+    for result in results:
+        if "elapsed_ms" in result:
+            # 启动阶段：本阶段和累计耗时（多次运行的中位数）
+            line = (f"{result['name']:<24}{result['ops']:>4} 次  本阶段 {result['ms']:>8.1f} ms  "
+                    f"累计 {result['elapsed_ms']:>8.1f} ms")
+            if "budget_ms" in result:
+                status = "通过" if result["within_budget"] else "超出预算"
+                line += f"  预算 {result['budget_ms']} ms {status}"
+            print(line)
+            continue
+        print(f"{result['name']:<32}{result['ops']:>10} 次  "
+              f"{result['seconds']:>8.3f} 秒  {result['ops_per_second']:>14,.0f} 次/秒")
+
+
+def run_suite_command(args):
+    """suite 子命令：运行套件，输出或保存结果，并与基线比较"""
+    results, measured_gui = run_suite([label.strip() for label in args.decks.split(",")],
+                                      gui=not args.no_gui)
+    if not args.no_gui and not measured_gui:
+        print("没有可用的图形显示（也没有 Xvfb），跳过界面部分", file=sys.stderr)
+    report = suite_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            rows = compare_with_baseline(results, json.load(file), args.tolerance)
+        if not args.json:
+            print()
+            print_comparison(rows, args.tolerance)
+        if any(ratio > 1 + args.tolerance for _, _, _, ratio in rows):
+            return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="抽牌程序性能基准测试")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    rng_parser = sub.add_parser("rng", help="各随机源的抽牌速度")
+    rng_parser.add_argument("--draws", type=int, default=200000)
+    rng_parser.add_argument("--deck-size", type=int, default=108)
+    rng_parser.add_argument("--json", action="store_true", help="输出 JSON")
+
+    load_parser = sub.add_parser("load", help="载入大卡组文件的速度（行/秒）")
+    load_parser.add_argument("--lines", type=int, default=1000000)
+    load_parser.add_argument("--json", action="store_true", help="输出 JSON")
+
+    journal_parser = sub.add_parser("journal", help="会话日志给每次点击增加的开销")
+    journal_parser.add_argument("--clicks", type=int, default=200000)
+    journal_parser.add_argument("--deck-size", type=int, default=108)
+    journal_parser.add_argument("--json", action="store_true", help="输出 JSON")
+
+    startup_parser = sub.add_parser("startup", help="启动到第一次画出卡牌网格的时间（需要图形界面）")
+    startup_parser.add_argument("--runs", type=int, default=5)
+    startup_parser.add_argument("--exe", help="打包好的可执行文件（默认运行 Card_draw_simulator.py）")
+    startup_parser.add_argument("--json", action="store_true", help="输出 JSON")
+
+    suite_parser = sub.add_parser("suite", help="各卡组大小下抽牌、点击、重绘、切换卡组、载入卡组的耗时")
+    suite_parser.add_argument("--decks", default=",".join(SUITE_DECKS),
+                              help="逗号分隔的卡组大小（54、108、136 或张数，可带 k 后缀）")
+    suite_parser.add_argument("--no-gui", action="store_true", help="只测引擎部分")
+    suite_parser.add_argument("--json", action="store_true", help="输出 JSON")
+    suite_parser.add_argument("--output", help="把结果写入 JSON 文件（可作为之后比较的基线）")
+    suite_parser.add_argument("--baseline", help="与该 JSON 基线比较，有退化时返回非零状态")
+    suite_parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                              help="允许的变慢比例（默认 0.25）")
+
+    args = parser.parse_args(argv)
+    if args.suite == "rng":
+        results = bench_rng_backends(args.draws, args.deck_size)
+    elif args.suite == "load":
+        results = bench_deck_loading(args.lines)
+    elif args.suite == "journal":
+        results = bench_journal(args.clicks, args.deck_size)
+    elif args.suite == "startup":
+        try:
+            results = bench_startup(args.runs, args.exe)
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"错误: {e}", file=sys.stderr)
+            return 1
+    elif args.suite == "suite":
+        return run_suite_command(args)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+    # 超出启动预算时以非零状态退出，便于在持续集成中跟踪
+    if any(result.get("within_budget") is False for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""命令行模式：不打开窗口、不导入 tkinter，直接用抽牌引擎批量抽牌或发牌
+
+用法:
+    python Card_draw_simulator.py draw --deck 麻将.txt -n 13 --seed 1 --repeat 100000
+    python Card_draw_simulator.py deal --standard 1 --players 3 --hand 17 --kitty 3 --format json
+    python card_cli.py draw --group 两副扑克牌组 -n 25
+
+每局从整副牌开始，结果逐局输出到标准输出：
+lines 格式每局一行（发牌时各玩家之间用 " | " 分隔，最后是底牌）；
+json 格式每局一个 JSON 对象（JSON Lines）。
+"""
+import argparse
+import json
+import os
+import sys
+
+from card_engine import DeckEngine, RNG_BACKENDS, available_rng_backends, make_rng, standard_deck
+
+# Card_draw_simulator.py 带这些子命令运行时进入命令行模式
+COMMANDS = ("draw", "deal")
+
+# 每累积这么多行写一次标准输出
+WRITE_BATCH = 1024
+
+
+def load_deck(args):
+    """按 --deck、--group 或 --standard 取得卡组"""
+    if args.deck:
+        from card_loader import read_deck_file
+        return read_deck_file(args.deck)
+    if args.group:
+        from card_store import DeckStore
+        store = DeckStore()
+        try:
+            for group in store.list_groups():
+                if group["name"] == args.group:
+                    return store.load_cards(group["store_id"])
+        finally:
+            store.close()
+        raise ValueError(f"卡组库中没有名为 {args.group} 的卡组")
+    return standard_deck(args.standard)
+
+
+def new_round(engine):
+    """开始新的一局；命令行模式不使用抽牌记录，每局清空，内存不随局数增长"""
+    engine.reset()
+    engine.log.clear()
+
+
+def iter_draws(engine, n, repeat):
+    """每局抽 n 张，产生 (局号, 抽到的索引列表)"""
+    for round_index in range(repeat):
+        new_round(engine)
+        yield round_index, engine.draw_many(n)
+
+
+def iter_deals(engine, players, hand_size, kitty, repeat):
+    """每局发一次牌，产生 (局号, 各玩家手牌, 底牌)；手牌和底牌按卡组中的顺序排列"""
+    for round_index in range(repeat):
+        new_round(engine)
+        hands, kitty_cards = engine.deal(players, hand_size, kitty)
+        yield round_index, [sorted(hand) for hand in hands], sorted(kitty_cards)
+
+
+def format_draws(cards, results, fmt):
+    names = cards.to_list()
+    for round_index, drawn in results:
+        hand = [names[i] for i in drawn]
+        if fmt == "json":
+            yield json.dumps({"round": round_index, "cards": hand}, ensure_ascii=False)
+        else:
+            yield " ".join(hand)
+
+
+def format_deals(cards, results, fmt):
+    names = cards.to_list()
+    for round_index, hands, kitty_cards in results:
+        hands = [[names[i] for i in hand] for hand in hands]
+        kitty_cards = [names[i] for i in kitty_cards]
+        if fmt == "json":
+            yield json.dumps({"round": round_index, "hands": hands, "kitty": kitty_cards},
+                             ensure_ascii=False)
+        else:
+            yield " | ".join(" ".join(part) for part in hands + ([kitty_cards] if kitty_cards else []))
+
+
+def write_lines(lines, out):
+    """分批写出结果行（大量局数时减少写入次数）"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= WRITE_BATCH:
+            out.write("\n".join(batch) + "\n")
+            batch = []
+    if batch:
+        out.write("\n".join(batch) + "\n")
+    out.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="Card_draw_simulator.py",
+                                     description="抽牌模拟器命令行模式（不打开窗口）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    source = common.add_mutually_exclusive_group()
+    source.add_argument("--deck", help="卡组文件（每行一张牌）")
+    source.add_argument("--group", help="卡组库中的卡组名称")
+    source.add_argument("--standard", type=int, default=1, metavar="N",
+                        help="N 副带大小王的扑克牌（默认 1，未指定 --deck/--group 时使用）")
+    common.add_argument("--seed", type=int, help="随机种子（相同种子结果相同）")
+    common.add_argument("--rng", choices=list(RNG_BACKENDS), default="mt", help="随机源")
+    common.add_argument("--repeat", type=int, default=1, help="局数")
+    common.add_argument("--format", choices=("lines", "json"), default="lines", help="输出格式")
+
+    draw_parser = sub.add_parser("draw", parents=[common], help="每局随机抽 n 张")
+    draw_parser.add_argument("-n", type=int, default=1, help="每局抽的张数")
+
+    deal_parser = sub.add_parser("deal", parents=[common], help="每局给各玩家发牌并留底牌")
+    deal_parser.add_argument("--players", type=int, default=3, help="玩家数")
+    deal_parser.add_argument("--hand", type=int, default=17, help="每人张数")
+    deal_parser.add_argument("--kitty", type=int, default=0, help="底牌张数")
+    return parser
+
+
+def main(argv=None, out=None):
+    args = build_parser().parse_args(argv)
+    out = out if out is not None else sys.stdout
+    try:
+        if args.rng not in available_rng_backends():
+            raise ValueError(f"当前环境不支持随机源 {args.rng}")
+        cards = load_deck(args)
+        engine = DeckEngine(cards, rng=make_rng(args.rng, args.seed))
+        if args.command == "draw":
+            if not 0 <= args.n <= len(cards):
+                raise ValueError(f"卡组只有 {len(cards)} 张，无法每局抽 {args.n} 张")
+            lines = format_draws(cards, iter_draws(engine, args.n, args.repeat), args.format)
+        else:
+            # 先试发一局，牌数不够时在输出任何结果之前报错
+            DeckEngine(cards).deal(args.players, args.hand, args.kitty)
+            lines = format_deals(cards, iter_deals(engine, args.players, args.hand,
+                                                   args.kitty, args.repeat), args.format)
+        write_lines(lines, out)
+    except BrokenPipeError:
+        # 输出被提前关闭（例如接到 head 后面）：之后的输出都丢弃，正常退出
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""牌堆剩余构成和下一张的概率（不依赖 tkinter）
+
+按名称、点数、花色三种方式统计牌堆中剩余的张数（扑克牌按点数和花色，
+麻将数牌按一到九和万/条/筒，字牌、花牌各算一门）。统计从抽牌引擎建立一次，
+之后只按引擎报告状态变化的索引（pop_dirty() 的结果）做增量更新：
+每张状态变化的牌只改三个计数，不重新扫描已抽取的牌；重置时直接恢复初始计数。
+下一张抽到某一类的概率就是该类剩余张数除以牌堆剩余张数（随机抽牌和合并显示的
+加权抽牌都是如此）。
+"""
+from array import array
+from collections import Counter
+
+from card_engine import (MAHJONG_FLOWERS, MAHJONG_HONORS, MAHJONG_RANKS, MAHJONG_SUITS,
+                         SYMBOLS, CardDeck)
+
+# 统计方式及其显示名称
+GROUPINGS = {
+    "name": "名称",
+    "rank": "点数",
+    "suit": "花色",
+}
+
+# 没有花色的牌（大小王等）在按花色统计时的名称
+NO_SUIT = "无花色"
+
+# 麻将字牌、花牌在按花色统计时的名称
+HONOR_SUIT = "字牌"
+FLOWER_SUIT = "花牌"
+
+
+def rank_and_suit(table, symbol):
+    """某种牌用于统计的 (点数, 花色)
+
+    扑克牌直接用驻留表中的点数和花色；麻将数牌（例如"一万"）拆成点数"一"和花色"万"，
+    字牌、花牌的点数是名称本身，花色为"字牌""花牌"；其他牌没有花色。
+    """
+    name, suit = table.names[symbol], table.suits[symbol]
+    if suit is not None:
+        return table.ranks[symbol], suit
+    if len(name) == 2 and name[0] in MAHJONG_RANKS and name[1] in MAHJONG_SUITS:
+        return name[0], name[1]
+    if name in MAHJONG_HONORS:
+        return name, HONOR_SUIT
+    if name in MAHJONG_FLOWERS:
+        return name, FLOWER_SUIT
+    return table.ranks[symbol], NO_SUIT
+
+
+class RemainingComposition:
+    """一个抽牌引擎（DeckEngine 或 CountedDeckEngine）牌堆的剩余构成
+
+    rows[统计方式] 为各行的名称（按在卡组中首次出现的顺序），
+    totals/left[统计方式] 为各行的总张数和剩余张数，remaining 为牌堆剩余张数。
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        cards = engine.cards
+        if isinstance(cards, CardDeck):
+            table, symbols = cards.table, cards.ids
+        else:
+            table, symbols = SYMBOLS, SYMBOLS.intern_many(cards)
+        self.symbols = symbols
+        # 合并显示时每个索引是一种牌，张数见 engine.counts；否则每个索引一张
+        self.counted = hasattr(engine, "counts")
+        if self.counted:
+            per_symbol = Counter()
+            for symbol, count in zip(symbols, engine.counts):
+                per_symbol[symbol] += count
+        else:
+            per_symbol = Counter(symbols)
+
+        self.rows = {grouping: [] for grouping in GROUPINGS}
+        self.totals = {grouping: array('q') for grouping in GROUPINGS}
+        positions = {grouping: {} for grouping in GROUPINGS}
+        self._rows_of = {}  # 驻留表编号 -> (名称行, 点数行, 花色行)
+        for symbol, count in per_symbol.items():
+            keys = (table.names[symbol], *rank_and_suit(table, symbol))
+            rows_of = []
+            for grouping, key in zip(GROUPINGS, keys):
+                row = positions[grouping].get(key)
+                if row is None:
+                    row = positions[grouping][key] = len(self.rows[grouping])
+                    self.rows[grouping].append(key)
+                    self.totals[grouping].append(0)
+                self.totals[grouping][row] += count
+                rows_of.append(row)
+            self._rows_of[symbol] = tuple(rows_of)
+        self.total = sum(per_symbol.values())
+        self._initial = self._left_per_index_full()
+        self.reset()
+        # 建立时引擎可能已有抽取状态（例如从会话日志恢复）
+        self.sync(engine.drawn_indices)
+
+    def _left_per_index_full(self):
+        """牌堆完整时每个索引的剩余张数"""
+        if self.counted:
+            return array('q', self.engine.counts)
+        return bytearray(b'\x01') * len(self.symbols)
+
+    def _left_of(self, index):
+        """引擎中某个索引当前的剩余张数"""
+        if self.counted:
+            return self.engine.remaining[index]
+        return 0 if self.engine.is_drawn(index) else 1
+
+    def reset(self):
+        """恢复为完整牌堆的计数（只复制各行的初始计数，与已抽取的张数无关）"""
+        self.left = {grouping: array('q', totals) for grouping, totals in self.totals.items()}
+        self._left = self._initial[:]
+        self.remaining = self.total
+
+    def sync(self, indices):
+        """按引擎中这些索引的当前状态更新计数（每个索引常数时间）"""
+        left = self.left
+        name_left, rank_left, suit_left = left["name"], left["rank"], left["suit"]
+        known = self._left
+        for index in indices:
+            now = self._left_of(index)
+            delta = now - known[index]
+            if not delta:
+                continue
+            known[index] = now
+            name_row, rank_row, suit_row = self._rows_of[self.symbols[index]]
+            name_left[name_row] += delta
+            rank_left[rank_row] += delta
+            suit_left[suit_row] += delta
+            self.remaining += delta
+
+    def row_text(self, grouping, row):
+        """一行的显示文字：名称、剩余张数/总张数、下一张的概率"""
+        left = self.left[grouping][row]
+        percent = 100 * left / self.remaining if self.remaining else 0.0
+        return f"{self.rows[grouping][row]:<6}{left:>5}/{self.totals[grouping][row]:<5}{percent:>7.2f}%"
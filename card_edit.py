@@ -0,0 +1,226 @@
+"""卡组编辑操作与撤销/重做（不依赖 tkinter）
+
+每个编辑操作只记录它改动的位置和牌（编号数组），撤销时按记录反向执行，
+因此每一步占用的内存与改动的牌数成正比，而不是与卡组大小成正比。
+批量删除和插入都在一次遍历中用数组切片拼接完成（O(n)），不逐张移动；
+按规则重命名、全部替换只对每种牌计算一次新名称，再按编号扫描一遍卡组。
+"""
+import re
+from array import array
+
+
+def _widen(ids, other):
+    """两个编号数组类型不同时统一为 4 字节"""
+    if ids.typecode == other.typecode:
+        return ids, other
+    return array('I', ids), array('I', other)
+
+
+def delete_positions(deck, positions):
+    """删除卡组中指定位置（升序、不重复）的牌，返回被删除的编号数组"""
+    ids = deck.ids
+    kept = array(ids.typecode)
+    removed = array(ids.typecode)
+    previous = 0
+    for position in positions:
+        kept.extend(ids[previous:position])
+        removed.append(ids[position])
+        previous = position + 1
+    kept.extend(ids[previous:])
+    deck.ids = kept
+    return removed
+
+
+def insert_positions(deck, positions, symbols):
+    """在卡组中插入牌：positions 为插入后各张牌所在的位置（升序）"""
+    ids, symbols = _widen(deck.ids, symbols)
+    merged = array(ids.typecode)
+    source = 0
+    for target, symbol in zip(positions, symbols):
+        # 插入位置之前还缺的牌从原数组中按顺序补上
+        take = target - len(merged)
+        merged.extend(ids[source:source + take])
+        source += take
+        merged.append(symbol)
+    merged.extend(ids[source:])
+    deck.ids = merged
+
+
+class SetCards:
+    """把若干位置的牌改为新的牌（重命名）"""
+
+    def __init__(self, positions, symbols, label="重命名"):
+        self.positions = array('I', positions)
+        self.new = array('I', symbols)
+        self.old = None
+        self.label = label
+
+    def apply(self, group):
+        deck = group["cards"]
+        self.old = array('I', (deck.ids[p] for p in self.positions))
+        self._write(deck, self.new)
+
+    def revert(self, group):
+        self._write(group["cards"], self.old)
+
+    def _write(self, deck, symbols):
+        if deck.ids.typecode == 'H' and symbols and max(symbols) > 0xFFFF:
+            deck.ids = array('I', deck.ids)
+        ids = deck.ids
+        for position, symbol in zip(self.positions, symbols):
+            ids[position] = symbol
+
+
+class DeleteCards:
+    """删除若干位置的牌"""
+
+    def __init__(self, positions, label=None):
+        self.positions = array('I', sorted(set(positions)))
+        self.removed = None
+        self.label = label or f"删除 {len(self.positions)} 张"
+
+    def apply(self, group):
+        self.removed = delete_positions(group["cards"], self.positions)
+
+    def revert(self, group):
+        insert_positions(group["cards"], self.positions, self.removed)
+
+
+class InsertCards:
+    """在若干位置插入牌（positions 为插入后的位置，升序）"""
+
+    def __init__(self, positions, symbols, label=None):
+        self.positions = array('I', positions)
+        self.symbols = array('I', symbols)
+        self.label = label or f"添加 {len(self.positions)} 张"
+
+    def apply(self, group):
+        insert_positions(group["cards"], self.positions, self.symbols)
+
+    def revert(self, group):
+        delete_positions(group["cards"], self.positions)
+
+
+class ReplaceDeck:
+    """整副替换卡组（例如恢复默认）；只保存新旧两个卡组对象的引用"""
+
+    def __init__(self, deck, label="替换卡组"):
+        self.new = deck
+        self.old = None
+        self.label = label
+
+    def apply(self, group):
+        self.old = group["cards"]
+        group["cards"] = self.new
+
+    def revert(self, group):
+        group["cards"] = self.old
+
+
+class EditHistory:
+    """一个卡组的编辑历史（撤销/重做不限步数）"""
+
+    def __init__(self, group):
+        self.group = group
+        self._undo = []
+        self._redo = []
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def apply(self, edit):
+        """执行一个编辑操作并记入历史（清空重做记录）"""
+        edit.apply(self.group)
+        self._undo.append(edit)
+        self._redo.clear()
+        return edit
+
+    def undo(self):
+        """撤销最近一次操作，返回该操作；没有可撤销的操作时返回 None"""
+        if not self._undo:
+            return None
+        edit = self._undo.pop()
+        edit.revert(self.group)
+        self._redo.append(edit)
+        return edit
+
+    def redo(self):
+        """重做最近一次撤销的操作，返回该操作；没有时返回 None"""
+        if not self._redo:
+            return None
+        edit = self._redo.pop()
+        edit.apply(self.group)
+        self._undo.append(edit)
+        return edit
+
+    def _intern(self, names):
+        return self.group["cards"].table.intern_many(names)
+
+    def rename(self, index, name):
+        """重命名一张牌"""
+        return self.apply(SetCards([index], self._intern([name])))
+
+    def delete(self, indices):
+        """删除若干张牌"""
+        return self.apply(DeleteCards(indices))
+
+    def insert(self, index, names, label=None):
+        """在 index 处依次插入若干张牌"""
+        positions = range(index, index + len(names))
+        return self.apply(InsertCards(positions, self._intern(names), label))
+
+    def append(self, name):
+        """在末尾添加一张牌"""
+        return self.insert(len(self.group["cards"]), [name])
+
+    def replace(self, deck, label="替换卡组"):
+        """整副替换卡组"""
+        return self.apply(ReplaceDeck(deck, label))
+
+    def _map_symbols(self, mapping, label):
+        """把卡组中编号在 mapping 里的牌一次性改为对应的新编号；没有改动时返回 None"""
+        if not mapping:
+            return None
+        ids = self.group["cards"].ids
+        positions = [i for i, symbol in enumerate(ids) if symbol in mapping]
+        if not positions:
+            return None
+        return self.apply(SetCards(positions, [mapping[ids[i]] for i in positions], label))
+
+    def rename_matching(self, pattern, replacement):
+        """按正则表达式重命名所有匹配的牌（re.sub 规则），返回操作；没有匹配时返回 None"""
+        regex = re.compile(pattern)
+        table = self.group["cards"].table
+        mapping = {}
+        for symbol in set(self.group["cards"].ids):
+            name = table.names[symbol]
+            new_name = regex.sub(replacement, name).strip()
+            if new_name and new_name != name:
+                mapping[symbol] = table.intern(new_name)
+        return self._map_symbols(mapping, "按规则重命名")
+
+    def replace_all(self, old_name, new_name):
+        """把所有名为 old_name 的牌改为 new_name，返回操作；没有这种牌时返回 None"""
+        table = self.group["cards"].table
+        symbol = table.id_of(old_name)
+        if symbol is None or old_name == new_name:
+            return None
+        return self._map_symbols({symbol: table.intern(new_name)}, "全部替换")
+
+    def dedupe(self):
+        """去除重复的牌（保留每种牌第一次出现的一张），返回操作；没有重复时返回 None"""
+        seen = set()
+        duplicates = []
+        for i, symbol in enumerate(self.group["cards"].ids):
+            if symbol in seen:
+                duplicates.append(i)
+            else:
+                seen.add(symbol)
+        if not duplicates:
+            return None
+        return self.apply(DeleteCards(duplicates, "去除重复"))
@@ -0,0 +1,974 @@
+"""抽牌引擎（不依赖 tkinter，可在脚本和测试中直接使用）"""
+import importlib.util
+import random
+import struct
+import sys
+import threading
+from array import array
+
+# NumPy 为可选依赖，只有 PCG64 随机源和向量化需要；导入它要上百毫秒，
+# 因此启动时只检查是否安装，第一次用到时才由 numpy_module() 导入
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def numpy_module():
+    """按需导入 NumPy 并返回；未安装时返回 None"""
+    global np
+    if np is None and HAS_NUMPY:
+        import numpy
+        np = numpy
+    return np
+
+# 扑克牌花色（卡牌名称以花色结尾时，去掉花色即为点数）
+SUITS = ('♦', '♣', '♥', '♠')
+
+# 大小王
+JOKERS = ("小王", "大王")
+
+# 麻将：数牌按结尾的字分为三门，前面的字是点数；字牌和花牌没有点数
+MAHJONG_SUITS = ('万', '条', '筒')
+MAHJONG_RANKS = ('一', '二', '三', '四', '五', '六', '七', '八', '九')
+MAHJONG_HONORS = ('东', '南', '西', '北', '中', '发', '白')
+MAHJONG_FLOWERS = ('春', '夏', '秋', '冬', '梅', '兰', '竹', '菊')
+
+
+def rank_of(card):
+    """卡牌的点数：扑克牌去掉花色，其他卡牌（大小王、麻将牌等）就是名称本身"""
+    if len(card) > 1 and card.endswith(SUITS):
+        return card[:-1]
+    return card
+
+
+def suit_of(card):
+    """卡牌的花色；不是扑克牌花色结尾时为 None"""
+    if len(card) > 1 and card.endswith(SUITS):
+        return card[-1]
+    return None
+
+
+class CardSymbolTable:
+    """卡牌名称的驻留表：名称 <-> 小整数编号
+
+    每个名称只保存一份，点数、花色等信息在第一次出现时计算一次，
+    之后按编号直接查表。登记新名称时加锁，后台载入线程可以同时使用。
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ranks = []
+        self.suits = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def intern(self, name):
+        """返回名称的编号，第一次出现时登记"""
+        symbol = self._ids.get(name)
+        if symbol is None:
+            with self._lock:
+                symbol = self._ids.get(name)
+                if symbol is None:
+                    # 先登记名称再公开编号，其他线程查到编号时名称一定已存在
+                    symbol = len(self.names)
+                    self.names.append(name)
+                    self.ranks.append(rank_of(name))
+                    self.suits.append(suit_of(name))
+                    self._ids[name] = symbol
+        return symbol
+
+    def intern_many(self, names):
+        """批量返回名称的编号列表（已登记的名称只做一次字典查找）"""
+        get = self._ids.get
+        symbols = [get(name) for name in names]
+        if None in symbols:
+            intern = self.intern
+            symbols = [intern(name) if symbol is None else symbol
+                       for name, symbol in zip(names, symbols)]
+        return symbols
+
+    def id_of(self, name):
+        """名称的编号；未登记时返回 None"""
+        return self._ids.get(name)
+
+    def name(self, symbol):
+        return self.names[symbol]
+
+
+# 全局共享的驻留表（所有卡组共用，相同名称只存一份）
+SYMBOLS = CardSymbolTable()
+
+
+class CardDeck:
+    """以整数编号数组存储的卡组
+
+    对外表现得和卡牌名称列表一样（下标、迭代、append、del 等），
+    内部每张牌只占 2 字节（编号超过 65535 时自动改为 4 字节）。
+    """
+
+    def __init__(self, names=(), table=None):
+        self.table = table if table is not None else SYMBOLS
+        self.ids = array('H')
+        self.extend(names)
+
+    @classmethod
+    def from_ids(cls, ids, table=None):
+        """直接由编号序列创建卡组"""
+        deck = cls(table=table)
+        deck.ids = array('I' if len(deck.table) > 0xFFFF else 'H', ids)
+        return deck
+
+    def _encode(self, name):
+        symbol = self.table.intern(name)
+        if symbol > 0xFFFF and self.ids.typecode == 'H':
+            self.ids = array('I', self.ids)
+        return symbol
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return map(self.table.names.__getitem__, self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.names[symbol] for symbol in self.ids[index]]
+        return self.table.names[self.ids[index]]
+
+    def __setitem__(self, index, name):
+        self.ids[index] = self._encode(name)
+
+    def __delitem__(self, index):
+        del self.ids[index]
+
+    def __contains__(self, name):
+        symbol = self.table.id_of(name)
+        return symbol is not None and symbol in self.ids
+
+    def __eq__(self, other):
+        if isinstance(other, CardDeck) and other.table is self.table:
+            return self.ids == other.ids
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CardDeck({list(self)!r})"
+
+    def append(self, name):
+        self.ids.append(self._encode(name))
+
+    def extend(self, names):
+        if isinstance(names, CardDeck) and names.table is self.table:
+            # 同一驻留表的卡组直接拼接编号数组
+            ids = names.ids
+            if ids.typecode != self.ids.typecode:
+                if ids.typecode == 'I':
+                    self.ids = array('I', self.ids)
+                else:
+                    ids = array('I', ids)
+            self.ids.extend(ids)
+            return
+        for name in names:
+            self.append(name)
+
+    def insert(self, index, name):
+        self.ids.insert(index, self._encode(name))
+
+    def copy(self):
+        """复制卡组（只复制编号数组）"""
+        deck = CardDeck(table=self.table)
+        deck.ids = array(self.ids.typecode, self.ids)
+        return deck
+
+    def to_list(self):
+        """转换为卡牌名称列表"""
+        return list(self)
+
+
+# 默认卡组的点数顺序：K>Q>J>10>...>A（花色顺序见 SUITS：方块>梅花>红心>黑桃）
+STANDARD_RANKS = ('K', 'Q', 'J', '10', '9', '8', '7', '6', '5', '4', '3', '2', 'A')
+
+
+def standard_deck(copies=1, table=None):
+    """copies 副带大小王的扑克牌（54 张一副），按默认卡组的顺序排列
+
+    同一花色的几副牌排在一起，最后是 copies 张小王和 copies 张大王。
+    """
+    cards = CardDeck(table=table)
+    for suit in SUITS:
+        for _ in range(copies):
+            cards.extend(f"{rank}{suit}" for rank in STANDARD_RANKS)
+    for joker in JOKERS:
+        cards.extend([joker] * copies)
+    return cards
+
+
+class MersenneTwisterRandom(random.Random):
+    """标准库的梅森旋转随机源（可设置种子）"""
+
+    name = "mt"
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.initial_seed = seed
+
+
+class PCG64Random:
+    """NumPy 的 PCG64 随机源（可设置种子）
+
+    成批取出 64 位随机数缓存起来，randrange 用拒绝采样保证结果无偏。
+    """
+
+    name = "pcg64"
+    _BUFFER_SIZE = 1024
+
+    def __init__(self, seed=None):
+        np = numpy_module()
+        if np is None:
+            raise RuntimeError("未安装 NumPy，无法使用 PCG64 随机源")
+        self.initial_seed = seed
+        self._bit_generator = np.random.PCG64(seed)
+        self._buffer = []
+
+    def _next_word(self):
+        if not self._buffer:
+            self._buffer = self._bit_generator.random_raw(self._BUFFER_SIZE).tolist()
+        return self._buffer.pop()
+
+    def randrange(self, start, stop=None):
+        """返回 [start, stop) 中的随机整数"""
+        if stop is None:
+            start, stop = 0, start
+        n = stop - start
+        if n <= 0:
+            raise ValueError("随机数范围为空")
+        limit = (1 << 64) - (1 << 64) % n
+        word = self._next_word()
+        while word >= limit:
+            word = self._next_word()
+        return start + word % n
+
+
+class SystemRandomSource(random.SystemRandom):
+    """操作系统提供的安全随机源（用于对公平性要求高的抽牌，不能设置种子）"""
+
+    name = "secrets"
+
+    def __init__(self, seed=None):
+        if seed is not None:
+            raise ValueError("安全随机源不支持设置种子")
+        super().__init__()
+        self.initial_seed = None
+
+
+# 可选的随机源：名称 -> (类, 界面显示名称)
+RNG_BACKENDS = {
+    MersenneTwisterRandom.name: (MersenneTwisterRandom, "梅森旋转"),
+    PCG64Random.name: (PCG64Random, "PCG64"),
+    SystemRandomSource.name: (SystemRandomSource, "系统安全随机"),
+}
+
+
+def make_rng(backend="mt", seed=None):
+    """按名称创建随机源"""
+    if backend not in RNG_BACKENDS:
+        raise ValueError(f"未知的随机源: {backend}")
+    return RNG_BACKENDS[backend][0](seed)
+
+
+def available_rng_backends():
+    """当前环境可用的随机源名称"""
+    return [name for name in RNG_BACKENDS if name != PCG64Random.name or HAS_NUMPY]
+
+
+class DrawLog:
+    """紧凑的抽牌记录
+
+    每个操作占 4 字节（索引左移 2 位再加操作码），可以保存成文件，
+    之后脱离界面在引擎上按原速重放整局。kind 记录索引的含义：
+    "card" 为第几张牌（DeckEngine），"counted" 为第几种牌（CountedDeckEngine）。
+    """
+
+    DRAW = 0
+    TOGGLE = 1
+    RESET = 2
+    PUT_BACK = 3  # 放回一张（合并显示时右键）
+
+    MAGIC = b"CDL2"
+    OLD_MAGIC = b"CDL1"  # 没有 kind 字段的旧格式，重放时不检查引擎种类
+
+    KINDS = ("card", "counted")
+
+    def __init__(self, deck_size=0, backend="mt", seed=None, kind=None):
+        self.deck_size = deck_size
+        self.backend = backend
+        self.seed = seed
+        self.kind = kind
+        self.ops = array('I')
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        """依次给出 (操作码, 索引)"""
+        for word in self.ops:
+            yield word & 3, word >> 2
+
+    def record(self, op, index=0):
+        """追加一个操作"""
+        self.ops.append(index << 2 | op)
+
+    def clear(self):
+        self.ops = array('I')
+
+    def to_bytes(self):
+        """序列化：文件头（魔数、引擎种类、牌数、随机源、种子）+ 操作数组（小端）"""
+        backend = self.backend.encode("ascii")
+        seed = b"" if self.seed is None else str(self.seed).encode("ascii")
+        kind = 0xFF if self.kind is None else self.KINDS.index(self.kind)
+        ops = array('I', self.ops)
+        if sys.byteorder != "little":
+            ops.byteswap()
+        return (self.MAGIC + struct.pack("<BIB", kind, self.deck_size, len(backend)) + backend
+                + struct.pack("<B", len(seed)) + seed + ops.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """从 to_bytes() 的结果恢复（也接受旧的 CDL1 格式）"""
+        if data[:4] == cls.MAGIC:
+            kind_code, deck_size, backend_len = struct.unpack_from("<BIB", data, 4)
+            if kind_code != 0xFF and kind_code >= len(cls.KINDS):
+                raise ValueError("不是有效的抽牌记录")
+            kind = None if kind_code == 0xFF else cls.KINDS[kind_code]
+            pos = 10
+        elif data[:4] == cls.OLD_MAGIC:
+            deck_size, backend_len = struct.unpack_from("<IB", data, 4)
+            kind = None
+            pos = 9
+        else:
+            raise ValueError("不是有效的抽牌记录")
+        backend = data[pos:pos + backend_len].decode("ascii")
+        pos += backend_len
+        seed_len = data[pos]
+        pos += 1
+        seed = int(data[pos:pos + seed_len]) if seed_len else None
+        pos += seed_len
+        log = cls(deck_size, backend, seed, kind)
+        log.ops.frombytes(data[pos:])
+        if sys.byteorder != "little":
+            log.ops.byteswap()
+        return log
+
+    def replay(self, engine, use_rng=False):
+        """在引擎上重放记录
+
+        默认直接使用记录中的抽牌结果；use_rng=True 时改用引擎自己的随机源
+        重新抽牌（引擎需用相同随机源和种子创建），结果不一致时抛出 ValueError。
+        记录与引擎的种类（逐张/合并）不同时索引含义不同，也抛出 ValueError。
+        """
+        if self.kind is not None and engine.log.kind is not None and self.kind != engine.log.kind:
+            raise ValueError("抽牌记录与引擎的种类（逐张/合并显示）不匹配")
+        if len(engine) != self.deck_size:
+            raise ValueError("抽牌记录与卡组牌数不匹配")
+        for op, index in self:
+            if op == self.DRAW:
+                if use_rng:
+                    if engine.draw() != index:
+                        raise ValueError("重放结果与记录不一致")
+                else:
+                    engine.mark_drawn(index)
+                    engine.current_index = index
+                    engine.log.record(self.DRAW, index)
+            elif op == self.TOGGLE:
+                engine.toggle(index)
+            elif op == self.PUT_BACK:
+                engine.put_back(index)
+            else:
+                engine.reset()
+        return engine
+
+
+class DrawnState:
+    """紧凑的抽取状态：位图记录是否已抽取，数组记录抽取顺序
+
+    是否已抽取、标记、取消标记、计数都是 O(1)。取消标记时只在顺序数组中
+    留下空位（-1），空位过多时再整体压缩，均摊仍为 O(1)。
+    """
+
+    def __init__(self, size=0):
+        self.size = size
+        self._bits = bytearray((size + 7) >> 3)
+        self._order = array('i')
+        self._slot = array('i', [-1]) * size
+        self._count = 0
+        self._holes = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, index):
+        return self.is_drawn(index)
+
+    def is_drawn(self, index):
+        """判断某张牌是否已被标记"""
+        return (self._bits[index >> 3] >> (index & 7)) & 1 == 1
+
+    def mark(self, index):
+        """标记为已抽取；已标记时返回 False"""
+        byte, bit = index >> 3, 1 << (index & 7)
+        if self._bits[byte] & bit:
+            return False
+        self._bits[byte] |= bit
+        self._slot[index] = len(self._order)
+        self._order.append(index)
+        self._count += 1
+        return True
+
+    def unmark(self, index):
+        """取消标记；未标记时返回 False"""
+        byte, bit = index >> 3, 1 << (index & 7)
+        if not self._bits[byte] & bit:
+            return False
+        self._bits[byte] &= ~bit
+        self._order[self._slot[index]] = -1
+        self._count -= 1
+        self._holes += 1
+        if self._holes > 32 and self._holes > self._count:
+            self._compact()
+        return True
+
+    def _compact(self):
+        """去掉顺序数组中的空位"""
+        order = array('i', (i for i in self._order if i >= 0))
+        for pos, index in enumerate(order):
+            self._slot[index] = pos
+        self._order = order
+        self._holes = 0
+
+    def clear(self):
+        """清空所有标记"""
+        self._bits = bytearray(len(self._bits))
+        self._order = array('i')
+        self._count = 0
+        self._holes = 0
+
+    def order(self):
+        """按抽取顺序返回所有已标记的索引"""
+        if self._holes:
+            return [i for i in self._order if i >= 0]
+        return self._order.tolist()
+
+    def snapshot(self):
+        """以位图字节的形式导出状态（每 8 张牌 1 字节）"""
+        return bytes(self._bits)
+
+    def restore(self, data):
+        """从 snapshot() 导出的字节恢复状态（抽取顺序按索引升序重建）"""
+        if len(data) != len(self._bits):
+            raise ValueError("快照大小与卡组不匹配")
+        self.clear()
+        for byte_index, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                self.mark((byte_index << 3) + low.bit_length() - 1)
+                byte ^= low
+
+
+class DeckEngine:
+    """无界面的抽牌引擎
+
+    内部维护一个部分 Fisher–Yates 置换：``_perm[:_k]`` 为已抽取的牌索引，
+    ``_perm[_k:]`` 为剩余牌堆，``_pos`` 记录每个索引在置换中的位置。
+    因此抽牌、放回、重置都只需常数时间，与卡组大小无关。
+    ``drawn`` 是对应的 DrawnState，用于 O(1) 查询和记录抽取顺序。
+    每次状态变化的索引会记入脏集合，界面通过 pop_dirty() 只重绘变化的牌。
+    """
+
+    def __init__(self, cards=None, rng=None):
+        # 随机数来源（默认为不设种子的梅森旋转）
+        self.rng = rng if rng is not None else MersenneTwisterRandom()
+        self.cards = []
+        self._perm = []
+        self._pos = []
+        self._k = 0
+        self.drawn = DrawnState()
+        self.current_index = None
+        self._dirty = set()
+        self.load(cards or [])
+
+    def load(self, cards):
+        """载入卡牌列表并清空抽取状态"""
+        self.cards = cards
+        n = len(cards)
+        self._perm = list(range(n))
+        self._pos = list(range(n))
+        self._k = 0
+        self.drawn = DrawnState(n)
+        self.current_index = None
+        self._dirty = set()
+        self.log = DrawLog(n, self.rng.name, self.rng.initial_seed, "card")
+
+    def restart(self):
+        """以当前随机源重新载入同一副牌（更换随机源后调用）"""
+        self.load(self.cards)
+
+    def __len__(self):
+        return len(self.cards)
+
+    @property
+    def drawn_count(self):
+        """已抽取的牌数"""
+        return self._k
+
+    @property
+    def remaining_count(self):
+        """牌堆中剩余的牌数"""
+        return len(self._perm) - self._k
+
+    @property
+    def current_card(self):
+        """当前牌的名称（没有当前牌时为 None）"""
+        if self.current_index is None:
+            return None
+        return self.cards[self.current_index]
+
+    @property
+    def drawn_indices(self):
+        """按抽取顺序返回所有已抽取牌的索引"""
+        return self.drawn.order()
+
+    def is_drawn(self, index):
+        """判断某张牌是否已被抽取"""
+        return self.drawn.is_drawn(index)
+
+    def _swap(self, a, b):
+        """交换置换中位置 a、b 上的两张牌"""
+        perm, pos = self._perm, self._pos
+        ia, ib = perm[a], perm[b]
+        perm[a], perm[b] = ib, ia
+        pos[ia], pos[ib] = b, a
+
+    def draw(self):
+        """从剩余牌堆中随机抽取一张，返回其索引；牌堆为空时返回 None"""
+        n = len(self._perm)
+        if self._k >= n:
+            return None
+        self._swap(self._k, self.rng.randrange(self._k, n))
+        index = self._perm[self._k]
+        self._k += 1
+        self.drawn.mark(index)
+        self._dirty.add(index)
+        self.current_index = index
+        self.log.record(DrawLog.DRAW, index)
+        return index
+
+    def draw_many(self, k):
+        """一次随机抽取 k 张（不足 k 张时抽完为止），按抽取顺序返回索引列表
+
+        在置换上连续做 k 步 Fisher–Yates，与连续调用 k 次 draw() 的结果和
+        随机数消耗完全相同，因此抽牌记录照常逐张记录，可以重放。
+        """
+        perm, pos = self._perm, self._pos
+        n = len(perm)
+        start = self._k
+        stop = min(start + max(k, 0), n)
+        randrange = self.rng.randrange
+        for j in range(start, stop):
+            r = randrange(j, n)
+            ia, ib = perm[j], perm[r]
+            perm[j], perm[r] = ib, ia
+            pos[ia], pos[ib] = r, j
+        drawn = perm[start:stop]
+        self._k = stop
+        mark = self.drawn.mark
+        for index in drawn:
+            mark(index)
+        self._dirty.update(drawn)
+        self.log.ops.extend([index << 2 | DrawLog.DRAW for index in drawn])
+        if drawn:
+            self.current_index = drawn[-1]
+        return drawn
+
+    def deal(self, players, hand_size, kitty=0):
+        """给 players 位玩家各发 hand_size 张，另留 kitty 张底牌，返回 (各玩家的手牌, 底牌)
+
+        所有牌一次抽出（见 draw_many），再像真实发牌一样轮流分给各玩家，
+        底牌是最后抽出的 kitty 张。剩余牌数不足时抛出 ValueError，不抽任何牌。
+        """
+        if players < 1 or hand_size < 0 or kitty < 0:
+            raise ValueError("玩家数至少为1，每人张数和底牌数不能为负")
+        total = players * hand_size + kitty
+        if total > self.remaining_count:
+            raise ValueError(f"剩余 {self.remaining_count} 张，不够发 {total} 张")
+        drawn = self.draw_many(total)
+        dealt = players * hand_size
+        hands = [drawn[p:dealt:players] for p in range(players)]
+        return hands, drawn[dealt:]
+
+    def mark_drawn(self, index):
+        """把指定的牌标记为已抽取；已抽取时返回 False"""
+        if self.is_drawn(index):
+            return False
+        self._swap(self._pos[index], self._k)
+        self._k += 1
+        self.drawn.mark(index)
+        self._dirty.add(index)
+        return True
+
+    def _return(self, index):
+        """把一张已抽取的牌移回牌堆（不记录）"""
+        self._k -= 1
+        self._swap(self._pos[index], self._k)
+        self.drawn.unmark(index)
+        self._dirty.add(index)
+
+    def put_back(self, index):
+        """把已抽取的牌放回牌堆；未抽取时返回 False"""
+        if not self.is_drawn(index):
+            return False
+        self._return(index)
+        self.log.record(DrawLog.PUT_BACK, index)
+        return True
+
+    def toggle(self, index):
+        """切换某张牌的抽取状态，并把它设为当前牌；返回切换后是否已抽取"""
+        if self.is_drawn(index):
+            self._return(index)
+            drawn = False
+        else:
+            self.mark_drawn(index)
+            drawn = True
+        self.current_index = index
+        self.log.record(DrawLog.TOGGLE, index)
+        return drawn
+
+    def reset(self):
+        """清空所有抽取状态（只移动边界，不重建置换），返回之前已抽取的索引"""
+        previous = self.drawn.order()
+        self._dirty.update(previous)
+        self._k = 0
+        self.drawn.clear()
+        self.current_index = None
+        self.log.record(DrawLog.RESET)
+        return previous
+
+    def pop_dirty(self):
+        """取出并清空自上次调用以来状态发生变化的索引集合"""
+        dirty = self._dirty
+        self._dirty = set()
+        return dirty
+
+    def snapshot(self):
+        """导出抽取状态（位图字节）"""
+        return self.drawn.snapshot()
+
+    def restore(self, data):
+        """从 snapshot() 导出的字节恢复抽取状态"""
+        state = DrawnState(len(self.cards))
+        state.restore(data)
+        self.reset()
+        for index in state.order():
+            self.mark_drawn(index)
+
+
+class FenwickTree:
+    """树状数组：单点增减和按前缀和查找都是 O(log n)"""
+
+    def __init__(self, values=()):
+        values = list(values)
+        self.size = len(values)
+        tree = [0] + values
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self.total = sum(values)
+        self._top = 1 << self.size.bit_length() if self.size else 0
+
+    def add(self, index, delta):
+        """第 index 项（从 0 开始）加上 delta"""
+        self.total += delta
+        i = index + 1
+        tree = self._tree
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, target):
+        """返回前缀和首次超过 target 的项（0 <= target < total）"""
+        tree = self._tree
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos
+
+
+class CountedDeck:
+    """多重集形式的卡组：每种牌一项（编号 + 张数），保持首次出现的顺序"""
+
+    def __init__(self, symbols=(), counts=(), table=None):
+        self.table = table if table is not None else SYMBOLS
+        self.symbols = array('I', symbols)
+        self.counts = array('I', counts)
+
+    @classmethod
+    def from_cards(cls, cards):
+        """把卡组（CardDeck 或名称序列）中的重复牌合并为张数"""
+        if isinstance(cards, CardDeck):
+            table, keys = cards.table, cards.ids
+        else:
+            table = SYMBOLS
+            keys = [table.intern(name) for name in cards]
+        positions = {}
+        symbols = array('I')
+        counts = array('I')
+        for symbol in keys:
+            pos = positions.get(symbol)
+            if pos is None:
+                positions[symbol] = len(symbols)
+                symbols.append(symbol)
+                counts.append(1)
+            else:
+                counts[pos] += 1
+        return cls(symbols, counts, table)
+
+    def __len__(self):
+        """不同卡牌的种数"""
+        return len(self.symbols)
+
+    @property
+    def total(self):
+        """总张数"""
+        return sum(self.counts)
+
+    def names(self):
+        """按顺序返回每种牌的名称"""
+        return CardDeck.from_ids(self.symbols, self.table)
+
+
+class CountedDeckEngine:
+    """多重集卡组的抽牌引擎
+
+    索引指"第几种牌"而不是"第几张牌"。抽牌按剩余张数加权，
+    用树状数组实现 O(log 种数)；内存和重绘开销只与牌的种数有关。
+    接口与 DeckEngine 保持一致，界面可以直接替换使用。
+    """
+
+    def __init__(self, cards=None, rng=None):
+        self.rng = rng if rng is not None else MersenneTwisterRandom()
+        self.load(cards or [])
+
+    def load(self, cards):
+        """载入卡组（重复的牌合并计数）并清空抽取状态"""
+        counted = cards if isinstance(cards, CountedDeck) else CountedDeck.from_cards(cards)
+        self.counted = counted
+        self.cards = counted.names()
+        self.counts = counted.counts
+        self.remaining = array('I', counted.counts)
+        self._tree = FenwickTree(self.remaining)
+        self.deck_size = self._tree.total
+        self.current_index = None
+        self._order = {}  # 有牌被抽出的种类（只用键），按首次抽出的顺序；全部放回时移除
+        self._dirty = set()
+        self.log = DrawLog(len(counted), self.rng.name, self.rng.initial_seed, "counted")
+
+    def restart(self):
+        """以当前随机源重新载入同一副牌（更换随机源后调用）"""
+        self.load(self.counted)
+
+    def __len__(self):
+        return len(self.cards)
+
+    @property
+    def drawn_count(self):
+        """已抽取的张数"""
+        return self.deck_size - self._tree.total
+
+    @property
+    def remaining_count(self):
+        """牌堆中剩余的张数"""
+        return self._tree.total
+
+    @property
+    def current_card(self):
+        if self.current_index is None:
+            return None
+        return self.cards[self.current_index]
+
+    @property
+    def drawn_indices(self):
+        """有牌被抽出的种类索引"""
+        return list(self._order)
+
+    def is_drawn(self, index):
+        """某种牌是否已全部抽完"""
+        return self.remaining[index] == 0
+
+    def remaining_of(self, index):
+        """某种牌剩余的张数"""
+        return self.remaining[index]
+
+    def take(self, index):
+        """从某种牌中取出一张；已取完时返回 False"""
+        if self.remaining[index] == 0:
+            return False
+        if self.remaining[index] == self.counts[index]:
+            self._order[index] = None
+        self.remaining[index] -= 1
+        self._tree.add(index, -1)
+        self._dirty.add(index)
+        return True
+
+    def _return(self, index, copies):
+        """把某种牌放回 copies 张（不超过原有张数，不记录），返回实际放回的张数"""
+        copies = min(copies, self.counts[index] - self.remaining[index])
+        if copies <= 0:
+            return 0
+        self.remaining[index] += copies
+        if self.remaining[index] == self.counts[index]:
+            del self._order[index]
+        self._tree.add(index, copies)
+        self._dirty.add(index)
+        return copies
+
+    def put_back(self, index, copies=1):
+        """把某种牌放回 copies 张（不超过原有张数）；没有可放回的牌时返回 False
+
+        每放回一张记录一个 PUT_BACK 操作，重放和会话日志恢复时逐张放回。
+        """
+        copies = self._return(index, copies)
+        self.log.ops.extend([index << 2 | DrawLog.PUT_BACK] * copies)
+        return copies > 0
+
+    mark_drawn = take
+
+    def draw(self):
+        """按剩余张数加权随机抽取一张，返回种类索引；牌堆为空时返回 None"""
+        if self._tree.total == 0:
+            return None
+        index = self._tree.find(self.rng.randrange(self._tree.total))
+        self.take(index)
+        self.current_index = index
+        self.log.record(DrawLog.DRAW, index)
+        return index
+
+    def draw_many(self, k):
+        """一次按剩余张数加权抽取 k 张（不足时抽完为止），按抽取顺序返回种类索引列表"""
+        tree, randrange, take = self._tree, self.rng.randrange, self.take
+        drawn = []
+        for _ in range(min(max(k, 0), tree.total)):
+            index = tree.find(randrange(tree.total))
+            take(index)
+            drawn.append(index)
+        self.log.ops.extend([index << 2 | DrawLog.DRAW for index in drawn])
+        if drawn:
+            self.current_index = drawn[-1]
+        return drawn
+
+    # 发牌方式与 DeckEngine 相同（只依赖 draw_many 和 remaining_count）
+    deal = DeckEngine.deal
+
+    def toggle(self, index):
+        """点击某种牌：还有剩余则取出一张，已取完则全部放回；返回该种牌是否已取完"""
+        if self.remaining[index]:
+            self.take(index)
+        else:
+            self._return(index, self.counts[index])
+        self.current_index = index
+        self.log.record(DrawLog.TOGGLE, index)
+        return self.is_drawn(index)
+
+    def reset(self):
+        """放回所有牌，返回之前有牌被抽出的种类索引"""
+        previous = self.drawn_indices
+        for index in previous:
+            self._return(index, self.counts[index])
+        self._order = {}
+        self.current_index = None
+        self.log.record(DrawLog.RESET)
+        return previous
+
+    def pop_dirty(self):
+        """取出并清空自上次调用以来状态发生变化的种类索引集合"""
+        dirty = self._dirty
+        self._dirty = set()
+        return dirty
+
+    def snapshot(self):
+        """导出每种牌的剩余张数"""
+        return self.remaining.tobytes()
+
+    def restore(self, data):
+        """从 snapshot() 导出的字节恢复剩余张数"""
+        remaining = array('I')
+        remaining.frombytes(data)
+        if len(remaining) != len(self.counts):
+            raise ValueError("快照大小与卡组不匹配")
+        self.reset()
+        for index, left in enumerate(remaining):
+            for _ in range(self.counts[index] - left):
+                self.take(index)
+
+
+def _deck_symbols(cards):
+    """卡组中每张（或每种）牌的驻留表编号"""
+    if isinstance(cards, CardDeck):
+        return cards.ids
+    return SYMBOLS.intern_many(list(cards))
+
+
+def transfer_draw_state(source, target):
+    """把同一副牌在 source 引擎中的抽取状态换算到 target 引擎
+
+    用于逐张显示（DeckEngine）和合并显示（CountedDeckEngine）之间切换，两种显示属于同一局。
+    target 以新的抽牌记录重新开始，换算后的每张牌记为一个 DRAW 操作，因此导出记录和
+    会话日志重放后得到相同的状态。按原来的抽取顺序换算；逐张引擎中同名的牌按在卡组中的
+    先后顺序选取。当前牌换算为同名的牌；它已被放回时，当前牌为最后换算的一张。
+    """
+    source_symbols = _deck_symbols(source.cards)
+    drawn = []  # 按抽取顺序列出已抽出的牌的编号（同种牌按张数重复）
+    if isinstance(source, CountedDeckEngine):
+        for kind in source.drawn_indices:
+            drawn.extend([source_symbols[kind]] * (source.counts[kind] - source.remaining[kind]))
+    else:
+        drawn = [source_symbols[index] for index in source.drawn_indices]
+    current = None
+    if source.current_index is not None:
+        symbol = source_symbols[source.current_index]
+        if symbol in drawn:
+            current = symbol
+
+    target.restart()
+    target_symbols = _deck_symbols(target.cards)
+    if isinstance(target, CountedDeckEngine):
+        kind_of = {symbol: kind for kind, symbol in enumerate(target_symbols)}
+        indices = [kind_of[symbol] for symbol in drawn]
+    else:
+        positions = {}
+        for index in range(len(target_symbols) - 1, -1, -1):
+            positions.setdefault(target_symbols[index], []).append(index)
+        indices = [positions[symbol].pop() for symbol in drawn]
+    if current is not None:
+        # 当前牌放到最后，重放时最后一个 DRAW 操作即为当前牌
+        last = max(i for i, symbol in enumerate(drawn) if symbol == current)
+        indices.append(indices.pop(last))
+    for index in indices:
+        target.mark_drawn(index)
+        target.log.record(DrawLog.DRAW, index)
+    target.current_index = indices[-1] if indices else None
+    return indices
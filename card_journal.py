@@ -0,0 +1,165 @@
+"""抽牌状态的会话日志（不依赖 tkinter）
+
+每个卡组一个只追加的日志文件：文件头和快照之后，依次是抽牌、点击、放回、重置操作，
+编码与 DrawLog 相同（每个操作 4 字节）。点击时操作只追加到内存缓冲区，
+由定时器批量写入并 fsync，因此点击不会等待磁盘；日志变长后压缩为新的快照。
+程序或机器意外退出后，下次打开该卡组时用快照加后续操作恢复抽取状态和当前牌。
+"""
+import os
+import struct
+import sys
+import zlib
+
+from card_engine import DrawLog
+
+# 文件头：魔数、牌数、卡组指纹、当前牌索引（-1 表示无）、快照字节数
+HEADER = struct.Struct("<4sIIiI")
+MAGIC = b"CDJ1"
+
+# 日志中的操作超过该数量时，在下次定时写入时压缩为快照
+COMPACT_OPS = 4096
+
+
+def deck_fingerprint(cards):
+    """卡组内容的指纹（卡组被修改后旧日志不再适用）"""
+    crc = 0
+    for card in cards:
+        crc = zlib.crc32(card.encode("utf-8") + b"\n", crc)
+    return crc
+
+
+class SessionJournal:
+    """一个卡组（一种显示方式）的抽牌会话日志
+
+    recover() 在新建的引擎上恢复上次的状态，attach() 开始记录该引擎；
+    sync() 在每次操作后调用，只把新操作追加到内存缓冲区；
+    flush() 写入文件并 fsync，由界面定时调用。
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.engine = None
+        self._log = None
+        self._logged = 0
+        self._buffer = bytearray()
+        self._ops_in_file = 0
+        self._file = None
+
+    def recover(self, engine):
+        """用日志恢复引擎的抽取状态；日志不存在、损坏或与卡组不符时返回 False"""
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return False
+        if len(data) < HEADER.size:
+            return False
+        magic, deck_size, fingerprint, current, snapshot_len = HEADER.unpack_from(data)
+        if magic != MAGIC or deck_size != len(engine) or fingerprint != self.fingerprint:
+            return False
+        start = HEADER.size
+        snapshot = data[start:start + snapshot_len]
+        if len(snapshot) != snapshot_len:
+            return False
+        # 末尾不完整的操作（写入到一半时中断）直接丢弃
+        ops_data = data[start + snapshot_len:]
+        ops_data = ops_data[:len(ops_data) - len(ops_data) % 4]
+
+        try:
+            engine.restore(snapshot)
+            engine.current_index = current if current >= 0 else None
+            log = DrawLog(deck_size)
+            log.ops.frombytes(ops_data)
+            if sys.byteorder != "little":
+                log.ops.byteswap()
+            log.replay(engine)
+        except (ValueError, IndexError):
+            engine.reset()
+            return False
+        return True
+
+    def attach(self, engine):
+        """开始记录引擎的后续操作（先把当前状态压缩为快照）"""
+        self.engine = engine
+        self._log = engine.log
+        self._logged = len(engine.log)
+        self.compact()
+
+    def sync(self):
+        """把引擎新增的操作追加到缓冲区（不写磁盘）"""
+        log = self.engine.log
+        if log is not self._log:
+            # 引擎重新载入（例如更换随机源），相当于一次重置
+            self._log = log
+            self._logged = 0
+            self._buffer += struct.pack("<I", DrawLog.RESET)
+        ops = log.ops
+        if len(ops) > self._logged:
+            new = ops[self._logged:]
+            if sys.byteorder != "little":
+                new.byteswap()
+            self._buffer += new.tobytes()
+            self._logged = len(ops)
+
+    @property
+    def pending(self):
+        """缓冲区中尚未写入的字节数"""
+        return len(self._buffer)
+
+    def flush(self, fsync=True):
+        """把缓冲区写入文件并（默认）fsync；日志过长时改为压缩"""
+        self.sync()
+        if not self._buffer:
+            return
+        if self._ops_in_file + len(self._buffer) // 4 > COMPACT_OPS:
+            self.compact()
+            return
+        self._file.write(self._buffer)
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+        self._ops_in_file += len(self._buffer) // 4
+        self._buffer = bytearray()
+
+    def compact(self):
+        """把当前状态写成新的快照文件（先写临时文件再原子替换）"""
+        self.sync()
+        engine = self.engine
+        snapshot = engine.snapshot()
+        current = -1 if engine.current_index is None else engine.current_index
+        header = HEADER.pack(MAGIC, len(engine), self.fingerprint, current, len(snapshot))
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(header + snapshot)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'ab')
+        self._ops_in_file = 0
+        self._buffer = bytearray()
+
+    def close(self):
+        """写入剩余操作并关闭文件"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def discard(self):
+        """关闭并删除日志文件（卡组被修改或删除后调用）
+
+        日志文件不存在时什么也不做；其他删除失败抛出 OSError。
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._buffer = bytearray()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,131 @@
+"""卡组文件的流式载入（不依赖 tkinter）
+
+文件按固定大小的块（在换行处切开）通过 mmap 读取，每块解析成一个 CardDeck。
+DeckFileLoader 在后台线程中解析，主线程用 poll() 分批取回已解析的块，
+因此载入很大的卡组文件时窗口不会卡住，并且可以随时取消。
+"""
+import mmap
+import os
+import queue
+import threading
+
+from card_engine import SYMBOLS, CardDeck
+
+# 每块读取的字节数
+BLOCK_SIZE = 1 << 20
+
+# 块队列结束标记
+_DONE = object()
+
+
+def iter_deck_chunks(path, block_size=BLOCK_SIZE, table=None):
+    """逐块读取卡组文件，产生 (该块的 CardDeck, 已读取的字节数)
+
+    每行一张牌，去掉首尾空白，跳过空行；文件按 UTF-8 解码。
+    """
+    table = table if table is not None else SYMBOLS
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < size:
+                end = start + block_size
+                if end >= size:
+                    end = size
+                else:
+                    # 在块内最后一个换行处切开；整块没有换行时延伸到下一个换行
+                    cut = data.rfind(b'\n', start, end)
+                    if cut < 0:
+                        cut = data.find(b'\n', end)
+                    end = size if cut < 0 else cut + 1
+                text = data[start:end].decode('utf-8')
+                names = [name for name in map(str.strip, text.split('\n')) if name]
+                yield CardDeck.from_ids(table.intern_many(names), table), end
+                start = end
+
+
+def read_deck_file(path, block_size=BLOCK_SIZE, progress=None):
+    """同步读取整个卡组文件，返回 CardDeck；progress(已读字节, 总字节) 每块调用一次"""
+    total = os.path.getsize(path)
+    cards = CardDeck()
+    for chunk, done in iter_deck_chunks(path, block_size, cards.table):
+        cards.extend(chunk)
+        if progress is not None:
+            progress(done, total)
+    return cards
+
+
+class DeckFileLoader:
+    """在后台线程中流式解析卡组文件
+
+    start() 立即返回；主线程定时调用 poll() 取回已解析的块并合并到 cards，
+    progress 为已读取的比例。cancel() 让后台线程在当前块结束后停止。
+    载入出错时 error 保存异常，done 同样变为 True。
+    """
+
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.cards = CardDeck()
+        self.error = None
+        self.done = False
+        self.cancelled = False
+        self._queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动后台解析线程"""
+        self._thread = threading.Thread(target=self._run, name="deck-loader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for chunk, done in iter_deck_chunks(self.path, self.block_size, self.cards.table):
+                if self._cancel.is_set():
+                    break
+                self._queue.put((chunk, done))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._queue.put(_DONE)
+
+    @property
+    def progress(self):
+        """已读取的比例（0~1）"""
+        if not self.total_bytes:
+            return 1.0
+        return self.bytes_read / self.total_bytes
+
+    def poll(self, max_chunks=None):
+        """合并已解析好的块（不等待），返回本次合并的块数"""
+        merged = 0
+        while not self.done and (max_chunks is None or merged < max_chunks):
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self.done = True
+                break
+            chunk, self.bytes_read = item
+            self.cards.extend(chunk)
+            merged += 1
+        return merged
+
+    def cancel(self):
+        """取消载入；已合并的牌保留在 cards 中"""
+        self.cancelled = True
+        self._cancel.set()
+
+    def wait(self):
+        """阻塞直到载入结束（供脚本使用），返回 cards"""
+        if self._thread is not None:
+            self._thread.join()
+        self.poll()
+        return self.cards
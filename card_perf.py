@@ -0,0 +1,376 @@
+"""启动耗时和事件处理耗时统计（不依赖 tkinter）
+
+StartupProfile 按阶段记录从进程开始导入主程序到第一次画出卡牌网格的耗时。
+用 --profile-startup 启动主程序时打开统计：输出到标准错误，或写成 JSON 文件
+（打包成无控制台的可执行文件时使用）。card_bench.py startup 据此检查启动预算。
+
+HandlerProfiler 统计界面事件处理函数的调用次数、耗时分布以及期间创建和销毁的控件数。
+用 @instrumented 装饰的方法在统计关闭时只多一次标志判断，几乎没有额外开销。
+
+StallWatchdog 用定时心跳测量事件循环的延迟：心跳比预定时间晚到的部分就是事件循环
+被阻塞的时间，超过阈值时记为一次卡顿，连同当时运行的回调函数一起写入日志。
+"""
+import bisect
+import functools
+import json
+import sys
+import time
+from collections import deque
+
+# 启动预算（毫秒）：窗口第一次画出、卡牌网格第一次画出
+STARTUP_BUDGET_MS = {
+    "first_frame": 600,
+    "first_grid": 900,
+}
+
+
+class StartupProfile:
+    """按顺序记录启动各阶段的耗时
+
+    mark(阶段名) 记录从上一个阶段结束（或 start）到现在的时间；
+    elapsed_ms(阶段名) 给出从 start 到该阶段结束的累计时间。
+    """
+
+    def __init__(self, start=None, output=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.output = output  # None 表示输出到标准错误，否则为 JSON 文件路径
+        self.phases = []  # [(阶段名, 本阶段毫秒数, 累计毫秒数)]
+        self._last = self.start
+        self.finished = False
+
+    def mark(self, phase):
+        """记录一个阶段结束"""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000, (now - self.start) * 1000))
+        self._last = now
+
+    def elapsed_ms(self, phase):
+        """从 start 到该阶段结束的毫秒数；没有记录该阶段时为 None"""
+        for name, _, total in self.phases:
+            if name == phase:
+                return total
+        return None
+
+    @property
+    def total_ms(self):
+        return self.phases[-1][2] if self.phases else 0.0
+
+    def to_dict(self):
+        return {
+            "phases": [{"name": name, "ms": ms, "elapsed_ms": total}
+                       for name, ms, total in self.phases],
+            "total_ms": self.total_ms,
+        }
+
+    def report(self):
+        """以表格形式返回各阶段耗时"""
+        lines = [f"{name:<16}{ms:>9.1f} ms{total:>10.1f} ms" for name, ms, total in self.phases]
+        return "\n".join(["启动阶段          本阶段       累计"] + lines)
+
+    def finish(self):
+        """启动完成：输出报告（只输出一次）"""
+        if self.finished:
+            return
+        self.finished = True
+        if self.output is None:
+            print(self.report(), file=sys.stderr)
+        else:
+            with open(self.output, 'w', encoding='utf-8') as file:
+                json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+
+
+# 耗时分布的桶上界（毫秒），最后一个桶收集更慢的调用
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class HandlerStats:
+    """一个事件处理函数的统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0  # 秒
+        self.max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.widgets_created = 0
+        self.widgets_destroyed = 0
+
+    def add(self, seconds, created=0, destroyed=0):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.widgets_created += created
+        self.widgets_destroyed += destroyed
+
+    def percentile_ms(self, fraction):
+        """按耗时分布估算分位数（返回所在桶的上界，最慢的桶返回最大值）"""
+        if not self.calls:
+            return 0.0
+        rank = fraction * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank and count:
+                if bucket < len(LATENCY_BUCKETS_MS):
+                    return min(LATENCY_BUCKETS_MS[bucket], self.max * 1000)
+                break
+        return self.max * 1000
+
+    def to_dict(self):
+        labels = [f"<={edge}ms" for edge in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "calls": self.calls,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.calls if self.calls else 0.0,
+            "p50_ms": self.percentile_ms(0.5),
+            "p99_ms": self.percentile_ms(0.99),
+            "max_ms": self.max * 1000,
+            "histogram": dict(zip(labels, self.histogram)),
+            "widgets_created": self.widgets_created,
+            "widgets_destroyed": self.widgets_destroyed,
+        }
+
+
+class HandlerProfiler:
+    """事件处理函数的耗时统计（默认关闭）
+
+    widget_class 为界面控件的基类（tkinter.BaseWidget）：打开统计时临时包装它的
+    __init__ 和 destroy 来计数，关闭时恢复，因此关闭统计后控件创建没有任何额外开销。
+    处理函数嵌套调用时，外层的耗时和控件数包括内层。
+    """
+
+    def __init__(self, widget_class=None):
+        self.enabled = False
+        self.stats = {}
+        self.widget_class = widget_class
+        self.widgets_created = 0
+        self.widgets_destroyed = 0
+        self._originals = None
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        if self.widget_class is not None:
+            cls = self.widget_class
+            init, destroy = cls.__init__, cls.destroy
+            self._originals = (init, destroy)
+            profiler = self
+
+            @functools.wraps(init)
+            def counting_init(widget, *args, **kwargs):
+                profiler.widgets_created += 1
+                return init(widget, *args, **kwargs)
+
+            @functools.wraps(destroy)
+            def counting_destroy(widget, *args, **kwargs):
+                profiler.widgets_destroyed += 1
+                return destroy(widget, *args, **kwargs)
+
+            cls.__init__, cls.destroy = counting_init, counting_destroy
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._originals is not None:
+            self.widget_class.__init__, self.widget_class.destroy = self._originals
+            self._originals = None
+
+    def reset(self):
+        """清空已有的统计"""
+        self.stats = {}
+
+    def call(self, name, function, *args, **kwargs):
+        """调用 function 并把耗时和期间创建、销毁的控件数记到 name 下"""
+        created, destroyed = self.widgets_created, self.widgets_destroyed
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = HandlerStats()
+            stats.add(elapsed, self.widgets_created - created, self.widgets_destroyed - destroyed)
+
+    def to_dict(self):
+        return {
+            "bucket_edges_ms": list(LATENCY_BUCKETS_MS),
+            "handlers": {name: stats.to_dict() for name, stats in self.stats.items()},
+        }
+
+    def report(self):
+        """按总耗时从高到低排列的文字报告"""
+        lines = [f"{'处理函数':<26}{'次数':>6}{'平均':>8}{'p99':>8}{'最大':>8}  控件+/-"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].total):
+            data = stats.to_dict()
+            lines.append(f"{name:<30}{data['calls']:>6}{data['mean_ms']:>8.2f}"
+                         f"{data['p99_ms']:>8.2f}{data['max_ms']:>8.2f}  "
+                         f"+{data['widgets_created']}/-{data['widgets_destroyed']}")
+        return "\n".join(lines)
+
+
+def instrumented(method):
+    """装饰界面对象的事件处理方法：self.handler_profiler 打开时记录耗时，关闭时直接调用"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.handler_profiler.enabled:
+            return method(self, *args, **kwargs)
+        return self.handler_profiler.call(name, method, self, *args, **kwargs)
+    return wrapper
+
+
+# 卡顿记录在内存中保留的条数
+STALL_HISTORY = 50
+
+
+def callback_name(func):
+    """Tk 回调函数的名称；after() 注册的是内部的 callit 函数，真正的回调在它的闭包里"""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and func.__closure__:
+        cells = dict(zip(code.co_freevars, func.__closure__))
+        if "func" in cells:
+            func = cells["func"].cell_contents
+    return getattr(func, "__qualname__", None) or repr(func)
+
+
+class StallWatchdog:
+    """事件循环卡顿检测
+
+    界面每隔 interval_ms 用 after 调用一次 beat()，心跳的延迟即事件循环被阻塞的时间；
+    最近 window 次心跳的延迟用于计算 p50/p99。
+    callback_class 为 Tk 的回调包装类（tkinter.CallWrapper）：start() 时包装它的 __call__，
+    记录正在运行和两次心跳之间最慢的回调，卡顿时据此指出是哪个处理函数；stop() 时恢复。
+    log_path 不为 None 时每次卡顿追加一行到该文件。
+    """
+
+    def __init__(self, interval_ms=100, threshold_ms=250, window=600,
+                 log_path=None, callback_class=None):
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.callback_class = callback_class
+        self.lags = deque(maxlen=window)  # 毫秒
+        self.stalls = deque(maxlen=STALL_HISTORY)  # [(时间, 延迟毫秒, 处理函数)]
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self.running = []  # 正在运行的回调（有嵌套的事件循环时不止一个）
+        self.slowest = None  # 两次心跳之间运行最久的回调 (名称, 秒数)
+        self._expected = None
+        self._original = None
+
+    @property
+    def active(self):
+        return self._expected is not None
+
+    def start(self, now=None):
+        """开始计时（之后每隔 interval_ms 调用 beat()）"""
+        if self.active:
+            return
+        self._expected = (now if now is not None else time.perf_counter()) + self.interval_ms / 1000
+        if self.callback_class is not None:
+            cls = self.callback_class
+            original = self._original = cls.__call__
+            watchdog = self
+
+            @functools.wraps(original)
+            def tracking_call(wrapper, *args):
+                name = callback_name(wrapper.func)
+                watchdog.running.append(name)
+                start = time.perf_counter()
+                try:
+                    return original(wrapper, *args)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    watchdog.running.pop()
+                    if watchdog.slowest is None or elapsed > watchdog.slowest[1]:
+                        watchdog.slowest = (name, elapsed)
+
+            cls.__call__ = tracking_call
+
+    def stop(self):
+        if not self.active:
+            return
+        self._expected = None
+        if self._original is not None:
+            self.callback_class.__call__ = self._original
+            self._original = None
+        self.running = []
+        self.slowest = None
+
+    def reset(self):
+        """清空延迟和卡顿统计"""
+        self.lags.clear()
+        self.stalls.clear()
+        self.stall_count = 0
+        self.max_lag = 0.0
+
+    def culprit(self, lag_ms):
+        """卡顿期间运行的处理函数：两次心跳之间足够慢的回调，否则为仍在运行的外层回调"""
+        slowest = self.slowest
+        if slowest is not None and slowest[1] * 1000 >= min(lag_ms, self.threshold_ms) / 2:
+            return slowest[0]
+        # 心跳本身也在 running 的最后一项中（包装了回调时）
+        outer = self.running[:-1] if self._original is not None else self.running
+        if outer:
+            return outer[0]
+        return slowest[0] if slowest is not None else "未知"
+
+    def beat(self, now=None):
+        """心跳：记录这次心跳的延迟（毫秒）并返回；超过阈值时记为卡顿"""
+        if not self.active:
+            return 0.0
+        now = now if now is not None else time.perf_counter()
+        lag = max(0.0, (now - self._expected) * 1000)
+        self.lags.append(lag)
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag > self.threshold_ms:
+            self.record_stall(lag, self.culprit(lag))
+        self.slowest = None
+        self._expected = now + self.interval_ms / 1000
+        return lag
+
+    def record_stall(self, lag_ms, handler):
+        self.stall_count += 1
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.stalls.append((stamp, lag_ms, handler))
+        if self.log_path is not None:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as file:
+                    file.write(f"{stamp}\t{lag_ms:.0f} ms\t{handler}\n")
+            except OSError:
+                # 日志写不进去不影响界面
+                pass
+
+    def percentile_ms(self, fraction):
+        """最近若干次心跳延迟的分位数"""
+        if not self.lags:
+            return 0.0
+        lags = sorted(self.lags)
+        return lags[min(len(lags) - 1, int(fraction * len(lags)))]
+
+    def to_dict(self):
+        return {
+            "interval_ms": self.interval_ms,
+            "threshold_ms": self.threshold_ms,
+            "beats": len(self.lags),
+            "p50_ms": self.percentile_ms(0.5),
+            "p99_ms": self.percentile_ms(0.99),
+            "max_ms": self.max_lag,
+            "stalls": self.stall_count,
+            "recent_stalls": [{"time": stamp, "lag_ms": lag, "handler": handler}
+                              for stamp, lag, handler in self.stalls],
+        }
+
+    def report(self, recent=5):
+        """延迟概况和最近几次卡顿"""
+        lines = [f"事件循环延迟  p50 {self.percentile_ms(0.5):.1f}  p99 {self.percentile_ms(0.99):.1f}"
+                 f"  最大 {self.max_lag:.1f}  卡顿 {self.stall_count} 次（>{self.threshold_ms} ms）"]
+        for stamp, lag, handler in list(self.stalls)[-recent:]:
+            lines.append(f"  {stamp[11:]}{lag:>8.0f} ms  {handler}")
+        return "\n".join(lines)
@@ -0,0 +1,339 @@
+"""蒙特卡洛发牌模拟（不依赖 tkinter）
+
+把卡组编码成整数后按批量发牌，统计炸弹、王炸以及某种牌在一手牌中出现张数的频率。
+安装了 NumPy 时整批发牌向量化完成，否则退回纯 Python 实现。
+大规模模拟可以用 ParallelSimulationRunner 分片到多个进程并行运行。
+"""
+import hashlib
+import os
+import random
+import secrets
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from card_engine import HAS_NUMPY, JOKERS, CardDeck, numpy_module, rank_of
+
+# NumPy 为可选依赖，第一次使用向量化模拟时才导入（见 _numpy）
+np = None
+
+def _numpy():
+    """导入 NumPy 并设为本模块的 np；未安装时返回 None"""
+    global np
+    np = numpy_module()
+    return np
+
+
+# 事件名称
+EVENT_BOMB = "炸弹"
+EVENT_ROCKET = "王炸"
+
+
+def encode_ranks(cards):
+    """把卡组编码成点数编号，返回 (点数名称列表, 每张牌的点数编号列表)
+
+    CardDeck 按卡牌编号查驻留表中预先算好的点数，每种牌只处理一次。
+    """
+    ranks = []
+    rank_ids = {}
+    if isinstance(cards, CardDeck):
+        symbol_ranks = cards.table.ranks
+        keys = cards.ids
+    else:
+        symbol_ranks = None
+        keys = cards
+    by_key = {}
+    encoded = []
+    for key in keys:
+        rank_id = by_key.get(key)
+        if rank_id is None:
+            rank = symbol_ranks[key] if symbol_ranks is not None else rank_of(key)
+            rank_id = rank_ids.get(rank)
+            if rank_id is None:
+                rank_id = rank_ids[rank] = len(ranks)
+                ranks.append(rank)
+            by_key[key] = rank_id
+        encoded.append(rank_id)
+    return ranks, encoded
+
+
+class SimulationResult:
+    """模拟结果：事件次数、关注点数的张数分布和吞吐量"""
+
+    def __init__(self, hand_size, target=None, events=(EVENT_BOMB, EVENT_ROCKET)):
+        self.hand_size = hand_size
+        self.target = target
+        self.deals = 0
+        self.elapsed = 0.0
+        self.events = dict.fromkeys(events, 0)
+        # 关注点数在一手牌中出现的张数 -> 出现的手数
+        self.target_counts = {}
+
+    def merge(self, other):
+        """合并另一份结果（同一手牌大小和关注点数）"""
+        self.deals += other.deals
+        self.elapsed += other.elapsed
+        for name, count in other.events.items():
+            self.events[name] = self.events.get(name, 0) + count
+        for copies, count in other.target_counts.items():
+            self.target_counts[copies] = self.target_counts.get(copies, 0) + count
+        return self
+
+    @property
+    def deals_per_second(self):
+        """每秒发牌手数"""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.deals / self.elapsed
+
+    def probability(self, event):
+        """某个事件的频率"""
+        if not self.deals:
+            return 0.0
+        return self.events.get(event, 0) / self.deals
+
+    def table(self):
+        """频率表：[(项目, 次数, 频率), ...]"""
+        rows = [(name, count, self.probability(name))
+                for name, count in self.events.items()]
+        if self.target is not None:
+            for copies in sorted(self.target_counts):
+                count = self.target_counts[copies]
+                rows.append((f"{self.target} × {copies}张", count,
+                             count / self.deals if self.deals else 0.0))
+        return rows
+
+    def format(self):
+        """格式化为多行文本"""
+        lines = [f"手牌: {self.hand_size}张  模拟: {self.deals}手  "
+                 f"速度: {self.deals_per_second:,.0f} 手/秒"]
+        for name, count, freq in self.table():
+            lines.append(f"{name:<12}{count:>12}  {freq:>9.4%}")
+        return "\n".join(lines)
+
+
+class MonteCarloSimulator:
+    """对当前卡组按批量发牌并累计统计"""
+
+    def __init__(self, cards, hand_size, target=None, seed=None, use_numpy=None):
+        if not 0 < hand_size <= len(cards):
+            raise ValueError("手牌数量必须在 1 到卡组牌数之间")
+        self.hand_size = hand_size
+        self.target = target
+        self.ranks, encoded = encode_ranks(cards)
+        self.deck_size = len(cards)
+        self.use_numpy = HAS_NUMPY if use_numpy is None else use_numpy
+        if self.use_numpy and _numpy() is None:
+            raise RuntimeError("未安装 NumPy，无法使用向量化模拟")
+
+        # 炸弹：除大小王外任一点数4张；王炸：大小王各1张
+        self.bomb_ranks = [i for i, rank in enumerate(self.ranks) if rank not in JOKERS]
+        self.rocket_ranks = [self.ranks.index(joker) for joker in JOKERS
+                             if joker in self.ranks]
+        if len(self.rocket_ranks) != len(JOKERS):
+            self.rocket_ranks = None
+        self.target_rank = self.ranks.index(target) if target in self.ranks else None
+        self.event_names = [EVENT_BOMB]
+        if self.rocket_ranks is not None:
+            self.event_names.append(EVENT_ROCKET)
+
+        if self.use_numpy:
+            self.rng = np.random.default_rng(seed)
+            self.encoded = np.asarray(encoded, dtype=np.int32)
+            self.bomb_ranks = np.asarray(self.bomb_ranks, dtype=np.intp)
+        else:
+            self.rng = random.Random(seed)
+            self.encoded = encoded
+        self.result = self.new_result()
+
+    def new_result(self):
+        """创建一份与本模拟器配置一致的空结果"""
+        target = self.target if self.target_rank is not None else None
+        return SimulationResult(self.hand_size, target, self.event_names)
+
+    def batch_limit(self, batch_size):
+        """限制单批大小，使随机数矩阵不超过约 200 万个元素"""
+        return max(1, min(batch_size, 2_000_000 // self.deck_size))
+
+    def run_batch(self, batch_size):
+        """模拟一批发牌，累加到 self.result 并返回本批结果"""
+        batch_size = self.batch_limit(batch_size)
+        start = time.perf_counter()
+        if self.use_numpy:
+            batch = self._run_batch_numpy(batch_size)
+        else:
+            batch = self._run_batch_python(batch_size)
+        batch.elapsed = time.perf_counter() - start
+        self.result.merge(batch)
+        return batch
+
+    def run(self, deals, batch_size=20000):
+        """连续模拟 deals 手，返回累计结果"""
+        remaining = deals
+        while remaining > 0:
+            batch = self.run_batch(min(batch_size, remaining))
+            remaining -= batch.deals
+        return self.result
+
+    def _run_batch_numpy(self, batch_size):
+        """向量化发牌：每行取随机键最小的 hand_size 张，再按点数计数"""
+        n, h, k = self.deck_size, self.hand_size, len(self.ranks)
+        keys = self.rng.random((batch_size, n), dtype=np.float32)
+        if h < n:
+            hands = np.argpartition(keys, h - 1, axis=1)[:, :h]
+        else:
+            hands = np.broadcast_to(np.arange(n), (batch_size, n))
+        ranks = self.encoded[hands]
+        offsets = (np.arange(batch_size, dtype=np.int64) * k)[:, None]
+        counts = np.bincount((ranks + offsets).ravel(),
+                             minlength=batch_size * k).reshape(batch_size, k)
+
+        batch = self.new_result()
+        batch.deals = batch_size
+        if len(self.bomb_ranks):
+            batch.events[EVENT_BOMB] = int((counts[:, self.bomb_ranks] >= 4).any(axis=1).sum())
+        if self.rocket_ranks is not None:
+            batch.events[EVENT_ROCKET] = int((counts[:, self.rocket_ranks] >= 1).all(axis=1).sum())
+        if self.target_rank is not None:
+            histogram = np.bincount(counts[:, self.target_rank])
+            batch.target_counts = {copies: int(count)
+                                   for copies, count in enumerate(histogram) if count}
+        return batch
+
+    def _run_batch_python(self, batch_size):
+        """纯 Python 发牌：逐手 random.sample"""
+        h, k = self.hand_size, len(self.ranks)
+        encoded, sample = self.encoded, self.rng.sample
+        population = range(self.deck_size)
+        bomb_ranks, rocket_ranks, target_rank = self.bomb_ranks, self.rocket_ranks, self.target_rank
+        bombs = rockets = 0
+        target_counts = {}
+        for _ in range(batch_size):
+            counts = [0] * k
+            for index in sample(population, h):
+                counts[encoded[index]] += 1
+            if any(counts[r] >= 4 for r in bomb_ranks):
+                bombs += 1
+            if rocket_ranks is not None and all(counts[r] for r in rocket_ranks):
+                rockets += 1
+            if target_rank is not None:
+                copies = counts[target_rank]
+                target_counts[copies] = target_counts.get(copies, 0) + 1
+
+        batch = self.new_result()
+        batch.deals = batch_size
+        batch.events[EVENT_BOMB] = bombs
+        if rocket_ranks is not None:
+            batch.events[EVENT_ROCKET] = rockets
+        batch.target_counts = target_counts
+        return batch
+
+
+def chunk_seed(master_seed, chunk_index, use_numpy):
+    """由主种子和分片序号派生该分片独立、可复现的随机种子"""
+    if use_numpy:
+        return _numpy().random.SeedSequence(master_seed, spawn_key=(chunk_index,))
+    digest = hashlib.sha256(f"{master_seed}:{chunk_index}".encode("ascii")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def run_chunk(cards, hand_size, target, master_seed, chunk_index, deals, use_numpy):
+    """在工作进程中运行一个分片，返回该分片的结果"""
+    seed = chunk_seed(master_seed, chunk_index, use_numpy)
+    simulator = MonteCarloSimulator(cards, hand_size, target, seed=seed, use_numpy=use_numpy)
+    return simulator.run(deals)
+
+
+class ParallelSimulationRunner:
+    """把模拟切成固定大小的分片，交给进程池并行运行
+
+    每个分片的随机种子只由主种子和分片序号决定，结果按分片累加，
+    因此同一主种子下结果与进程数量无关。poll() 不会阻塞，适合在
+    Tk 的 after 回调中调用以刷新进度；cancel() 取消尚未开始的分片。
+    """
+
+    def __init__(self, cards, hand_size, target=None, seed=None, workers=None,
+                 chunk_deals=50000, use_numpy=None):
+        # 先在主进程中校验参数，并确定统一的事件和关注点数
+        self.template = MonteCarloSimulator(cards, hand_size, target, use_numpy=use_numpy)
+        self.cards = list(cards)
+        self.hand_size = hand_size
+        self.target = target
+        self.use_numpy = self.template.use_numpy
+        self.seed = secrets.randbits(63) if seed is None else seed
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_deals = max(1, chunk_deals)
+        self.result = self.template.new_result()
+        self.total_deals = 0
+        self.cancelled = False
+        self._executor = None
+        self._futures = set()
+        self._started_at = None
+
+    def start(self, deals):
+        """提交所有分片并立即返回"""
+        self.total_deals = deals
+        self.result = self.template.new_result()
+        self._started_at = time.perf_counter()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        chunk_index = 0
+        for offset in range(0, deals, self.chunk_deals):
+            self._futures.add(self._executor.submit(
+                run_chunk, self.cards, self.hand_size, self.target, self.seed,
+                chunk_index, min(self.chunk_deals, deals - offset), self.use_numpy))
+            chunk_index += 1
+        return self
+
+    @property
+    def done(self):
+        """所有分片都已完成或已取消"""
+        return not self._futures
+
+    @property
+    def progress(self):
+        """已完成的比例（0~1）"""
+        if not self.total_deals:
+            return 1.0
+        return self.result.deals / self.total_deals
+
+    def poll(self, timeout=0):
+        """合并已经完成的分片（默认不等待），返回本次合并的分片数"""
+        if not self._futures:
+            return 0
+        finished, self._futures = wait(self._futures, timeout=timeout,
+                                       return_when=FIRST_COMPLETED)
+        self._futures = set(self._futures)
+        merged = 0
+        for future in finished:
+            if future.cancelled():
+                continue
+            self.result.merge(future.result())
+            merged += 1
+        # 吞吐量按实际经过的时间计算（而不是各进程耗时之和）
+        self.result.elapsed = time.perf_counter() - self._started_at
+        if not self._futures:
+            self._shutdown()
+        return merged
+
+    def run(self, deals, progress=None):
+        """阻塞运行全部分片（供脚本使用），每合并一个分片调用一次 progress(runner)"""
+        self.start(deals)
+        while not self.done:
+            if self.poll(timeout=None) and progress is not None:
+                progress(self)
+        return self.result
+
+    def cancel(self, wait=False):
+        """取消尚未开始的分片；已合并的结果保留
+
+        wait=True 时等待正在运行的分片结束、工作进程全部退出（程序关闭时使用）。
+        """
+        self.cancelled = True
+        for future in self._futures:
+            future.cancel()
+        self._futures = set()
+        self._shutdown(wait)
+
+    def _shutdown(self, wait=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
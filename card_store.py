@@ -0,0 +1,163 @@
+"""卡组库：把所有卡组保存在本地 SQLite 数据库中（不依赖 tkinter）
+
+启动时只读取卡组索引（名称、牌数等），某个卡组的卡牌在第一次用到时才读取。
+每个卡组的卡牌存成"本组用到的不同名称 + 每张牌的序号数组"，
+读取时按名称批量驻留后直接得到 CardDeck，不逐张解析字符串。
+"""
+import contextlib
+import os
+import sqlite3
+from array import array
+
+from card_engine import SYMBOLS, CardDeck
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    is_default INTEGER NOT NULL DEFAULT 0,
+    is_editable INTEGER NOT NULL DEFAULT 1,
+    card_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS group_cards (
+    group_id INTEGER PRIMARY KEY REFERENCES groups(id) ON DELETE CASCADE,
+    names TEXT NOT NULL,
+    typecode TEXT NOT NULL,
+    cards BLOB NOT NULL
+);
+"""
+
+
+def default_store_path():
+    """卡组库文件的默认位置（可用环境变量 CARD_DRAW_HOME 指定目录）"""
+    home = os.environ.get("CARD_DRAW_HOME") or os.path.join(os.path.expanduser("~"), ".card_draw")
+    return os.path.join(home, "decks.sqlite3")
+
+
+def encode_cards(cards):
+    """把卡组编码为 (名称文本, 数组类型, 序号字节)"""
+    deck = cards if isinstance(cards, CardDeck) else CardDeck(cards)
+    symbol_names = deck.table.names
+    local = {}
+    names = []
+    for symbol in deck.ids:
+        if symbol not in local:
+            local[symbol] = len(names)
+            names.append(symbol_names[symbol])
+    typecode = 'H' if len(names) <= 0xFFFF else 'I'
+    positions = array(typecode, map(local.__getitem__, deck.ids))
+    return "\n".join(names), typecode, positions.tobytes()
+
+
+def decode_cards(names_text, typecode, data, table=None):
+    """由 encode_cards 的结果还原 CardDeck"""
+    table = table if table is not None else SYMBOLS
+    symbols = table.intern_many(names_text.split("\n") if names_text else [])
+    positions = array(typecode)
+    positions.frombytes(data)
+    return CardDeck.from_ids(map(symbols.__getitem__, positions), table)
+
+
+class DeckStore:
+    """本地卡组库
+
+    卡组仍是界面中使用的字典，另外带有 store_id；卡牌尚未读取时 cards 为 None。
+    transaction() 把一次操作中的所有写入合并为一个事务提交。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 自动提交模式，事务由 transaction() 显式控制
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self._depth = 0
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """with 块中的所有写入在同一个事务中提交（可以嵌套，只有最外层提交）"""
+        if self._depth == 0:
+            self.conn.execute("BEGIN")
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute("COMMIT")
+
+    def list_groups(self):
+        """读取卡组索引（不读取卡牌），按下拉菜单中的顺序返回"""
+        rows = self.conn.execute(
+            "SELECT id, name, is_default, is_editable, card_count FROM groups "
+            "ORDER BY position, id"
+        )
+        return [{
+            "name": name,
+            "cards": None,  # 第一次选中时由 load_cards 读取
+            "is_default": bool(is_default),
+            "is_editable": bool(is_editable),
+            "store_id": store_id,
+            "card_count": card_count,
+        } for store_id, name, is_default, is_editable, card_count in rows]
+
+    def load_cards(self, store_id):
+        """读取某个卡组的卡牌"""
+        row = self.conn.execute(
+            "SELECT names, typecode, cards FROM group_cards WHERE group_id = ?",
+            (store_id,)
+        ).fetchone()
+        if row is None:
+            return CardDeck()
+        return decode_cards(*row)
+
+    def save_group(self, group):
+        """保存卡组（新卡组追加到末尾并写回 store_id）；卡牌已读取时一并保存"""
+        cards = group.get("cards")
+        count = len(cards) if cards is not None else group.get("card_count", 0)
+        with self.transaction():
+            if group.get("store_id") is None:
+                position = self.conn.execute(
+                    "SELECT COALESCE(MAX(position), -1) + 1 FROM groups").fetchone()[0]
+                cursor = self.conn.execute(
+                    "INSERT INTO groups (position, name, is_default, is_editable, card_count) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (position, group["name"], int(group.get("is_default", False)),
+                     int(group.get("is_editable", True)), count)
+                )
+                group["store_id"] = cursor.lastrowid
+            else:
+                self.conn.execute(
+                    "UPDATE groups SET name = ?, is_default = ?, is_editable = ?, card_count = ? "
+                    "WHERE id = ?",
+                    (group["name"], int(group.get("is_default", False)),
+                     int(group.get("is_editable", True)), count, group["store_id"])
+                )
+            if cards is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO group_cards (group_id, names, typecode, cards) "
+                    "VALUES (?, ?, ?, ?)",
+                    (group["store_id"], *encode_cards(cards))
+                )
+            group["card_count"] = count
+
+    def delete_group(self, group):
+        """删除卡组及其卡牌"""
+        if group.get("store_id") is None:
+            return
+        with self.transaction():
+            self.conn.execute("DELETE FROM groups WHERE id = ?", (group["store_id"],))
+        group["store_id"] = None
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,151 @@
+"""卡牌显示样式表（不依赖 tkinter）
+
+按可配置的规则为每种牌计算一次文字颜色（按驻留表编号缓存），
+各状态（正常、已抽取、选中）的背景、边框等组合也预先生成，
+重绘时只需查表，不再逐张判断花色。
+"""
+import json
+import re
+
+from card_engine import MAHJONG_FLOWERS, MAHJONG_SUITS, SYMBOLS, CardDeck
+
+# 没有规则匹配时的文字颜色
+DEFAULT_COLOR = "black"
+
+# 样式规则：按顺序匹配，第一条匹配的规则决定文字颜色
+# match 可以是 name（名称相同）、prefix（开头）、suffix（结尾）、regex（正则搜索）
+DEFAULT_STYLE_RULES = [
+    # 扑克牌：大王和红桃、方块为红色
+    {"match": "name", "value": "大王", "color": "red"},
+    {"match": "name", "value": "小王", "color": "black"},
+    {"match": "suffix", "value": "♥", "color": "red"},
+    {"match": "suffix", "value": "♦", "color": "red"},
+    # 麻将：万子红、条子绿、筒子蓝，中发白同色，花牌紫色
+    *[{"match": "suffix", "value": suit, "color": color}
+      for suit, color in zip(MAHJONG_SUITS, ("#C62828", "#2E7D32", "#1565C0"))],
+    {"match": "name", "value": "中", "color": "#C62828"},
+    {"match": "name", "value": "发", "color": "#2E7D32"},
+    {"match": "name", "value": "白", "color": "#1565C0"},
+    {"match": "regex", "value": f"^[{''.join(MAHJONG_FLOWERS)}]$", "color": "#6A1B9A"},
+]
+
+# 各状态的样式（fg 为 None 时使用该牌自己的文字颜色）
+STATE_STYLES = {
+    "normal": {"bg": "white", "fg": None, "outline": "#999999", "relief": "raised"},
+    "drawn": {"bg": "#E0E0E0", "fg": "#A0A0A0", "outline": "#808080", "relief": "sunken"},
+    "selected": {"bg": "#FFD700", "fg": None, "outline": "#B8860B", "relief": "raised"},
+}
+
+# 普通模式和编辑模式下卡牌的字体
+FONTS = {
+    "normal": ("Microsoft YaHei", 12, "bold"),
+    "edit": ("Microsoft YaHei", 10, "bold"),
+}
+
+MATCHERS = ("name", "prefix", "suffix", "regex")
+
+
+def load_style_rules(path):
+    """从 JSON 文件读取样式规则（格式同 DEFAULT_STYLE_RULES）"""
+    with open(path, 'r', encoding='utf-8') as file:
+        rules = json.load(file)
+    if not isinstance(rules, list):
+        raise ValueError("样式规则必须是列表")
+    for rule in rules:
+        if not isinstance(rule, dict) or rule.get("match") not in MATCHERS \
+                or not isinstance(rule.get("value"), str) or not isinstance(rule.get("color"), str):
+            raise ValueError(f"无效的样式规则: {rule!r}")
+        if rule["match"] == "regex":
+            try:
+                re.compile(rule["value"])
+            except re.error as e:
+                raise ValueError(f"样式规则中的正则表达式无效: {rule['value']!r} ({e})") from e
+    return rules
+
+
+class StyleTable:
+    """卡牌样式表：每种牌的文字颜色只按规则计算一次，之后按编号查表"""
+
+    def __init__(self, rules=None, table=None, default_color=DEFAULT_COLOR):
+        self.rules = list(DEFAULT_STYLE_RULES if rules is None else rules)
+        self.table = table if table is not None else SYMBOLS
+        self.default_color = default_color
+        self._matchers = [self._compile(rule) for rule in self.rules]
+        self._colors = []  # 驻留表编号 -> 文字颜色（None 表示尚未计算）
+        self._button_styles = {}
+        self._cell_styles = {}
+
+    @staticmethod
+    def _compile(rule):
+        value, color = rule["value"], rule["color"]
+        match = rule["match"]
+        if match == "name":
+            return lambda name: name == value, color
+        if match == "prefix":
+            return lambda name: name.startswith(value), color
+        if match == "suffix":
+            return lambda name: name.endswith(value), color
+        if match == "regex":
+            return re.compile(value).search, color
+        raise ValueError(f"未知的匹配方式: {match}")
+
+    def classify(self, name):
+        """按规则计算一张牌的文字颜色（不查缓存）"""
+        for matches, color in self._matchers:
+            if matches(name):
+                return color
+        return self.default_color
+
+    def color_of_symbol(self, symbol):
+        """按驻留表编号查文字颜色"""
+        colors = self._colors
+        if symbol >= len(colors):
+            colors.extend([None] * (len(self.table) - len(colors)))
+        color = colors[symbol]
+        if color is None:
+            color = colors[symbol] = self.classify(self.table.names[symbol])
+        return color
+
+    def color(self, name):
+        """按名称查文字颜色"""
+        return self.color_of_symbol(self.table.intern(name))
+
+    def color_at(self, cards, index):
+        """卡组中第 index 张牌的文字颜色（CardDeck 直接按编号查表）"""
+        if isinstance(cards, CardDeck) and cards.table is self.table:
+            return self.color_of_symbol(cards.ids[index])
+        return self.color(cards[index])
+
+    def prepare(self, cards):
+        """载入卡组时为其中每种牌预先计算颜色"""
+        if isinstance(cards, CardDeck) and cards.table is self.table:
+            for symbol in set(cards.ids):
+                self.color_of_symbol(symbol)
+        else:
+            for name in set(cards):
+                self.color(name)
+
+    def button_style(self, color, state="normal"):
+        """按钮在某状态下的 config 参数（bg/fg/relief）"""
+        key = (color, state)
+        style = self._button_styles.get(key)
+        if style is None:
+            base = STATE_STYLES[state]
+            style = self._button_styles[key] = {
+                "bg": base["bg"], "fg": base["fg"] or color, "relief": base["relief"]
+            }
+        return style
+
+    def cell_style(self, color, state="normal"):
+        """虚拟网格格子在某状态下的 (背景色, 文字颜色, 边框颜色)"""
+        key = (color, state)
+        style = self._cell_styles.get(key)
+        if style is None:
+            base = STATE_STYLES[state]
+            style = self._cell_styles[key] = (base["bg"], base["fg"] or color, base["outline"])
+        return style
+
+    @staticmethod
+    def font(mode="normal"):
+        """普通模式或编辑模式下的卡牌字体"""
+        return FONTS[mode]
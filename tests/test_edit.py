@@ -0,0 +1,81 @@
+"""卡组编辑与撤销/重做的测试（不依赖 tkinter）"""
+import unittest
+
+from card_edit import EditHistory
+from card_engine import CardDeck, standard_deck
+
+
+class EditHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.group = {"name": "测试", "cards": CardDeck(["A♠", "2♠", "3♠", "A♥", "2♠"])}
+        self.history = EditHistory(self.group)
+
+    def names(self):
+        return list(self.group["cards"])
+
+    def test_undo_redo_each_edit(self):
+        original = self.names()
+        steps = [
+            (lambda: self.history.rename(1, "K♠"), ["A♠", "K♠", "3♠", "A♥", "2♠"]),
+            (lambda: self.history.delete([0, 3]), ["K♠", "3♠", "2♠"]),
+            (lambda: self.history.insert(1, ["小王", "大王"]), ["K♠", "小王", "大王", "3♠", "2♠"]),
+            (lambda: self.history.append("Q♦"), ["K♠", "小王", "大王", "3♠", "2♠", "Q♦"]),
+        ]
+        states = [original]
+        for edit, expected in steps:
+            edit()
+            self.assertEqual(self.names(), expected)
+            states.append(expected)
+        for expected in reversed(states[:-1]):
+            self.assertIsNotNone(self.history.undo())
+            self.assertEqual(self.names(), expected)
+        self.assertFalse(self.history.can_undo)
+        self.assertIsNone(self.history.undo())
+        for expected in states[1:]:
+            self.assertIsNotNone(self.history.redo())
+            self.assertEqual(self.names(), expected)
+        self.assertFalse(self.history.can_redo)
+        self.assertIsNone(self.history.redo())
+
+    def test_new_edit_clears_redo(self):
+        self.history.rename(0, "K♠")
+        self.history.undo()
+        self.assertTrue(self.history.can_redo)
+        self.history.delete([4])
+        self.assertFalse(self.history.can_redo)
+        self.assertEqual(self.names(), ["A♠", "2♠", "3♠", "A♥"])
+
+    def test_batch_edits_are_one_step(self):
+        original = self.names()
+        self.assertIsNotNone(self.history.rename_matching(r"♠$", "♣"))
+        self.assertEqual(self.names(), ["A♣", "2♣", "3♣", "A♥", "2♣"])
+        self.assertIsNotNone(self.history.replace_all("2♣", "10♣"))
+        self.assertEqual(self.names(), ["A♣", "10♣", "3♣", "A♥", "10♣"])
+        self.assertIsNotNone(self.history.dedupe())
+        self.assertEqual(self.names(), ["A♣", "10♣", "3♣", "A♥"])
+        for _ in range(3):
+            self.history.undo()
+        self.assertEqual(self.names(), original)
+
+    def test_edits_without_changes(self):
+        self.assertIsNone(self.history.rename_matching("^X", "Y"))
+        self.assertIsNone(self.history.replace_all("9♦", "8♦"))
+        self.history.dedupe()
+        self.assertIsNone(self.history.dedupe())
+        self.history.undo()
+        self.assertFalse(self.history.can_undo)
+
+    def test_replace_deck(self):
+        old = self.group["cards"]
+        new = standard_deck()
+        self.history.replace(new, "恢复默认")
+        self.assertIs(self.group["cards"], new)
+        self.assertEqual(self.history.undo().label, "恢复默认")
+        self.assertIs(self.group["cards"], old)
+        self.history.redo()
+        self.assertIs(self.group["cards"], new)
+
+
+if __name__ == "__main__":
+    unittest.main()
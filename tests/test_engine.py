@@ -0,0 +1,160 @@
+"""抽牌引擎与抽牌记录的测试（不依赖 tkinter）"""
+import random
+import struct
+import unittest
+from collections import Counter
+
+from card_engine import CountedDeckEngine, DeckEngine, DrawLog, make_rng, standard_deck
+
+
+class DrawLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cards = standard_deck(2)
+
+    def played(self, engine_class, seed=3):
+        engine = engine_class(self.cards, rng=make_rng("mt", seed))
+        for _ in range(9):
+            engine.draw()
+        engine.toggle(engine.current_index)
+        return engine
+
+    def test_round_trip_keeps_header(self):
+        for engine_class, kind in ((DeckEngine, "card"), (CountedDeckEngine, "counted")):
+            engine = self.played(engine_class)
+            log = DrawLog.from_bytes(engine.log.to_bytes())
+            self.assertEqual(log.kind, kind)
+            self.assertEqual((log.deck_size, log.backend, log.seed), (len(engine), "mt", 3))
+            self.assertEqual(list(log.ops), list(engine.log.ops))
+
+    def test_replay_rejects_other_engine_kind(self):
+        log = DrawLog.from_bytes(self.played(DeckEngine).log.to_bytes())
+        with self.assertRaises(ValueError):
+            log.replay(CountedDeckEngine(self.cards))
+        log = DrawLog.from_bytes(self.played(CountedDeckEngine).log.to_bytes())
+        with self.assertRaises(ValueError):
+            log.replay(DeckEngine(self.cards))
+
+    def test_old_format_is_accepted(self):
+        engine = self.played(DeckEngine)
+        data = (b"CDL1" + struct.pack("<IB", len(engine), 2) + b"mt" + struct.pack("<B", 1) + b"3"
+                + engine.log.ops.tobytes())
+        log = DrawLog.from_bytes(data)
+        self.assertIsNone(log.kind)
+        self.assertEqual(log.replay(DeckEngine(self.cards)).snapshot(), engine.snapshot())
+
+    def test_invalid_data(self):
+        with self.assertRaises(ValueError):
+            DrawLog.from_bytes(b"XXXX")
+
+
+class EngineTestMixin:
+    """两种引擎共用的测试：随机操作后检查不变式，并用抽牌记录重放"""
+
+    engine_class = None
+
+    def setUp(self):
+        self.cards = standard_deck(2)
+
+    def random_play(self, engine, seed, steps=300):
+        """随机抽牌、抽多张、点击、放回和重置"""
+        choice = random.Random(seed)
+        for _ in range(steps):
+            roll = choice.random()
+            if roll < 0.5:
+                engine.draw()
+            elif roll < 0.6:
+                engine.draw_many(choice.randrange(6))
+            elif roll < 0.8:
+                engine.toggle(choice.randrange(len(engine)))
+            elif roll < 0.98:
+                engine.put_back(choice.randrange(len(engine)))
+            else:
+                engine.reset()
+            self.check_invariants(engine)
+
+    def test_replay_reproduces_state(self):
+        for seed in range(5):
+            engine = self.engine_class(self.cards, rng=make_rng("mt", seed))
+            self.random_play(engine, seed)
+            log = DrawLog.from_bytes(engine.log.to_bytes())
+            replayed = log.replay(self.engine_class(self.cards))
+            self.assertEqual(replayed.snapshot(), engine.snapshot())
+            self.assertEqual(replayed.drawn_count, engine.drawn_count)
+            self.check_invariants(replayed)
+
+    def test_replay_with_rng(self):
+        engine = self.engine_class(self.cards, rng=make_rng("mt", 11))
+        self.random_play(engine, 11)
+        replayed = engine.log.replay(self.engine_class(self.cards, rng=make_rng("mt", 11)), use_rng=True)
+        self.assertEqual(replayed.snapshot(), engine.snapshot())
+        with self.assertRaises(ValueError):
+            engine.log.replay(self.engine_class(self.cards, rng=make_rng("mt", 12)), use_rng=True)
+
+    def test_draw_until_empty(self):
+        engine = self.engine_class(self.cards, rng=make_rng("mt", 5))
+        drawn = Counter()
+        while True:
+            index = engine.draw()
+            if index is None:
+                break
+            drawn[engine.cards[index]] += 1
+        self.assertEqual(drawn, Counter(self.cards))
+        self.assertEqual(engine.remaining_count, 0)
+        self.check_invariants(engine)
+
+    def test_deal(self):
+        engine = self.engine_class(self.cards, rng=make_rng("mt", 2))
+        hands, kitty = engine.deal(4, 25, 8)
+        self.assertEqual([len(hand) for hand in hands], [25] * 4)
+        self.assertEqual(len(kitty), 8)
+        self.assertEqual(engine.drawn_count, 108)
+        with self.assertRaises(ValueError):
+            engine.deal(1, 1)
+
+    def test_snapshot_restore(self):
+        engine = self.engine_class(self.cards, rng=make_rng("mt", 4))
+        self.random_play(engine, 4, steps=60)
+        restored = self.engine_class(self.cards)
+        restored.restore(engine.snapshot())
+        self.assertEqual(restored.snapshot(), engine.snapshot())
+        self.check_invariants(restored)
+
+
+class DeckEngineTest(EngineTestMixin, unittest.TestCase):
+
+    engine_class = DeckEngine
+
+    def check_invariants(self, engine):
+        drawn = engine.drawn_indices
+        self.assertEqual(len(drawn), len(set(drawn)))
+        self.assertEqual(len(drawn), engine.drawn_count)
+        self.assertEqual(engine.drawn_count + engine.remaining_count, len(engine))
+        self.assertEqual(set(drawn), {i for i in range(len(engine)) if engine.is_drawn(i)})
+        # 置换的前 drawn_count 个位置正好是已抽取的牌
+        self.assertEqual(set(engine._perm[:engine._k]), set(drawn))
+        self.assertTrue(all(engine._perm[engine._pos[i]] == i for i in range(len(engine))))
+
+
+class CountedDeckEngineTest(EngineTestMixin, unittest.TestCase):
+
+    engine_class = CountedDeckEngine
+
+    def check_invariants(self, engine):
+        self.assertEqual(engine.remaining_count, sum(engine.remaining))
+        self.assertEqual(engine.drawn_count + engine.remaining_count, engine.deck_size)
+        self.assertTrue(all(0 <= left <= count for left, count in zip(engine.remaining, engine.counts)))
+        drawn = engine.drawn_indices
+        self.assertEqual(len(drawn), len(set(drawn)))
+        self.assertEqual(set(drawn), {k for k in range(len(engine))
+                                      if engine.remaining[k] < engine.counts[k]})
+
+    def test_counts_merge_duplicates(self):
+        engine = CountedDeckEngine(self.cards)
+        self.assertEqual(len(engine), 54)
+        self.assertEqual(engine.deck_size, 108)
+        self.assertEqual(set(engine.counts), {2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""会话日志的崩溃恢复测试（不依赖 tkinter）"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from card_engine import CountedDeckEngine, DeckEngine, make_rng, standard_deck
+from card_journal import SessionJournal, deck_fingerprint
+
+
+class JournalRecoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "group.journal")
+        self.cards = standard_deck(2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def play_and_crash(self, engine_class):
+        """抽牌、点击、放回后只写入日志、不关闭文件（模拟意外退出）"""
+        engine = engine_class(self.cards, rng=make_rng("mt", 7))
+        journal = SessionJournal(self.path, deck_fingerprint(self.cards))
+        self.assertFalse(journal.recover(engine))
+        journal.attach(engine)
+        for _ in range(20):
+            engine.draw()
+        journal.sync()
+        engine.toggle(3)
+        engine.toggle(engine.current_index)
+        journal.flush(fsync=False)
+        drawn = sorted(engine.drawn_indices)
+        engine.put_back(drawn[0])
+        engine.draw()
+        journal.flush(fsync=False)
+        return engine
+
+    def recover(self, engine_class):
+        engine = engine_class(self.cards, rng=make_rng("mt", 7))
+        journal = SessionJournal(self.path, deck_fingerprint(self.cards))
+        self.assertTrue(journal.recover(engine))
+        return engine
+
+    def assert_same_state(self, expected, actual):
+        self.assertEqual(actual.snapshot(), expected.snapshot())
+        self.assertEqual(actual.current_index, expected.current_index)
+        self.assertEqual(actual.drawn_count, expected.drawn_count)
+
+    def test_deck_engine(self):
+        engine = self.play_and_crash(DeckEngine)
+        self.assert_same_state(engine, self.recover(DeckEngine))
+
+    def test_counted_engine(self):
+        engine = self.play_and_crash(CountedDeckEngine)
+        self.assert_same_state(engine, self.recover(CountedDeckEngine))
+
+    def test_truncated_operation_is_dropped(self):
+        engine = self.play_and_crash(DeckEngine)
+        with open(self.path, 'ab') as file:
+            file.write(b"\x05\x00")
+        self.assert_same_state(engine, self.recover(DeckEngine))
+
+    def test_other_deck_is_not_recovered(self):
+        self.play_and_crash(DeckEngine)
+        engine = DeckEngine(standard_deck(1))
+        journal = SessionJournal(self.path, deck_fingerprint(engine.cards))
+        self.assertFalse(journal.recover(engine))
+        self.assertEqual(engine.drawn_count, 0)
+
+    def test_discard(self):
+        self.play_and_crash(DeckEngine)
+        journal = SessionJournal(self.path, deck_fingerprint(self.cards))
+        journal.discard()
+        self.assertFalse(os.path.exists(self.path))
+        # 文件已不存在时再删除不报错
+        journal.discard()
+
+
+if __name__ == "__main__":
+    unittest.main()